@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Benchmark BloomCategory.format_ip for each input form
+
+Compares the octet table and hextet formatting against building an
+ipaddress object per call.
+
+    PYTHONPATH=. python benchmarks/format_ip.py --ips 100000
+"""
+from optparse import OptionParser
+import random
+import timeit
+import ipaddress
+from seclytics.bloom_category import BloomCategory
+
+
+def legacy_format_ip(value):
+    """ipaddress for every form"""
+    if isinstance(value, str) and not value.isdigit():
+        if ':' not in value:
+            return value
+        return ipaddress.IPv6Address(value).compressed
+    if isinstance(value, str):
+        value = int(value)
+    return str(ipaddress.ip_address(value))
+
+
+def build_inputs(count):
+    ipv4s = [random.getrandbits(32) for _ in range(count)]
+    ipv6s = [ipaddress.IPv6Address(
+        (0x20010db8 << 96) | random.getrandbits(64)) for _ in range(count)]
+    return [
+        ('dot notation', [str(ipaddress.IPv4Address(ip)) for ip in ipv4s]),
+        ('digit str', [str(ip) for ip in ipv4s]),
+        ('int', ipv4s),
+        ('packed ipv4', [ipaddress.IPv4Address(ip).packed for ip in ipv4s]),
+        ('ipv6 str', [ip.exploded for ip in ipv6s]),
+        ('ipv6 int', [int(ip) for ip in ipv6s]),
+        ('packed ipv6', [ip.packed for ip in ipv6s]),
+    ]
+
+
+def run():
+    parser = OptionParser()
+    parser.add_option("--ips", default=100000, type="int", dest="ips",
+                      help="IPs per input form")
+    parser.add_option("--repeat", default=5, type="int", dest="repeat",
+                      help="Best of N runs")
+    (options, _) = parser.parse_args()
+
+    implementations = [('ipaddress', legacy_format_ip),
+                       ('format_ip', BloomCategory.format_ip)]
+    print("%-14s %14s %14s" % ('input', 'ipaddress/s', 'format_ip/s'))
+    for (name, values) in build_inputs(options.ips):
+        rates = []
+        for (_, format_ip) in implementations:
+            assert format_ip(values[0]) == legacy_format_ip(values[0])
+
+            def format_all():
+                for value in values:
+                    format_ip(value)
+            seconds = min(timeit.repeat(format_all, number=1,
+                                        repeat=options.repeat))
+            rates.append(len(values) / seconds)
+        print("%-14s %14.0f %14.0f" % (name, rates[0], rates[1]))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Benchmark per IOC rule evaluation
+
+Compares the memoized context index of Ioc against the same Ip class
+rebuilding the index on every property access, so only the memoization
+is measured.
+
+    PYTHONPATH=. python benchmarks/ioc_rules.py --iocs 20000
+"""
+from optparse import OptionParser
+import random
+import timeit
+from seclytics.ioc import Ip
+
+
+class UnmemoizedIp(Ip):
+    """Ip that rebuilds the context index on every access"""
+    __slots__ = ()
+
+    def _index_context(self):
+        self._context = None
+        return Ip._index_context(self)
+
+
+def build_intel(index, sources=5, values=4):
+    """A synthetic IP response with a namespaced context"""
+    kinds = ['categories', 'identifiers', 'reasons', 'source_urls']
+    context = {}
+    for kind in kinds:
+        context[kind] = dict(
+            ('feed%d' % src, ['%s-%d' % (kind, random.randrange(10))
+                              for _ in range(values)])
+            for src in range(random.randrange(sources + 1)))
+    return {'type': 'ip', 'id': '10.0.%d.%d' % (index // 256, index % 256),
+            'context': context}
+
+
+def rules(ioc):
+    """Scoring rules that touch the same properties many times"""
+    score = 0
+    if not ioc.has_threat_intel:
+        return score
+    for category in ('categories-1', 'categories-2', 'categories-3'):
+        if category in ioc.categories:
+            score += 10
+    for identifier in ('identifiers-4', 'identifiers-5'):
+        if identifier in ioc.identifiers:
+            score += 5
+    if len(ioc.reasons) > 2 or len(ioc.source_urls) > 3:
+        score += 1
+    if len(ioc.reported_by) > 2 and ioc.has_threat_intel:
+        score += 1
+    return score
+
+
+def run():
+    parser = OptionParser()
+    parser.add_option("--iocs", default=20000, type="int", dest="iocs",
+                      help="Number of IOCs")
+    parser.add_option("--repeat", default=5, type="int", dest="repeat",
+                      help="Best of N runs")
+    (options, _) = parser.parse_args()
+
+    intels = [build_intel(i) for i in range(options.iocs)]
+    implementations = [
+        ('unmemoized', lambda intel: UnmemoizedIp(None, intel)),
+        ('memoized', lambda intel: Ip(None, intel)),
+    ]
+    for (name, build) in implementations:
+        def evaluate():
+            for intel in intels:
+                rules(build(intel))
+        seconds = min(timeit.repeat(evaluate, number=1,
+                                    repeat=options.repeat))
+        print("%-10s %8.2f us/ioc" % (name, seconds / options.iocs * 1e6))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Benchmark the JSON codecs on IP and host lookup responses
+
+Decodes an index response the size of a batch and re-encodes each row
+the way ip_enrich prints them, for every codec that is installed.
+
+    PYTHONPATH=. python benchmarks/json_codec.py --rows 100
+"""
+from optparse import OptionParser
+import json
+import random
+import timeit
+from seclytics.json_codec import available_codecs, get_codec
+
+
+def build_context(sources=4, values=3):
+    kinds = ['categories', 'identifiers', 'reasons', 'source_urls']
+    return dict(
+        (kind, dict(('feed%d' % src,
+                     ['%s-%d' % (kind, random.randrange(50))
+                      for _ in range(values)])
+                    for src in range(random.randrange(1, sources + 1))))
+        for kind in kinds)
+
+
+def build_ip(index):
+    ip_address = '10.%d.%d.%d' % (index // 65536 % 256, index // 256 % 256,
+                                  index % 256)
+    return {
+        'type': 'ip', 'id': ip_address,
+        'context': build_context(),
+        'history': {'first_seen_at': '2018-01-02T03:04:05',
+                    'last_seen_at': '2018-02-03T04:05:06'},
+        'prediction': {'predicted_at': '2018-01-01T00:00:00'},
+        'predictions': [{'model': 'asn', 'score': random.random()}],
+        'rankings': {'alexa': {'min': random.randrange(1000000)}},
+        'connections': [{'type': 'cidr', 'id': ip_address + '/24'},
+                        {'type': 'asn', 'id': str(random.randrange(65535))}],
+    }
+
+
+def build_host(index):
+    host = 'host%d.example.com' % index
+    return {
+        'type': 'host', 'id': host,
+        'context': build_context(),
+        'passive_dns': [{'ip': '10.0.%d.%d' % (i, index % 256),
+                         'first_seen_at': '2018-01-02T03:04:05'}
+                        for i in range(5)],
+        'connections': [{'type': 'domain', 'id': 'example.com'}],
+    }
+
+
+def run():
+    parser = OptionParser()
+    parser.add_option("--rows", default=100, type="int", dest="rows",
+                      help="Rows per response")
+    parser.add_option("--number", default=200, type="int", dest="number",
+                      help="Responses per run")
+    parser.add_option("--repeat", default=5, type="int", dest="repeat",
+                      help="Best of N runs")
+    (options, _) = parser.parse_args()
+
+    payloads = [
+        ('ips', [build_ip(i) for i in range(options.rows)]),
+        ('hosts', [build_host(i) for i in range(options.rows)]),
+    ]
+    print("%-10s %-6s %12s %12s" % ('codec', 'rows', 'loads MB/s',
+                                    'dumps rows/s'))
+    for name in available_codecs():
+        codec = get_codec(name)
+        for (kind, rows) in payloads:
+            body = json.dumps({'data': rows}).encode('utf-8')
+
+            def decode():
+                codec.loads(body)
+
+            def encode():
+                for row in rows:
+                    codec.dumps(row)
+
+            decode_seconds = min(timeit.repeat(
+                decode, number=options.number, repeat=options.repeat))
+            encode_seconds = min(timeit.repeat(
+                encode, number=options.number, repeat=options.repeat))
+            print("%-10s %-6s %12.1f %12.0f" % (
+                name, kind,
+                len(body) * options.number / decode_seconds / 1e6,
+                len(rows) * options.number / encode_seconds))
+
+
+if __name__ == '__main__':
+    run()
@@ -1,5 +1,9 @@
 from .seclytics import Seclytics, BulkDownload
 import logging
+import sys
+
+if sys.version_info >= (3, 5):
+    from .async_seclytics import AsyncSeclytics
 
 # Set default logging handler to avoid "No handler found" warnings.
 try:  # Python 2.7+
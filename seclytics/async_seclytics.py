@@ -0,0 +1,132 @@
+"""Asyncio client for the Seclytics API (python 3 only)."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from .seclytics import Seclytics, IOC_ENDPOINTS
+
+# get_event_loop is deprecated inside coroutines, get_running_loop is 3.7+
+get_running_loop = getattr(asyncio, 'get_running_loop',
+                           asyncio.get_event_loop)
+
+
+class AsyncSeclytics(object):
+    """Asyncio counterpart of Seclytics
+
+    Each call runs the matching Seclytics call on a thread pool, so up to
+    ``concurrency`` requests can be in flight from one event loop. Results
+    are the same IOC objects and errors are the same exceptions.
+
+        client = AsyncSeclytics(access_token, concurrency=20)
+        reports = await asyncio.gather(*[client.ip(ip) for ip in ips])
+
+    Attributes:
+        client (Seclytics): the synchronous client doing the requests
+        concurrency (int): max number of requests in flight
+
+    Any other keyword arguments are passed on to Seclytics.
+    """
+    def __init__(self, access_token,
+                 api_url='https://api.seclytics.com',
+                 session=None,
+                 timeout=5,
+                 concurrency=10,
+                 **kwargs):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+
+        # size the connection pool so every worker can keep its connection
+        kwargs.setdefault('pool_size', concurrency)
+        self.client = Seclytics(access_token, api_url=api_url,
+                                session=session, timeout=timeout, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+        self.mount_ioc_lookups()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stop the worker threads and close the session."""
+        self._executor.shutdown(wait=False)
+        self.client.session.close()
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking client call on the pool once a slot is free"""
+        # the semaphore has to be created inside the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        loop = get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(
+                self._executor, partial(func, *args, **kwargs))
+
+    async def _run_list(self, func, *args, **kwargs):
+        """Run a client generator on the pool and collect the rows"""
+        def collect():
+            return list(func(*args, **kwargs))
+        return await self._run(collect)
+
+    async def _get_request(self, path, params):
+        return await self._run(self.client._get_request, path, params)
+
+    async def _post_data(self, path, params, data=None):
+        return await self._run(self.client._post_data, path, params, data)
+
+    async def _ioc_show(self, ioc_path, ioc_id, fields=None):
+        return await self._run(self.client._ioc_show, ioc_path, ioc_id,
+                               fields=fields)
+
+    async def _ioc_index(self, ioc_path, iocs, fields=None, **kwargs):
+        return await self._run_list(self.client._ioc_index, ioc_path, iocs,
+                                    fields=fields, **kwargs)
+
+    async def bulk_api_download(self, name, data_dir='/tmp/'):
+        """Download a file from the bulk api."""
+        return await self._run(self.client.bulk_api_download, name,
+                               data_dir=data_dir)
+
+    async def binary_download(self, file_hash, data_dir='/tmp/'):
+        """Download a binary sample."""
+        return await self._run(self.client.binary_download, file_hash,
+                               data_dir=data_dir)
+
+    def _single_ioc_wrapper(self, method_name):
+        # the client's mounted lookup, with its bloom gate and batching
+        async def mounted_method(ioc, **kwargs):
+            return await self._run(getattr(self.client, method_name), ioc,
+                                   **kwargs)
+        return mounted_method
+
+    def _multiple_iocs_wrapper(self, endpoint):
+        async def mounted_method(iocs, **kwargs):
+            return await self._run_list(getattr(self.client, endpoint), iocs,
+                                        **kwargs)
+        return mounted_method
+
+    def mount_ioc_lookups(self):
+        """Set the ioc lookup attributes."""
+        for (method_name, endpoint) in IOC_ENDPOINTS:
+            setattr(self, method_name, self._single_ioc_wrapper(method_name))
+            setattr(self, endpoint, self._multiple_iocs_wrapper(endpoint))
+
+    async def urls(self, urls, fields=None):
+        """Get URL data."""
+        return await self._run_list(self.client.urls, urls, fields=fields)
+
+    async def hashed_urls(self, iocs, **kwargs):
+        """Get URL data by hash."""
+        return await self._run_list(self.client.hashed_urls, iocs, **kwargs)
+
+    async def hosts_live_dns(self, hosts, fields=None):
+        """Get live dns for hosts."""
+        return await self._run(self.client.hosts_live_dns, hosts,
+                               fields=fields)
+
+    async def cidr_ips(self, cidr, fields=None, **kwargs):
+        """Get all the IPs for a CIDR, following every page."""
+        return await self._run_list(self.client.cidr_ips, cidr,
+                                    fields=fields, **kwargs)
@@ -0,0 +1,90 @@
+"""Split large IOC lists into batches and run them over a thread pool"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+try:
+    string_types = (str, unicode)
+except NameError:
+    string_types = (str,)
+
+
+def chunked(iterable, size):
+    """Yield lists of at most size items from any iterable
+
+    The iterable is consumed lazily so generators of any length are fine.
+    """
+    if size < 1:
+        raise ValueError("size must be at least 1")
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def fan_out(func, chunks, workers=1, preserve_order=False, executor=None):
+    """Call func for each chunk on a thread pool and yield the results
+
+    Results are yielded as soon as each call completes, or in chunk order
+    when preserve_order is set. Only ``workers * 2`` chunks are submitted
+    ahead of the consumer so the input is never read into memory at once.
+
+    Parameters:
+        func: called with a single chunk
+        chunks: iterable of chunks
+        workers: number of threads, 1 runs everything in this thread
+        preserve_order: yield results in the same order as the chunks
+        executor: run the calls on this executor (e.g. a process pool)
+            instead of a new thread pool, it's left running
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if workers <= 1 or second is None:
+        # nothing to parallelise so skip the pool overhead
+        yield func(first)
+        if second is None:
+            return
+        yield func(second)
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    queued = [first, second]
+
+    def submit():
+        chunk = queued.pop(0) if queued else next(chunks, None)
+        if chunk is None:
+            return False
+        pending.append(executor.submit(func, chunk))
+        return True
+
+    try:
+        for _ in range(workers * 2):
+            if not submit():
+                break
+        while pending:
+            if preserve_order:
+                future = pending.popleft()
+                result = future.result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+                result = future.result()
+            submit()
+            yield result
+    finally:
+        # the consumer stopped early or a batch failed
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
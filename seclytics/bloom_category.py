@@ -5,11 +5,36 @@ Bloom filters provide a way to limit your requests the API. If you get
 a match then check the API for an authorative response.
 """
 
-import sys
+import logging
+import numbers
+import os
+import re
+import struct
+import threading
 from enum import Enum
 import ipaddress
 from .portable_bloom import PortableBloom
 
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    integer_types = (int, long)
+    text_types = (str, unicode)
+except NameError:
+    integer_types = (int,)
+    text_types = (str,)
+
+# dot notation of every octet, so IPs format without ipaddress objects
+OCTETS = [str(octet) for octet in range(256)]
+
+# int(group, 16) also takes 0x, _, signs and spaces
+HEXTET = re.compile(r'[0-9a-fA-F]{1,4}\Z')
+
 
 class Category(Enum):
     """Use an enum to map the categories"""
@@ -18,14 +43,106 @@ class Category(Enum):
     suspicious = 3
 
 
-class BloomCategory(object):
-    """Loads the three bloomfilters and provides a way to check ips
-    """
+class BloomGeneration(object):
+    """One loaded set of the three bloom filters"""
+
     def __init__(self, malicious_path, has_intel_path, predicted_path):
         self.malicious = PortableBloom(malicious_path)
         self.predicted = PortableBloom(predicted_path)
         self.has_intel = PortableBloom(has_intel_path)
 
+
+class BloomCategory(object):
+    """Loads the three bloomfilters and provides a way to check ips
+
+    The filters can be reloaded after a new download, either by calling
+    reload() or with auto_reload set to a polling interval in seconds.
+    The new files are loaded on the side and swapped in at once, checks
+    that are running keep using the filters they started with.
+
+    Downloads should replace the files with a rename (BulkDownload does)
+    since files overwritten in place are seen half written.
+    """
+    def __init__(self, malicious_path, has_intel_path, predicted_path,
+                 auto_reload=None):
+        self.paths = (malicious_path, has_intel_path, predicted_path)
+        self._signature = self._file_signature()
+        self._generation = BloomGeneration(*self.paths)
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        if auto_reload:
+            self._watcher = threading.Thread(target=self._watch,
+                                             args=(auto_reload,))
+            self._watcher.daemon = True
+            self._watcher.start()
+
+    @property
+    def malicious(self):
+        return self._generation.malicious
+
+    @property
+    def predicted(self):
+        return self._generation.predicted
+
+    @property
+    def has_intel(self):
+        return self._generation.has_intel
+
+    def _file_signature(self):
+        """mtime, size and inode of the files to notice replacements"""
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+                continue
+            signature.append((stat.st_mtime, stat.st_size, stat.st_ino))
+        return tuple(signature)
+
+    def reload(self, force=False):
+        """Load the filters again if the files changed
+
+        A file that is missing or fails to load keeps the current filters.
+
+        Returns (bool) True if new filters were swapped in
+        """
+        with self._reload_lock:
+            signature = self._file_signature()
+            if not force and signature == self._signature:
+                return False
+            try:
+                generation = BloomGeneration(*self.paths)
+            except (RuntimeError, ValueError, IOError, OSError) as error:
+                logger.warning("Keeping current bloom filters: %s", error)
+                return False
+            # a single assignment so checks see the old or the new filters
+            self._generation = generation
+            self._signature = signature
+            return True
+
+    def _watch(self, interval):
+        pending = None
+        while not self._stop.wait(interval):
+            signature = self._file_signature()
+            if signature == self._signature:
+                pending = None
+                continue
+            # wait for the files to stop changing before loading them
+            if signature != pending:
+                pending = signature
+                continue
+            self.reload()
+            pending = None
+
+    def stop(self):
+        """Stop watching the files"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
     def check_ip(self, ip_addr, check_suspicious=True, check_predicted=True,
                  check_malicious=True):
         """Compare the IP against all the bloom filters
@@ -34,30 +151,158 @@ class BloomCategory(object):
         This way the majority of IPs will only have to check once.
         """
         value = self.format_ip(ip_addr)
+        generation = self._generation
 
-        if self.has_intel.contains(value):
-            if check_predicted and self.predicted.contains(value):
+        if generation.has_intel.contains(value):
+            if check_predicted and generation.predicted.contains(value):
                 return Category.predicted
-            if check_malicious and self.malicious.contains(value):
+            if check_malicious and generation.malicious.contains(value):
                 return Category.malicious
             if check_suspicious:
                 return Category.suspicious
         return None
 
+    def check_ips(self, ip_addrs, check_suspicious=True, check_predicted=True,
+                  check_malicious=True):
+        """Check many IPs at once, same precedence as check_ip
+
+        Parameters:
+            ip_addrs: a list of IPs (any form format_ip takes), a numpy
+                array of uint32 IPs or a bytes buffer of packed big endian
+                IPv4s
+
+        Returns (numpy.ndarray) uint8 Category value per IP, 0 for no match
+        """
+        if numpy is None:
+            raise RuntimeError("check_ips requires numpy")
+        values = self.format_ips(ip_addrs)
+        generation = self._generation
+        categories = numpy.zeros(len(values), dtype=numpy.uint8)
+        if not len(values):
+            return categories
+
+        # only IPs with intel need the other two blooms
+        has_intel = numpy.flatnonzero(
+            generation.has_intel.contains_many(values))
+        if check_suspicious:
+            categories[has_intel] = Category.suspicious.value
+        remaining = has_intel
+        if check_predicted and len(remaining):
+            predicted = generation.predicted.contains_many(values[remaining])
+            categories[remaining[predicted]] = Category.predicted.value
+            remaining = remaining[~predicted]
+        if check_malicious and len(remaining):
+            malicious = generation.malicious.contains_many(values[remaining])
+            categories[remaining[malicious]] = Category.malicious.value
+        return categories
+
+    @classmethod
+    def format_ips(cls, ip_addrs):
+        """Format many IPs for the bloom filters
+
+        Returns (numpy.ndarray) object array of IPs in dot notation
+        """
+        if isinstance(ip_addrs, (bytes, bytearray, memoryview)):
+            ip_addrs = numpy.frombuffer(ip_addrs, dtype='>u4')
+        if isinstance(ip_addrs, numpy.ndarray) and ip_addrs.dtype.kind in 'ui':
+            ints = ip_addrs.astype(numpy.uint32, copy=False)
+            octets = _OCTETS
+            values = octets[ints >> 24]
+            for shift in (16, 8, 0):
+                values = values + '.' + octets[(ints >> shift) & 0xff]
+            return values
+        return numpy.array([cls.format_ip(value) for value in ip_addrs],
+                           dtype=object)
+
     @staticmethod
     def format_ip(value):
         """Format the IP before sending to bloom
 
         Parameters:
-            value: the ip in int or dot notation
+            value: the ip in dot notation, an int or digit string (IPv6
+                above 32 bits), packed bytes (4 or 16) or an IPv6 string
 
-        Returns (str) IP address in dot notation
+        Returns (str) IPv4 in dot notation or the compressed lower case
+            IPv6, anything else is returned as is
         """
-        if not isinstance(value, str) and sys.version_info < (3, 0):
-            raise RuntimeError("Only accepts str")
+        if isinstance(value, text_types):
+            if value.isdigit():
+                return format_int(int(value))
+            if ':' in value:
+                return format_ipv6(value)
+            return value
+        if isinstance(value, integer_types):
+            return format_int(value)
+        if isinstance(value, (bytes, bytearray)):
+            if len(value) == 4:
+                octets = bytearray(value)
+                return '.'.join([OCTETS[octet] for octet in octets])
+            if len(value) == 16:
+                return compress_ipv6(struct.unpack('>8H', bytes(value)))
+        if isinstance(value, numbers.Integral):
+            # numpy ints
+            return format_int(int(value))
+        raise TypeError("Unsupported IP %r" % (value,))
+
+
+def format_int(value):
+    """Dot notation of an int IPv4, compressed IPv6 above 32 bits"""
+    if 0 <= value <= 0xffffffff:
+        return '%s.%s.%s.%s' % (OCTETS[value >> 24],
+                                OCTETS[value >> 16 & 0xff],
+                                OCTETS[value >> 8 & 0xff],
+                                OCTETS[value & 0xff])
+    if value >> 128:
+        raise ValueError("Not an IP: %d" % value)
+    return compress_ipv6([value >> shift & 0xffff
+                          for shift in range(112, -1, -16)])
+
 
-        if isinstance(value, str) and value.isdigit():
-            # map int ip to dot notation
-            return str(ipaddress.IPv4Address(int(value)))
+def format_ipv6(value):
+    """Compressed lower case IPv6, the same as ipaddress gives
 
+    Embedded IPv4 and scoped addresses go through ipaddress, invalid
+    addresses are returned as is.
+    """
+    if '.' in value or '%' in value:
+        try:
+            return ipaddress.IPv6Address(u'%s' % value).compressed
+        except ValueError:
+            return value
+    (head, double_colon, tail) = value.partition('::')
+    groups = head.split(':') if head else []
+    if double_colon:
+        tail_groups = tail.split(':') if tail else []
+        missing = 8 - len(groups) - len(tail_groups)
+        if missing < 1:
+            return value
+        groups.extend(['0'] * missing)
+        groups.extend(tail_groups)
+    if len(groups) != 8 or not all(HEXTET.match(group) for group in groups):
         return value
+    return compress_ipv6([int(group, 16) for group in groups])
+
+
+def compress_ipv6(hextets):
+    """Replace the longest run of zero hextets with ::"""
+    best_start = best_length = 0
+    start = None
+    for (index, hextet) in enumerate(hextets):
+        if hextet == 0:
+            if start is None:
+                start = index
+            if index + 1 - start > best_length:
+                best_start = start
+                best_length = index + 1 - start
+        else:
+            start = None
+    parts = ['%x' % hextet for hextet in hextets]
+    if best_length < 2:
+        return ':'.join(parts)
+    return '%s::%s' % (':'.join(parts[:best_start]),
+                       ':'.join(parts[best_start + best_length:]))
+
+
+if numpy is not None:
+    # the octets as an array so uint32 arrays format in bulk
+    _OCTETS = numpy.array(OCTETS, dtype=object)
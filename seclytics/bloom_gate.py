@@ -0,0 +1,81 @@
+"""Skip the API for IPs the has_intel bloom filter doesn't have
+
+    bloom = BloomCategory(malicious_path, has_intel_path, predicted_path)
+    client = Seclytics(access_token, bloom=bloom)
+    ip = client.ip('10.1.2.3')   # no request when the bloom has no match
+    client.bloom_gate.rate       # share of IPs answered by the bloom
+
+A bloom filter has no false negatives, an IP it doesn't have has no
+intel. Those IPs get an Ip with only its type and id.
+"""
+import threading
+from .ioc.ip import Ip
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def no_intel_ip(client, ip_addr):
+    """The Ip of an IP without intel"""
+    return Ip(client, {'type': 'ip', 'id': ip_addr})
+
+
+class BloomGate(object):
+    """Checks IPs against the has_intel bloom before they are looked up
+
+    Attributes:
+        bloom (BloomCategory): the bloom filters
+        checked (int): IPs checked
+        short_circuited (int): IPs answered without a request
+    """
+    def __init__(self, bloom):
+        self.bloom = bloom
+        self.checked = 0
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """Share of the checked IPs answered without a request"""
+        if not self.checked:
+            return 0.0
+        return float(self.short_circuited) / self.checked
+
+    def _count(self, checked, short_circuited):
+        with self._lock:
+            self.checked += checked
+            self.short_circuited += short_circuited
+
+    def has_intel(self, ip_addr):
+        """The IP may have intel, False means it has none"""
+        match = self.bloom.check_ip(ip_addr, check_predicted=False,
+                                    check_malicious=False) is not None
+        self._count(1, 0 if match else 1)
+        return match
+
+    def split(self, ip_addrs):
+        """Split IPs into the ones that may have intel and the rest
+
+        Returns (list, list) the IPs to look up and the IPs without intel,
+            each in input order
+        """
+        ip_addrs = list(ip_addrs)
+        if not ip_addrs:
+            return ([], [])
+        if numpy is None:
+            # check_ips needs numpy
+            categories = [self.bloom.check_ip(ip_addr, check_predicted=False,
+                                              check_malicious=False)
+                          for ip_addr in ip_addrs]
+        else:
+            categories = self.bloom.check_ips(
+                ip_addrs, check_predicted=False,
+                check_malicious=False).tolist()
+        lookups = []
+        no_intel = []
+        for (ip_addr, category) in zip(ip_addrs, categories):
+            (lookups if category else no_intel).append(ip_addr)
+        self._count(len(ip_addrs), len(no_intel))
+        return (lookups, no_intel)
@@ -0,0 +1,342 @@
+"""Download files from the bulk endpoint"""
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from .compat import replace
+from .exceptions import DownloadError
+
+# errors that leave a partial file we can resume from
+RESUMABLE_ERRORS = (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+
+class BulkDownload(object):
+    """Download files from the bulk endpoint.
+
+    The response is written to ``<filename>.part`` and only renamed to the
+    filename once its size (and checksum when given) is verified, so
+    readers never open a truncated file. An interrupted download resumes
+    from the partial file with a Range request, and large files can be
+    fetched as parallel ranged segments. Resumes send If-Range with the
+    ETag (or Last-Modified) of the partial file, saved to
+    ``<filename>.part.meta``, so a file that changed on the server is
+    downloaded again from the start.
+
+    The ETag, Last-Modified and size of the download are saved to
+    ``<filename>.meta`` when every byte of it was validated: downloaded
+    from the start or resumed with If-Range. When the file is still there
+    the next download (or resume) is conditional and a 304 Not Modified
+    keeps the existing file.
+    """
+
+    def __init__(self, api, endpoint, data_dir, chunk_size=1024 * 1024,
+                 segments=1, checksum=None,
+                 min_segment_size=8 * 1024 * 1024, conditional=True):
+        """Create a bulk download object.
+
+        Parameters:
+            api: the seclytics API client
+            endpoint: the item we want to download
+            data_dir: the dir we want to download to
+            chunk_size: bytes read from the socket per write
+            segments: number of parallel ranged requests for large files
+            checksum: expected digest as 'algorithm:hexdigest',
+                e.g. 'sha256:9f86d0...'
+            min_segment_size: files smaller than this per segment are
+                downloaded with a single request
+            conditional: skip the download when the file is unchanged
+        """
+        self.api = api
+        self.endpoint = endpoint
+        self.data_dir = ''
+        if data_dir:
+            self.data_dir = data_dir
+        self.chunk_size = chunk_size
+        self.segments = segments
+        self.checksum = checksum
+        self.min_segment_size = min_segment_size
+        self.conditional = conditional
+        self.expected_size = None
+        self.validators = {}
+        self.not_modified = False
+        self.validated = True
+
+    @property
+    def filename(self):
+        """Determine the file name."""
+        filename = self.endpoint.replace('/', '_')
+        if self.endpoint.startswith('/bulk'):
+            filename = os.path.basename(self.endpoint)
+        elif self.endpoint.endswith('/download'):
+            filename = os.path.basename(self.endpoint[:-9])
+        return os.path.join(self.data_dir, filename)
+
+    @property
+    def part_filename(self):
+        """The file the download is written to until it's verified."""
+        return self.filename + '.part'
+
+    @property
+    def meta_filename(self):
+        """The file the ETag, Last-Modified and size are saved to."""
+        return self.filename + '.meta'
+
+    @property
+    def part_meta_filename(self):
+        """The file the validators of the partial file are saved to."""
+        return self.part_filename + '.meta'
+
+    @property
+    def url(self):
+        return self.api.base_url + self.endpoint
+
+    def _request(self, method, headers=None):
+        # ranges are byte offsets so ask for the file as is
+        request_headers = {'Accept-Encoding': 'identity'}
+        request_headers.update(headers or {})
+        return self.api._request(method, self.url, stream=True,
+                                 headers=request_headers)
+
+    @property
+    def api_reponse(self):
+        """Get the API response."""
+        response = self._request('GET')
+        self.api._check_response_for_errors(response)
+        return response
+
+    def download(self):
+        """Download API response to file."""
+        part_filename = self.part_filename
+        self.not_modified = False
+        self.validated = True
+        if self.segments <= 1 or not self._download_segments(part_filename):
+            self._download_stream(part_filename)
+        if self.not_modified:
+            return self.filename
+        self._verify(part_filename)
+        replace(part_filename, self.filename)
+        self._save_validators()
+        if os.path.exists(self.part_meta_filename):
+            os.remove(self.part_meta_filename)
+        return self.filename
+
+    def _load_validators(self):
+        """Validators saved for the current file, empty if it changed"""
+        try:
+            with open(self.meta_filename, 'r') as file_handle:
+                validators = json.load(file_handle)
+            size = os.path.getsize(self.filename)
+        except (IOError, OSError, ValueError):
+            return {}
+        if validators.get('size') not in (None, size):
+            return {}
+        return validators
+
+    def _conditional_headers(self):
+        if not self.conditional:
+            return {}
+        validators = self._load_validators()
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def _read_validators(self, response):
+        self.validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+    def _if_range(self):
+        """If-Range validator of the partial file, None if it has none"""
+        validators = self.validators
+        if not validators:
+            try:
+                with open(self.part_meta_filename, 'r') as file_handle:
+                    validators = json.load(file_handle)
+            except (IOError, OSError, ValueError):
+                return None
+        return validators.get('etag') or validators.get('last_modified')
+
+    def _save_part_validators(self):
+        with open(self.part_meta_filename, 'w') as file_handle:
+            json.dump(self.validators, file_handle)
+
+    def _remove_part(self):
+        for filename in (self.part_filename, self.part_meta_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _save_validators(self):
+        # a file resumed without If-Range may be two versions spliced
+        if not self.validated or not (self.validators.get('etag') or
+                self.validators.get('last_modified')):
+            return
+        validators = dict(self.validators,
+                          size=os.path.getsize(self.filename))
+        tmp_filename = self.meta_filename + '.tmp'
+        with open(tmp_filename, 'w') as file_handle:
+            json.dump(validators, file_handle)
+        replace(tmp_filename, self.meta_filename)
+
+    def _download_stream(self, part_filename):
+        """Stream to the part file, resuming after dropped connections"""
+        attempt = 0
+        while True:
+            offset = 0
+            if os.path.exists(part_filename):
+                offset = os.path.getsize(part_filename)
+            try:
+                self._stream_to_file(part_filename, offset)
+                if self.not_modified:
+                    return
+                size = os.path.getsize(part_filename)
+                if self.expected_size is None or size >= self.expected_size:
+                    return
+            except RESUMABLE_ERRORS:
+                if attempt >= self.api.retry.max_retries:
+                    raise
+            else:
+                # the server closed the connection early
+                if attempt >= self.api.retry.max_retries:
+                    return
+            time.sleep(self.api.retry.delay(attempt))
+            attempt += 1
+
+    def _stream_to_file(self, part_filename, offset):
+        headers = self._conditional_headers()
+        if_range = None
+        if offset:
+            headers['Range'] = 'bytes=%d-' % offset
+            if_range = self._if_range()
+            if if_range:
+                headers['If-Range'] = if_range
+        response = self._request('GET', headers)
+        if response.status_code == 304:
+            # the published file is current, the partial one is stale
+            response.close()
+            self._remove_part()
+            self.not_modified = True
+            return
+        if offset and response.status_code == 416:
+            # the partial file doesn't match the file on the server
+            response.close()
+            self._remove_part()
+            return self._stream_to_file(part_filename, 0)
+        if offset and response.status_code == 206 and if_range and \
+                response.headers.get('ETag') not in (None, if_range):
+            # the server ignored If-Range and the file changed
+            response.close()
+            self._remove_part()
+            return self._stream_to_file(part_filename, 0)
+        if response.status_code != 206:
+            # the whole file, the partial one is overwritten
+            self.api._check_response_for_errors(response)
+            offset = 0
+            self.validated = True
+        elif not if_range:
+            self.validated = False
+        self.expected_size = self._total_size(response)
+        self._read_validators(response)
+        if not offset:
+            self._save_part_validators()
+
+        mode = 'ab' if offset else 'wb'
+        with open(part_filename, mode) as file_handle:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if chunk:
+                    file_handle.write(chunk)
+
+    @staticmethod
+    def _total_size(response):
+        """Size of the whole file from Content-Range or Content-Length"""
+        if response.status_code == 206:
+            match = re.search(r'/(\d+)$',
+                              response.headers.get('Content-Range', ''))
+            if match:
+                return int(match.group(1))
+            return None
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit():
+            return int(content_length)
+        return None
+
+    def _download_segments(self, part_filename):
+        """Download the file as parallel ranges
+
+        Returns (bool) False if the file is too small or the server does
+        not support ranges.
+        """
+        response = self._request('HEAD', self._conditional_headers())
+        response.close()
+        if response.status_code == 304:
+            self.not_modified = True
+            return True
+        if response.status_code != 200:
+            return False
+        size = self._total_size(response)
+        if (not size or response.headers.get('Accept-Ranges') != 'bytes' or
+                size < self.min_segment_size * 2):
+            return False
+        self._read_validators(response)
+        self._save_part_validators()
+
+        segment_size = max(-(-size // self.segments), self.min_segment_size)
+        ranges = [(start, min(start + segment_size, size) - 1)
+                  for start in range(0, size, segment_size)]
+        with open(part_filename, 'wb') as file_handle:
+            file_handle.truncate(size)
+        self.expected_size = size
+
+        def download_range(byte_range):
+            self._download_range(part_filename, *byte_range)
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            list(executor.map(download_range, ranges))
+        return True
+
+    def _download_range(self, part_filename, start, end):
+        """Write bytes start to end (inclusive) into the part file"""
+        headers = {'Range': 'bytes=%d-%d' % (start, end)}
+        if_range = self._if_range()
+        if if_range:
+            headers['If-Range'] = if_range
+        response = self._request('GET', headers)
+        if response.status_code != 206:
+            self.api._check_response_for_errors(response)
+            response.close()
+            raise DownloadError("Server ignored range %d-%d" % (start, end))
+        written = 0
+        with open(part_filename, 'r+b') as file_handle:
+            file_handle.seek(start)
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if chunk:
+                    file_handle.write(chunk)
+                    written += len(chunk)
+        if written != end - start + 1:
+            raise DownloadError("Incomplete range %d-%d: %d bytes" %
+                                (start, end, written))
+
+    def _verify(self, part_filename):
+        """Check the size and checksum before publishing the file"""
+        size = os.path.getsize(part_filename)
+        if self.expected_size is not None and size != self.expected_size:
+            # keep the part file so the next download resumes
+            raise DownloadError("Incomplete download %s: %d of %d bytes" %
+                                (self.filename, size, self.expected_size))
+        if not self.checksum:
+            return
+        (algorithm, _, expected) = self.checksum.partition(':')
+        digest = hashlib.new(algorithm)
+        with open(part_filename, 'rb') as file_handle:
+            for block in iter(lambda: file_handle.read(self.chunk_size), b''):
+                digest.update(block)
+        if digest.hexdigest() != expected.lower():
+            self._remove_part()
+            raise DownloadError("Checksum mismatch for %s" % self.filename)
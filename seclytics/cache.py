@@ -0,0 +1,172 @@
+"""Response caches for IOC lookups
+
+Both caches expire entries after ``ttl`` seconds and evict the least
+recently used entries once they hold more than ``max_size`` entries.
+
+    client = Seclytics(access_token, cache=MemoryCache(ttl=600))
+"""
+from collections import OrderedDict
+from copy import deepcopy
+import json
+import sqlite3
+import threading
+import time
+
+
+class BaseCache(object):
+    """Interface used by the client, keys are str and values are dicts"""
+
+    def get(self, key):
+        """Returns the value or None when missing or expired"""
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def get_many(self, keys):
+        """Returns a dict with the keys that were found"""
+        raise NotImplementedError
+
+    def set_many(self, items):
+        """Store a dict of keys and values"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """Thread safe in process LRU cache
+
+    Values are copied in and out, like SqliteCache a caller changing a
+    row it got doesn't change the cached row.
+
+    Attributes:
+        max_size (int): max number of entries
+        ttl (int): seconds before an entry expires
+    """
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        found = {}
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                (expires_at, value) = entry
+                if expires_at < now:
+                    del self._entries[key]
+                    continue
+                # move to the end so it's the most recently used
+                del self._entries[key]
+                self._entries[key] = entry
+                found[key] = value
+        return deepcopy(found)
+
+    def set_many(self, items):
+        expires_at = time.time() + self.ttl
+        items = deepcopy(items)
+        with self._lock:
+            for (key, value) in items.items():
+                self._entries.pop(key, None)
+                self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteCache(BaseCache):
+    """LRU cache stored in a sqlite file
+
+    The file can be shared by many worker processes, each thread gets its
+    own connection.
+
+    Attributes:
+        path (str): the sqlite database file
+        max_size (int): max number of entries
+        ttl (int): seconds before an entry expires
+    """
+    def __init__(self, path, max_size=100000, ttl=3600):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._local = threading.local()
+        connection = self._connection
+        with connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_accessed_at '
+                'ON cache (accessed_at)')
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # readers don't block the writer in other processes
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def __len__(self):
+        cursor = self._connection.execute('SELECT COUNT(*) FROM cache')
+        return cursor.fetchone()[0]
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        found = {}
+        now = time.time()
+        connection = self._connection
+        # stay below sqlite's limit on query variables
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            query = ('SELECT key, value FROM cache WHERE expires_at >= ? '
+                     'AND key IN (%s)' % ','.join('?' * len(batch)))
+            for (key, value) in connection.execute(query, [now] + batch):
+                found[key] = json.loads(value)
+        if found:
+            with connection:
+                connection.executemany(
+                    'UPDATE cache SET accessed_at = ? WHERE key = ?',
+                    [(now, key) for key in found])
+        return found
+
+    def set_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + self.ttl
+        rows = [(key, json.dumps(value), expires_at, now)
+                for (key, value) in items.items()]
+        connection = self._connection
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache '
+                '(key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                rows)
+            # expired entries are never returned and age out with the LRU
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_size,))
+
+    def clear(self):
+        with self._connection as connection:
+            connection.execute('DELETE FROM cache')
@@ -0,0 +1,343 @@
+"""Offline CIDR and ASN lookups for IPs from bulk data
+
+The CIDR rows of a bulk download (JSON lines shaped like the API's cidr
+responses) are flattened into sorted, non overlapping IPv4 intervals,
+each pointing at its most specific CIDR. The intervals are saved as .npy
+files that are memory mapped, so a lookup is a binary search.
+
+Every build writes a new generation directory inside the index directory
+and then atomically swaps the ``current`` file pointing at it, so readers
+never map files of two different builds.
+
+    index = CidrIndex.load_or_build('/tmp/cidrs.jsonl', '/tmp/cidrs.index')
+    cidr = index.lookup('8.8.8.8')
+    cidr.cidr_block, cidr.asn_number, cidr.country_code
+
+IPv6 blocks are skipped, their lookups go to the API (see
+Seclytics.ip_cidr).
+"""
+from copy import deepcopy
+import json
+import numbers
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import time
+import ipaddress
+from .compat import replace
+from .ioc import Asn, Cidr
+from .json_codec import get_codec
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ARRAYS = ('starts', 'ends', 'rows', 'offsets')
+
+# the file naming the generation directory readers use
+CURRENT = 'current'
+GENERATION_PREFIX = 'index-'
+
+
+def ip_to_int(ip_addr):
+    """uint32 of an IPv4 (dot notation or int), None for anything else"""
+    if isinstance(ip_addr, numbers.Integral):
+        return ip_addr if 0 <= ip_addr <= 0xffffffff else None
+    try:
+        return struct.unpack('!I', socket.inet_aton(ip_addr))[0]
+    except (OSError, socket.error, TypeError, ValueError):
+        return None
+
+
+def row_block(row):
+    """The CIDR block of a bulk row"""
+    if row.get('type') == 'cidr' and row.get('id'):
+        return row['id']
+    return (row.get('cidr') or {}).get('block')
+
+
+def flatten(blocks):
+    """Non overlapping intervals of nested blocks, the most specific wins
+
+    Parameters:
+        blocks: list of (start, end, row) with start and end inclusive
+
+    Returns list of (start, end, row) sorted by start
+    """
+    intervals = []
+
+    def emit(start, end, row):
+        if start > end:
+            return
+        if intervals and intervals[-1][2] == row and \
+                intervals[-1][1] + 1 == start:
+            intervals[-1] = (intervals[-1][0], end, row)
+        else:
+            intervals.append((start, end, row))
+
+    # the larger of two blocks with the same start comes first
+    stack = []
+    position = 0
+    for (start, end, row) in sorted(blocks, key=lambda b: (b[0], -b[1])):
+        while stack and stack[-1][0] < start:
+            (stack_end, stack_row) = stack.pop()
+            emit(position, stack_end, stack_row)
+            position = stack_end + 1
+        if stack:
+            emit(position, start - 1, stack[-1][1])
+        position = start
+        stack.append((end, row))
+    while stack:
+        (stack_end, stack_row) = stack.pop()
+        emit(position, stack_end, stack_row)
+        position = stack_end + 1
+    return intervals
+
+
+class CidrIndex(object):
+    """Longest prefix match of IPv4s against the bulk CIDRs
+
+    Attributes:
+        path (str): the index directory
+        generation (str): the directory of the build that was loaded
+        client: passed to the Cidr and Asn objects
+        max_age (int): seconds before the index is stale, None for never
+        built_at (float): when the index was built
+    """
+    def __init__(self, path, client=None, max_age=None, codec=None):
+        if numpy is None:
+            raise RuntimeError("CidrIndex requires numpy")
+        self.path = path
+        self.client = client
+        self.max_age = max_age
+        self.codec = get_codec(codec)
+        self.generation = generation = self.generation_path(path)
+        with open(os.path.join(generation, 'meta.json')) as file_handle:
+            meta = json.load(file_handle)
+        self.built_at = meta['built_at']
+        for name in ARRAYS:
+            setattr(self, name, numpy.load(
+                os.path.join(generation, name + '.npy'), mmap_mode='r'))
+        data_path = os.path.join(generation, 'rows.json')
+        # numpy can't map an empty file
+        self.data = b''
+        if os.path.getsize(data_path):
+            self.data = numpy.memmap(data_path, dtype=numpy.uint8, mode='r')
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def stale(self):
+        """The index is older than max_age"""
+        return (self.max_age is not None and
+                time.time() - self.built_at > self.max_age)
+
+    @staticmethod
+    def generation_path(path):
+        """The generation directory the index directory points at
+
+        Raises IOError/OSError when the index was never built
+        """
+        with open(os.path.join(path, CURRENT)) as file_handle:
+            return os.path.join(path, file_handle.read().strip())
+
+    @classmethod
+    def build(cls, rows, path):
+        """Build a new generation of the index in path from an iterable of
+        CIDR rows and make it the current one
+
+        Returns (int) number of IPv4 CIDRs indexed
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        generation = tempfile.mkdtemp(prefix=GENERATION_PREFIX, dir=path)
+        try:
+            count = cls._build_generation(rows, generation)
+            try:
+                previous = cls.generation_path(path)
+            except (IOError, OSError):
+                previous = None
+            (handle, tmp_current) = tempfile.mkstemp(prefix=CURRENT,
+                                                     dir=path)
+            with os.fdopen(handle, 'w') as file_handle:
+                file_handle.write(os.path.basename(generation))
+            replace(tmp_current, os.path.join(path, CURRENT))
+        except BaseException:
+            shutil.rmtree(generation, ignore_errors=True)
+            raise
+        cls._remove_old_generations(path, generation, previous)
+        return count
+
+    @staticmethod
+    def _remove_old_generations(path, current, previous):
+        """Remove the generations older than the previous one
+
+        The previous generation is kept for readers that read the current
+        file just before the swap, newer directories may be builds still
+        in progress.
+        """
+        if previous is None or not os.path.isdir(previous):
+            return
+        cutoff = os.path.getmtime(previous)
+        for name in os.listdir(path):
+            generation = os.path.join(path, name)
+            if not name.startswith(GENERATION_PREFIX) or \
+                    generation in (current, previous):
+                continue
+            try:
+                if os.path.getmtime(generation) < cutoff:
+                    shutil.rmtree(generation, ignore_errors=True)
+            except OSError:
+                # removed by another builder
+                pass
+
+    @staticmethod
+    def _build_generation(rows, generation):
+        """Write the index files of one generation
+
+        Returns (int) number of IPv4 CIDRs indexed
+        """
+        blocks = []
+        offsets = [0]
+        with open(os.path.join(generation, 'rows.json'), 'wb') \
+                as file_handle:
+            for row in rows:
+                block = row_block(row)
+                if not block:
+                    continue
+                try:
+                    network = ipaddress.ip_network(u'%s' % block,
+                                                   strict=False)
+                except ValueError:
+                    continue
+                if network.version != 4:
+                    continue
+                # the block as the API rows have it, for Cidr.cidr_block
+                cidr = dict(row.get('cidr') or {}, block=str(network))
+                row = dict(row, type='cidr', id=str(network), cidr=cidr)
+                data = json.dumps(row).encode('utf-8')
+                file_handle.write(data)
+                blocks.append((int(network.network_address),
+                               int(network.broadcast_address),
+                               len(offsets) - 1))
+                offsets.append(offsets[-1] + len(data))
+
+        intervals = flatten(blocks)
+        arrays = {
+            'starts': numpy.array([i[0] for i in intervals],
+                                  dtype=numpy.uint32),
+            'ends': numpy.array([i[1] for i in intervals],
+                                dtype=numpy.uint32),
+            'rows': numpy.array([i[2] for i in intervals], dtype=numpy.int32),
+            'offsets': numpy.array(offsets, dtype=numpy.int64),
+        }
+        for (name, array) in arrays.items():
+            numpy.save(os.path.join(generation, name + '.npy'), array)
+        with open(os.path.join(generation, 'meta.json'), 'w') as file_handle:
+            json.dump({'built_at': time.time(), 'cidrs': len(blocks)},
+                      file_handle)
+        return len(blocks)
+
+    @classmethod
+    def load_or_build(cls, bulk_path, path, **kwargs):
+        """Load the index, building it first when the bulk file is newer
+
+        kwargs are passed to CidrIndex (client, max_age, codec)
+        """
+        try:
+            meta_path = os.path.join(cls.generation_path(path), 'meta.json')
+        except (IOError, OSError):
+            meta_path = None
+        if os.path.exists(bulk_path) and (
+                meta_path is None or not os.path.exists(meta_path) or
+                os.path.getmtime(meta_path) < os.path.getmtime(bulk_path)):
+            with open(bulk_path, 'rb') as file_handle:
+                codec = get_codec(kwargs.get('codec'))
+                cls.build((codec.loads(line) for line in file_handle
+                           if line.strip()), path)
+        return cls(path, **kwargs)
+
+    def lookup_rows(self, ip_addrs):
+        """The row of the most specific CIDR of every IP, in bulk
+
+        Parameters:
+            ip_addrs: numpy array of uint32 IPs or a list of IPv4s
+
+        Returns (numpy.ndarray) int32 row per IP, -1 when no CIDR matches
+        """
+        if isinstance(ip_addrs, numpy.ndarray) and \
+                ip_addrs.dtype.kind in 'ui':
+            values = ip_addrs.astype(numpy.uint32, copy=False)
+            valid = True
+        else:
+            ints = [ip_to_int(ip_addr) for ip_addr in ip_addrs]
+            valid = numpy.array([value is not None for value in ints],
+                                dtype=bool)
+            values = numpy.array([value or 0 for value in ints],
+                                 dtype=numpy.uint32)
+        if not len(self.starts):
+            return numpy.full(len(values), -1, dtype=numpy.int32)
+        # the same dtype as starts, anything else copies the whole array
+        position = numpy.searchsorted(self.starts, values, side='right') - 1
+        clipped = numpy.maximum(position, 0)
+        found = (position >= 0) & (values <= self.ends[clipped]) & valid
+        return numpy.where(found, self.rows[clipped], -1).astype(numpy.int32)
+
+    def lookup_row(self, ip_addr):
+        """The row of the most specific CIDR of one IP, -1 for none"""
+        value = ip_to_int(ip_addr)
+        if value is None or not len(self.starts):
+            return -1
+        position = int(self.starts.searchsorted(numpy.uint32(value),
+                                                side='right')) - 1
+        if position < 0 or value > self.ends[position]:
+            return -1
+        return int(self.rows[position])
+
+    def row(self, row):
+        """The CIDR row (dict) of a row number"""
+        start = int(self.offsets[row])
+        end = int(self.offsets[row + 1])
+        return self.codec.loads(bytes(self.data[start:end]))
+
+    def lookup(self, ip_addr):
+        """The most specific Cidr of an IP or None"""
+        row = self.lookup_row(ip_addr)
+        if row < 0:
+            return None
+        return Cidr(self.client, self.row(row))
+
+    def lookup_asn(self, ip_addr):
+        """The Asn of the most specific CIDR of an IP or None"""
+        row = self.lookup_row(ip_addr)
+        if row < 0:
+            return None
+        return self.asn_for_row(self.row(row))
+
+    def asn_for_row(self, intel):
+        asn = intel.get('asn')
+        if not asn:
+            return None
+        data = dict((key, intel[key]) for key in ('asn', 'country', 'rir')
+                    if key in intel)
+        data.update(type='asn', id=str(asn.get('number')))
+        return Asn(self.client, data)
+
+    def lookup_many(self, ip_addrs):
+        """Yield (ip, Cidr or None) for every IP
+
+        A row is decoded once, every Cidr gets its own copy of it.
+        """
+        rows = self.lookup_rows(ip_addrs)
+        cache = {}
+        for (ip_addr, row) in zip(ip_addrs, rows.tolist()):
+            if row < 0:
+                yield (ip_addr, None)
+                continue
+            if row not in cache:
+                cache[row] = self.row(row)
+            yield (ip_addr, Cidr(self.client, deepcopy(cache[row])))
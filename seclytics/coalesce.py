@@ -0,0 +1,159 @@
+"""Coalesce concurrent identical lookups
+
+SingleFlight runs one call per key at a time, threads asking for a key
+that is already being fetched wait for that call and share its result.
+
+MicroBatcher collects the single lookups made within a short window and
+fetches them with one multiple lookup request.
+
+    client = Seclytics(access_token, coalesce=True, batch_window=0.005)
+    # from many threads, one GET /ips/?ids=... for all of them
+    client.ip(ip_addr)
+"""
+from copy import deepcopy
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight(object):
+    """Shares the result of a call with the threads making the same call
+
+    Attributes:
+        calls (int): calls made
+        shared (int): calls answered by another thread's call
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def do(self, key, func):
+        """func() unless a call for key is in flight, then its result
+
+        Waiting threads get a copy of the result so they can't see each
+        other's changes. An exception raised by func is raised in every
+        waiting thread.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return deepcopy(future.result())
+        try:
+            result = func()
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return result
+
+
+class _Batch(object):
+    __slots__ = ('futures', 'full')
+
+    def __init__(self):
+        self.futures = {}
+        self.full = threading.Event()
+
+
+class MicroBatcher(object):
+    """Merges the keys requested within window seconds into one fetch
+
+    The first thread of a batch waits the window (or until max_size keys
+    are waiting) and calls fetch for everyone, the others wait for their
+    result. The same key requested twice in a batch is fetched once, the
+    second thread gets a copy of the result.
+
+    When fetch raises one of fallback_errors for a batch of several keys,
+    e.g. because one of the keys is invalid, every thread calls fallback
+    for its own key instead, so one bad key doesn't fail the others.
+
+    Parameters:
+        fetch: called with (keys, group), returns a dict of key to result,
+            keys it leaves out get None
+        window (float): seconds to collect keys for
+        max_size (int): keys fetched at once
+        fallback: called with (key, group) after a failed batch
+        fallback_errors (tuple): the fetch errors fallback is used for
+
+    Attributes:
+        keys (int): keys requested
+        fetches (int): fetch calls made
+    """
+    def __init__(self, fetch, window=0.005, max_size=100, fallback=None,
+                 fallback_errors=(Exception,)):
+        self.fetch = fetch
+        self.window = window
+        self.max_size = max_size
+        self.fallback = fallback
+        self.fallback_errors = fallback_errors
+        self.keys = 0
+        self.fetches = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, key, group=None):
+        """The result for key, keys with the same group are fetched
+        together"""
+        with self._lock:
+            self.keys += 1
+            batch = self._pending.get(group)
+            leader = batch is None
+            if leader:
+                batch = self._pending[group] = _Batch()
+            future = batch.futures.get(key)
+            shared = future is not None
+            if not shared:
+                future = batch.futures[key] = Future()
+            if len(batch.futures) >= self.max_size:
+                # later keys start the next batch
+                del self._pending[group]
+                batch.full.set()
+        if leader:
+            self._lead(batch, group)
+        try:
+            result = future.result()
+        except self.fallback_errors:
+            if self.fallback is None or len(batch.futures) < 2:
+                raise
+            return self.fallback(key, group)
+        return deepcopy(result) if shared else result
+
+    def _lead(self, batch, group):
+        """Wait for the batch to fill and fetch it"""
+        try:
+            batch.full.wait(self.window)
+            self._close(batch, group)
+            with self._lock:
+                self.fetches += 1
+            try:
+                results = self.fetch(list(batch.futures), group)
+            except Exception as error:
+                for future in batch.futures.values():
+                    future.set_exception(error)
+                return
+            for (key, future) in batch.futures.items():
+                future.set_result(results.get(key))
+        finally:
+            # e.g. KeyboardInterrupt, the other threads mustn't hang
+            self._close(batch, group)
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError("Batch lookup interrupted"))
+
+    def _close(self, batch, group):
+        """Stop adding keys to the batch"""
+        with self._lock:
+            if self._pending.get(group) is batch:
+                del self._pending[group]
@@ -0,0 +1,10 @@
+"""Python 2 and 3 compatibility helpers"""
+import os
+
+# os.replace is atomic on every platform, python 2 only has rename
+replace = getattr(os, 'replace', os.rename)
+
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
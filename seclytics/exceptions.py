@@ -8,3 +8,7 @@ class OverQuota(Exception):
 
 class ApiError(Exception):
     """General API Error"""
+
+
+class DownloadError(ApiError):
+    """Download was incomplete or failed verification"""
@@ -0,0 +1,43 @@
+"""Find the IP addresses in raw log lines
+
+Works on any text: syslog, CSV columns, JSON fields, Zeek or netflow
+TSV. Addresses glued to other digits, dots or words (v1.2.3.4,
+1.2.3.4abc) are skipped so version numbers, timestamps and MAC addresses
+don't match.
+
+    extract_ips('Jan 1 sshd[42]: Failed from 10.0.0.1 port 22')
+    ['10.0.0.1']
+"""
+import re
+
+_OCTET = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+# the lookahead rejects most positions before trying the octets
+IPV4 = (r'(?<![\w.])(?=\d{1,3}\.\d)' + r'(?:%s\.){3}%s' % (_OCTET, _OCTET) +
+        r'(?!\w|\.\d)')
+
+_HEX = r'[0-9a-f]{1,4}'
+# the full form or a single :: standing in for the zero groups
+IPV6 = (r'(?<![\w:.])(?:' +
+        '|'.join([
+            r'(?:{h}:){{7}}{h}',
+            r'(?:{h}:){{1,7}}:',
+            r'(?:{h}:){{1,6}}:{h}',
+            r'(?:{h}:){{1,5}}(?::{h}){{1,2}}',
+            r'(?:{h}:){{1,4}}(?::{h}){{1,3}}',
+            r'(?:{h}:){{1,3}}(?::{h}){{1,4}}',
+            r'(?:{h}:){{1,2}}(?::{h}){{1,5}}',
+            r'{h}:(?::{h}){{1,6}}',
+            r':(?::{h}){{1,7}}',
+        ]).format(h=_HEX) +
+        r')(?![\w:.])')
+
+IPV4_PATTERN = re.compile(IPV4)
+IP_PATTERN = re.compile(IPV4 + '|' + IPV6, re.IGNORECASE)
+
+
+def extract_ips(text, ipv6=True):
+    """The IPv4 (and IPv6) addresses in text, in order"""
+    # every IPv6 form has a :: or 7 colons, most lines have neither
+    if ipv6 and ('::' in text or text.count(':') >= 7):
+        return IP_PATTERN.findall(text)
+    return IPV4_PATTERN.findall(text)
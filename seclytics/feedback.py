@@ -0,0 +1,156 @@
+"""Submit analyst verdicts (threat data and false positives) in bulk
+
+    verdicts = [
+        {'type': 'ip', 'id': '1.2.3.4', 'classification': 'malicious',
+         'category': 'scanner', 'feed': 'soc'},
+        {'type': 'host', 'id': 'example.com', 'classification': 'benign',
+         'reason': 'false positive'},
+    ]
+    for result in client.submit_feedback(verdicts):
+        if not result.ok:
+            print(result.item, result.error)
+
+The API takes one verdict per request, so the verdicts are grouped by
+IOC type (GROUP_SIZE verdicts at a time) and batches are posted
+concurrently over the client's pool.
+FeedbackQueue sends them from a background thread.
+"""
+from collections import namedtuple
+import logging
+import threading
+import requests
+from .compat import quote
+from .exceptions import ApiError, OverQuota
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger(__name__)
+
+CLASSIFICATIONS = ('malicious', 'benign')
+# the optional verdict fields sent with the classification
+FIELDS = ('category', 'reason', 'feed')
+
+# errors reported per verdict, anything else stops the submission
+FEEDBACK_ERRORS = (ApiError, OverQuota, requests.RequestException)
+
+# verdicts read from the input and grouped by type at a time
+GROUP_SIZE = 10000
+
+FeedbackResult = namedtuple('FeedbackResult', 'item ok response error')
+
+
+def feedback_data(classification, **fields):
+    """The params of a verdict, fields that are None are left out"""
+    if classification not in CLASSIFICATIONS:
+        raise ValueError("classification must be one of %s" %
+                         ', '.join(CLASSIFICATIONS))
+    data = {'classification': classification}
+    for name in FIELDS:
+        if fields.get(name):
+            data[name] = fields[name]
+    return data
+
+
+def feedback_path(ioc_type, ioc_id):
+    """The API path of an IOC's verdicts, the id is quoted"""
+    return '/%ss/%s' % (ioc_type, quote('%s' % (ioc_id,), safe=''))
+
+
+def group_by_type(items):
+    """dict of IOC type to its verdicts, in input order"""
+    groups = {}
+    for item in items:
+        groups.setdefault(item.get('type'), []).append(item)
+    return groups
+
+
+class FeedbackQueue(object):
+    """Sends verdicts from a background thread
+
+    put() never blocks on the API. Verdicts are sent batch_size at a time,
+    or every interval seconds when fewer are waiting. Each result is
+    passed to on_result, failures are logged when it isn't given.
+
+        with FeedbackQueue(client) as feedback:
+            feedback.put({'type': 'ip', 'id': ip, 'classification': 'benign'})
+
+    Attributes:
+        sent (int): verdicts sent
+        failed (int): verdicts that failed
+    """
+    def __init__(self, client, batch_size=500, interval=1.0,
+                 on_result=None, max_size=0):
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.on_result = on_result
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue(max_size)
+        self._closed = threading.Event()
+        # put and close take it so nothing is queued once closed is set
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def put(self, item):
+        """Queue a verdict dict, see submit_feedback"""
+        with self._lock:
+            if self._closed.is_set():
+                raise ValueError("FeedbackQueue is closed")
+            self._queue.put(item)
+
+    def close(self):
+        """Send the queued verdicts and stop the thread"""
+        with self._lock:
+            self._closed.set()
+        self._thread.join()
+
+    def _take(self):
+        """Up to batch_size verdicts, waiting at most interval"""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while True:
+            # checked before taking, an empty take after close means every
+            # verdict was sent
+            closed = self._closed.is_set()
+            batch = self._take()
+            if not batch:
+                if closed:
+                    return
+                continue
+            try:
+                results = list(self.client.submit_feedback(batch))
+            except Exception as error:
+                # e.g. an invalid access token, keep the thread alive
+                logger.exception("Feedback batch of %d failed", len(batch))
+                results = [FeedbackResult(item, False, None, error)
+                           for item in batch]
+            for result in results:
+                if result.ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                if self.on_result is not None:
+                    self.on_result(result)
+                elif not result.ok:
+                    logger.warning("Feedback for %s failed: %s",
+                                   result.item.get('id'), result.error)
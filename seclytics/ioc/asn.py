@@ -2,6 +2,8 @@ from .ioc import Ioc
 
 
 class Asn(Ioc):
+    __slots__ = ()
+
     @property
     def asn_descrpition(self):
         if 'asn' not in self.intel:
@@ -2,6 +2,8 @@ from .asn import Asn
 
 
 class Cidr(Asn):
+    __slots__ = ()
+
     @property
     def cidr_block(self):
         if 'cidr' not in self.intel:
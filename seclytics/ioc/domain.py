@@ -2,6 +2,7 @@ from .host import Host
 
 
 class Domain(Host):
+    __slots__ = ()
 
     @property
     def suffix(self):
@@ -2,6 +2,8 @@ from .ioc import Ioc
 
 
 class FileHash(Ioc):
+    __slots__ = ()
+
     @property
     def hash(self):
         return self['hash']
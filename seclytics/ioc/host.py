@@ -2,6 +2,8 @@ from .ioc import Ioc
 
 
 class Host(Ioc):
+    __slots__ = ()
+
     @property
     def domain(self):
         return self['domain']
@@ -1,43 +1,101 @@
 from datetime import datetime
+from ..feedback import feedback_data, feedback_path
+
+# marks a lazily computed value that hasn't been computed yet
+_UNSET = object()
 
 
 class Ioc(object):
+    """Threat intel for a single IOC
+
+    Uses __slots__ so millions of results stay small. Parsed dates and the
+    index of the namespaced context are computed on first access and
+    cached, the context accessors return copies of the cached lists.
+
+    Attributes:
+        client: the seclytics api client
+        intel (dict): the raw API response
+    """
+    __slots__ = ('client', 'intel', '_predicted_at', '_first_reported_at',
+                 '_context')
+    time_fmt = u"%Y-%m-%dT%H:%M:%S"
 
     def __init__(self, client, intel):
         self.client = client
-        self.time_fmt = u"%Y-%m-%dT%H:%M:%S"
         self.intel = intel
+        self._predicted_at = _UNSET
+        self._first_reported_at = _UNSET
+        self._context = None
+
+    @property
+    def api_client(self):
+        """The client, named like the Node attribute"""
+        return self.client
+
+    @property
+    def connections(self):
+        """Iterates over the connections loading IOCs"""
+        if 'connections' not in self.intel:
+            return
+        from ..node import Node
+        for edge in self.intel['connections']:
+            yield Node.build_for_row(self.client, edge)
 
     @property
     def reported_by(self):
         '''Which data source categorized this IOC
         This could be a feed or another provider of threat intelligence.
         '''
-        reported_by = []
-        if 'context' not in self.intel:
-            return reported_by
-        reported_by = self.intel[u'context'][u'categories'].keys()
-        return reported_by
+        return list(self._index_context()[2])
 
     @property
     def has_threat_intel(self):
         '''Returns True if we have intel or False if there is none'''
-        return len(self.reported_by) > 0
+        return len(self._index_context()[2]) > 0
+
+    def _index_context(self):
+        '''Index every namespaced kind of the context in one pass
+
+        Returns (by_source, flattened, reported_by), computed once per IOC.
+        '''
+        if self._context is not None:
+            return self._context
+        by_source = {}
+        flattened = {}
+        context = self.intel.get(u'context') or {}
+        for (kind, sources) in context.items():
+            # non namespaced entries like cidrs and ips are plain lists
+            if not isinstance(sources, dict):
+                continue
+            by_source[kind] = sources
+            seen = set()
+            values = []
+            for source_values in sources.values():
+                for value in source_values:
+                    if value not in seen:
+                        seen.add(value)
+                        values.append(value)
+            flattened[kind] = values
+        reported_by = list(by_source.get(u'categories', ()))
+        self._context = (by_source, flattened, reported_by)
+        return self._context
 
     def _namespaced_values(self, kind):
         '''Extract all the namespaced values (internal use)
         To keep track of what source said what each field in the context is
         namespaced by the source who reported it.
         '''
-        values = []
-        if 'context' not in self.intel:
-            return values
-        context = self.intel[u'context']
-        if kind in context:
-            values = set([v
-                          for src, value in context[kind].items()
-                          for v in value])
-        return list(values)
+        return list(self._index_context()[1].get(kind, ()))
+
+    def namespaced_by_source(self, kind):
+        '''The values of a context field keyed by the source that reported
+        them, e.g. namespaced_by_source('categories')['feed'] '''
+        return dict(self._index_context()[0].get(kind, {}))
+
+    @property
+    def categories_by_source(self):
+        '''The categories each source reported'''
+        return self.namespaced_by_source(u'categories')
 
     @property
     def categories(self):
@@ -83,21 +141,26 @@ class Ioc(object):
     @property
     def predicted_at(self):
         '''The current predicted_at'''
-        if u'prediction' not in self.intel:
-            return None
-        prediction = self.intel[u'prediction']
-        return datetime.strptime(prediction[u'predicted_at'], self.time_fmt)
+        if self._predicted_at is _UNSET:
+            predicted_at = None
+            if u'prediction' in self.intel:
+                prediction = self.intel[u'prediction']
+                predicted_at = datetime.strptime(prediction[u'predicted_at'],
+                                                 self.time_fmt)
+            self._predicted_at = predicted_at
+        return self._predicted_at
 
     @property
     def first_reported_at(self):
         '''The first time this IOC has been seen by our threat intel'''
-
-        if u'history' not in self.intel:
-            return None
-        history = self.intel[u'history']
-        if u'first_seen_at' not in history:
-            return None
-        return datetime.strptime(history[u'first_seen_at'], self.time_fmt)
+        if self._first_reported_at is _UNSET:
+            first_reported_at = None
+            history = self.intel.get(u'history')
+            if history and u'first_seen_at' in history:
+                first_reported_at = datetime.strptime(
+                    history[u'first_seen_at'], self.time_fmt)
+            self._first_reported_at = first_reported_at
+        return self._first_reported_at
 
     @property
     def ioc_type(self):
@@ -138,21 +201,19 @@ class Ioc(object):
         return min_ranking
 
     def record_threat_data(self, category=None, reason=None, feed=None):
-        data = {'classification': 'malicious'}
-        if category:
-            data['category'] = category
-        if reason:
-            data['reason'] = reason
-        if feed:
-            data['feed'] = feed
-        path = '/%ss/%s' % (self.ioc_type, self.ioc_id)
-        return self.client._post_data(path, data)
+        data = feedback_data('malicious', category=category, reason=reason,
+                             feed=feed)
+        return self.client._post_data(self._feedback_path, data)
 
     def mark_as_good(self, reason=None, feed=None):
-        data = {'classification': 'benign'}
-        if reason:
-            data['reason'] = reason
-        if feed:
-            data['feed'] = feed
-        path = '/%ss/%s' % (self.ioc_type, self.ioc_id)
-        return self.client._post_data(path, data)
+        data = feedback_data('benign', reason=reason, feed=feed)
+        return self.client._post_data(self._feedback_path, data)
+
+    @property
+    def _feedback_path(self):
+        return feedback_path(self.ioc_type, self.ioc_id)
+
+    def feedback(self, classification, **fields):
+        """This IOC's verdict for client.submit_feedback"""
+        return dict(fields, type=self.ioc_type, id=self.ioc_id,
+                    classification=classification)
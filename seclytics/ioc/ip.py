@@ -2,6 +2,8 @@ from .cidr import Cidr
 
 
 class Ip(Cidr):
+    __slots__ = ()
+
     @property
     def score(self):
         if 'score' not in self.intel:
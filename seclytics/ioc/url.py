@@ -2,6 +2,7 @@ from .host import Host
 
 
 class Url(Host):
+    __slots__ = ()
 
     @property
     def ips(self):
@@ -0,0 +1,112 @@
+"""JSON encoding and decoding with the fastest library installed
+
+orjson, ujson and simdjson are used when installed, the stdlib json module
+is the fallback. They all decode to the same dicts and lists.
+
+    codec = get_codec()          # the fastest one installed
+    codec = get_codec('json')    # always the stdlib
+    codec.loads(response.content)
+"""
+import json
+from .batching import string_types
+
+
+class JsonCodec(object):
+    """The stdlib json module
+
+    Attributes:
+        name (str): the library name
+    """
+    name = 'json'
+
+    def loads(self, data):
+        """Decode JSON bytes or text"""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """Encode to JSON text"""
+        return json.dumps(obj)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.module = orjson
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+    def dumps(self, obj):
+        return self.module.dumps(obj).decode('utf-8')
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.module = ujson
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+    def dumps(self, obj):
+        return self.module.dumps(obj, escape_forward_slashes=False)
+
+
+class SimdjsonCodec(JsonCodec):
+    """pysimdjson only decodes, encoding uses the stdlib"""
+    name = 'simdjson'
+
+    def __init__(self):
+        import simdjson
+        self.module = simdjson
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+
+# fastest first
+CODECS = [OrjsonCodec, UjsonCodec, SimdjsonCodec, JsonCodec]
+
+
+def available_codecs():
+    """The names of the installed codecs, fastest first"""
+    names = []
+    for codec_class in CODECS:
+        try:
+            codec_class()
+        except ImportError:
+            continue
+        names.append(codec_class.name)
+    return names
+
+
+def get_codec(codec=None):
+    """Get a codec by name, or the fastest one installed
+
+    Parameters:
+        codec: None for the fastest installed, a name ('orjson', 'ujson',
+            'simdjson', 'json') or an object with loads and dumps which
+            is returned as is
+
+    Raises ValueError for unknown names and ImportError when the named
+    library is not installed.
+    """
+    if codec is None:
+        for codec_class in CODECS:
+            try:
+                return codec_class()
+            except ImportError:
+                continue
+    if not isinstance(codec, string_types):
+        return codec
+    for codec_class in CODECS:
+        if codec_class.name == codec:
+            return codec_class()
+    raise ValueError("Unknown JSON codec %r, expected one of %s" %
+                     (codec, ', '.join(c.name for c in CODECS)))
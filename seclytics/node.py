@@ -2,11 +2,24 @@
 from .ioc import Ip, Cidr, Asn, Host, FileHash, Domain, Url
 from . import __version__
 
+TYPE_TO_MODULE = {
+    'asn': Asn,
+    'cidr': Cidr,
+    'domain': Domain,
+    'file': FileHash,
+    'host': Host,
+    'ip': Ip,
+    'url': Url
+}
+
 
 class Node(object):
     """Node wraps each IOC
 
     Allows us to call connections without creating circular dependencies.
+    The client now gets the IOC objects straight from build_for_row, which
+    have the same attributes without the proxy, Node is kept for code that
+    wraps IOCs itself.
 
     Attributes:
         api_client: the seclytics api client
@@ -38,22 +51,13 @@ class Node(object):
 
     @staticmethod
     def build_for_row(api_client, row):
-        """Use the type attribute to build a Node
+        """Use the type attribute to build the IOC
 
         returns:
-            Node object of IOC
+            Ioc subclass for the row type (Ip, Host...) or None
         """
-        type_to_module = {
-            'asn': Asn,
-            'cidr': Cidr,
-            'domain': Domain,
-            'file': FileHash,
-            'host': Host,
-            'ip': Ip,
-            'url': Url
-        }
-        row_module = type_to_module.get(row['type'])
+        row_module = TYPE_TO_MODULE.get(row.get('type'))
         if not row_module:
             return None
 
-        return Node(api_client, row_module(api_client, row))
+        return row_module(api_client, row)
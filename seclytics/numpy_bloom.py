@@ -0,0 +1,217 @@
+"""Read only numpy reader for pybloomfilter bloom files
+
+The bloom files from the bulk API are written by pybloomfilter. The file
+is memory mapped read only, so every process reading the same file shares
+one page cached copy, and keys are hashed in bulk with a vectorized
+MurmurHash3_x64_128.
+
+File layout (little endian):
+    9 bytes      magic "MBITARRAY"
+    uint64       number of bits
+    int32        header length
+    header       C BloomFilter struct, uint32 num_hashes at offset 16
+                 followed by uint32 hash_seeds[256]
+    bit array    starts at the next multiple of 256 bytes
+"""
+import os
+import struct
+import numpy
+
+MAGIC = b'MBITARRAY'
+PREAMBLE_ALIGNMENT = 256
+
+_C1 = numpy.uint64(0x87c37b91114253d5)
+_C2 = numpy.uint64(0x4cf5ad432745937f)
+_FMIX1 = numpy.uint64(0xff51afd7ed558ccd)
+_FMIX2 = numpy.uint64(0xc4ceb9fe1a85ec53)
+_H1_ADD = numpy.uint64(0x52dce729)
+_H2_ADD = numpy.uint64(0x38495ab5)
+_FIVE = numpy.uint64(5)
+_SHIFT33 = numpy.uint64(33)
+_MASK64 = (1 << 64) - 1
+
+
+def _rotl(value, bits):
+    return (value << numpy.uint64(bits)) | (value >> numpy.uint64(64 - bits))
+
+
+def _fmix(value):
+    value = value ^ (value >> _SHIFT33)
+    value = value * _FMIX1
+    value = value ^ (value >> _SHIFT33)
+    value = value * _FMIX2
+    return value ^ (value >> _SHIFT33)
+
+
+def pack_keys(keys):
+    """Pack keys into a zero padded block for murmur3_many
+
+    Returns (words, lengths) where words is a (n, blocks * 2) uint64 array
+    with room for one empty block after the longest key.
+    """
+    try:
+        # numpy encodes ascii str to zero padded bytes in one pass
+        packed = numpy.array(keys, dtype=bytes)
+    except UnicodeEncodeError:
+        keys = [key if isinstance(key, bytes) else key.encode('utf8')
+                for key in keys]
+        packed = numpy.array(keys, dtype=bytes)
+    lengths = numpy.fromiter((len(key) for key in keys),
+                             dtype=numpy.uint64, count=len(keys))
+    width = (packed.dtype.itemsize // 16 + 1) * 16
+    packed = packed.astype('S%d' % width)
+    words = packed.view('<u8').reshape(len(keys), width // 8)
+    return words.astype(numpy.uint64, copy=False), lengths
+
+
+def murmur3_many(words, lengths, seed):
+    """MurmurHash3_x64_128 of packed keys, returns h1 ^ h2 per key"""
+    rows = numpy.arange(len(lengths))
+    nblocks = (lengths // numpy.uint64(16)).astype(numpy.intp)
+    h1 = numpy.full(len(lengths), seed, dtype=numpy.uint64)
+    h2 = h1.copy()
+
+    # body, only keys with at least i + 1 full blocks take part
+    for i in range(int(nblocks.max()) if len(nblocks) else 0):
+        in_block = nblocks > i
+        k1 = words[:, 2 * i] * _C1
+        k1 = _rotl(k1, 31) * _C2
+        new_h1 = h1 ^ k1
+        new_h1 = (_rotl(new_h1, 27) + h2) * _FIVE + _H1_ADD
+        k2 = words[:, 2 * i + 1] * _C2
+        k2 = _rotl(k2, 33) * _C1
+        new_h2 = h2 ^ k2
+        new_h2 = (_rotl(new_h2, 31) + new_h1) * _FIVE + _H2_ADD
+        h1 = numpy.where(in_block, new_h1, h1)
+        h2 = numpy.where(in_block, new_h2, h2)
+
+    # tail, the padding is zero so a missing tail mixes in nothing
+    k1 = words[rows, 2 * nblocks]
+    k2 = words[rows, 2 * nblocks + 1]
+    h2 = h2 ^ (_rotl(k2 * _C2, 33) * _C1)
+    h1 = h1 ^ (_rotl(k1 * _C1, 31) * _C2)
+
+    h1 = h1 ^ lengths
+    h2 = h2 ^ lengths
+    h1 = h1 + h2
+    h2 = h2 + h1
+    h1 = _fmix(h1)
+    h2 = _fmix(h2)
+    h1 = h1 + h2
+    h2 = h2 + h1
+    return h1 ^ h2
+
+
+def _rotl64(value, bits):
+    return ((value << bits) | (value >> (64 - bits))) & _MASK64
+
+
+def _fmix64(value):
+    value ^= value >> 33
+    value = (value * 0xff51afd7ed558ccd) & _MASK64
+    value ^= value >> 33
+    value = (value * 0xc4ceb9fe1a85ec53) & _MASK64
+    return value ^ (value >> 33)
+
+
+def murmur3(key, seed):
+    """murmur3_many of a single bytes key with python ints
+
+    Numpy has a fixed cost per call that is far more than hashing one
+    short key.
+    """
+    length = len(key)
+    nblocks = length // 16
+    padded = key + b'\0' * ((nblocks + 1) * 16 - length)
+    words = struct.unpack('<%dQ' % ((nblocks + 1) * 2), padded)
+    h1 = h2 = seed
+    for i in range(nblocks):
+        k1 = _rotl64((words[2 * i] * 0x87c37b91114253d5) & _MASK64, 31)
+        h1 ^= (k1 * 0x4cf5ad432745937f) & _MASK64
+        h1 = (((_rotl64(h1, 27) + h2) * 5) + 0x52dce729) & _MASK64
+        k2 = _rotl64((words[2 * i + 1] * 0x4cf5ad432745937f) & _MASK64, 33)
+        h2 ^= (k2 * 0x87c37b91114253d5) & _MASK64
+        h2 = (((_rotl64(h2, 31) + h1) * 5) + 0x38495ab5) & _MASK64
+
+    k1 = words[2 * nblocks]
+    k2 = words[2 * nblocks + 1]
+    h2 ^= (_rotl64((k2 * 0x4cf5ad432745937f) & _MASK64, 33) *
+           0x87c37b91114253d5) & _MASK64
+    h1 ^= (_rotl64((k1 * 0x87c37b91114253d5) & _MASK64, 31) *
+           0x4cf5ad432745937f) & _MASK64
+
+    h1 ^= length
+    h2 ^= length
+    h1 = (h1 + h2) & _MASK64
+    h2 = (h2 + h1) & _MASK64
+    h1 = _fmix64(h1)
+    h2 = _fmix64(h2)
+    h1 = (h1 + h2) & _MASK64
+    h2 = (h2 + h1) & _MASK64
+    return h1 ^ h2
+
+
+class NumpyBloom(object):
+    """Memory mapped, read only pybloomfilter file
+
+    Attributes:
+        path (str): the bloom file
+        num_bits (int): size of the bit array
+        hash_seeds (list): murmur seed for each hash
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file_handle:
+            preamble = file_handle.read(len(MAGIC) + 12)
+            if preamble[:len(MAGIC)] != MAGIC:
+                raise ValueError("Invalid bloom file: %s" % path)
+            (num_bits, header_len) = struct.unpack('<Qi',
+                                                   preamble[len(MAGIC):])
+            header = file_handle.read(header_len)
+        (num_hashes,) = struct.unpack_from('<I', header, 16)
+        self.num_bits = num_bits
+        self.hash_seeds = list(struct.unpack_from('<%dI' % num_hashes,
+                                                  header, 20))
+
+        preamble_bytes = len(MAGIC) + 12 + header_len
+        offset = -(-preamble_bytes // PREAMBLE_ALIGNMENT) * PREAMBLE_ALIGNMENT
+        num_bytes = -(-num_bits // 8)
+        if os.path.getsize(path) < offset + num_bytes:
+            raise ValueError("Truncated bloom file: %s" % path)
+        self.bits = numpy.memmap(path, dtype=numpy.uint8, mode='r',
+                                 offset=offset, shape=(num_bytes,))
+        self._num_bits = numpy.uint64(num_bits)
+
+    def __contains__(self, value):
+        if not isinstance(value, bytes):
+            value = value.encode('utf8')
+        bits = self.bits
+        for seed in reversed(self.hash_seeds):
+            bit = murmur3(value, seed) % self.num_bits
+            if not bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def contains_many(self, values):
+        """Check a sequence of str or bytes values
+
+        Returns (numpy.ndarray) bool per value
+        """
+        found = numpy.ones(len(values), dtype=bool)
+        if not len(values):
+            return found
+        (words, lengths) = pack_keys(values)
+        # pybloomfilter tests the seeds last to first
+        for seed in reversed(self.hash_seeds):
+            # only hash the keys that haven't already missed
+            candidates = numpy.flatnonzero(found)
+            if not len(candidates):
+                break
+            hashes = murmur3_many(words[candidates], lengths[candidates],
+                                  seed)
+            bit = hashes % self._num_bits
+            byte = self.bits[(bit >> numpy.uint64(3)).astype(numpy.intp)]
+            mask = numpy.left_shift(1, (bit & numpy.uint64(7)).astype(
+                numpy.uint8))
+            found[candidates] = (byte & mask) != 0
+        return found
@@ -0,0 +1,150 @@
+"""Iterate every page of a collection endpoint"""
+from concurrent.futures import ThreadPoolExecutor
+from .exceptions import ApiError
+from .node import Node
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+
+class PageIterator(object):
+    """Iterates the IOCs of every page of a collection endpoint
+
+    After each page the response is checked for the next one: a ``next``
+    (or ``links.next``) URL is followed as is, a ``cursor`` (or
+    ``next_cursor``) is sent back as the cursor param. Iteration stops
+    when neither is present or a URL or cursor comes back a second time.
+    Next URLs on another host than the client's base_url raise ApiError,
+    the access token is only sent to the API.
+
+    Rows are streamed one page at a time. With prefetch the next page is
+    requested while the current page is consumed, which holds up to two
+    whole pages in memory.
+
+    It can be iterated again (requesting the pages again) or used like a
+    generator with next(), iterating it then carries on from there.
+
+        ips = client.cidr_ips('10.0.0.0/16')
+        for ip in ips:
+            ...
+        print(ips.pages, ips.rows, ips.total)
+
+    Attributes:
+        pages (int): pages received so far
+        rows (int): rows yielded so far
+        total (int): total rows if the API reports it
+        done (bool): all pages were consumed
+    """
+    def __init__(self, client, path, params=None, prefetch=False):
+        self.client = client
+        self.path = path
+        self.params = params or {}
+        self.prefetch = prefetch
+        self.pages = 0
+        self.rows = 0
+        self.total = None
+        self.done = False
+        self._iterator = None
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = self._rows()
+        return next(self._iterator)
+
+    # python 2
+    next = __next__
+
+    def __iter__(self):
+        # after next() iteration carries on where it stopped
+        if self._iterator is not None:
+            return self._iterator
+        return self._rows()
+
+    def _rows(self):
+        pages = self._prefetched_pages() if self.prefetch else self._pages()
+        for rows in pages:
+            for row in rows:
+                self.rows += 1
+                yield Node.build_for_row(self.client, row)
+        self.done = True
+
+    def _fetch_page(self, request):
+        meta = {}
+        rows = list(self.client._get_rows(request[0], dict(request[1]),
+                                          meta=meta))
+        return (rows, meta)
+
+    def _pages(self):
+        """One page at a time, streamed rows when the client streams"""
+        request = (self.path, self.params)
+        seen = set()
+        while request:
+            meta = {}
+            yield self.client._get_rows(request[0], dict(request[1]),
+                                        meta=meta)
+            # the rows have been consumed so meta is complete
+            self._read_meta(meta)
+            request = self._next_request(request, meta, seen)
+
+    def _prefetched_pages(self):
+        """Request the next page while the current one is consumed"""
+        request = (self.path, self.params)
+        seen = set()
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(self._fetch_page, request)
+        try:
+            while future is not None:
+                (rows, meta) = future.result()
+                self._read_meta(meta)
+                request = self._next_request(request, meta, seen)
+                future = None
+                if request:
+                    future = executor.submit(self._fetch_page, request)
+                yield rows
+        finally:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _read_meta(self, meta):
+        self.pages += 1
+        if meta.get('total') is not None:
+            self.total = meta['total']
+
+    def _check_host(self, url):
+        """Raise ApiError for a URL that isn't on the API's host"""
+        parsed = urlparse(url)
+        if not parsed.scheme:
+            return
+        api = urlparse(self.client.base_url)
+        if (parsed.scheme, parsed.netloc) != (api.scheme, api.netloc):
+            raise ApiError("Next page is not on the API host: %s" % url)
+
+    def _next_request(self, request, meta, seen):
+        """The (path, params) of the next page or None
+
+        seen has the next URLs and cursors already followed, one coming
+        back is a cycle.
+        """
+        seen.add(self.client._url(request[0]))
+        if request[1].get('cursor'):
+            seen.add(('cursor', request[1]['cursor']))
+        links = meta.get('links')
+        next_url = meta.get('next')
+        if not next_url and isinstance(links, dict):
+            next_url = links.get('next')
+        if next_url:
+            if self.client._url(next_url) in seen:
+                return None
+            self._check_host(next_url)
+            # the next URL already has the query params
+            return (next_url, {})
+
+        cursor = meta.get('cursor') or meta.get('next_cursor')
+        if not cursor or ('cursor', cursor) in seen:
+            return None
+        params = dict(request[1])
+        params['cursor'] = cursor
+        return (request[0], params)
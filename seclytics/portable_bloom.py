@@ -1,18 +1,65 @@
 import sys
 import os
-from pybloomfilter import BloomFilter
+
+try:
+    import numpy
+    from .numpy_bloom import NumpyBloom
+except ImportError:
+    numpy = None
+    NumpyBloom = None
+
+try:
+    from pybloomfilter import BloomFilter
+except ImportError:
+    BloomFilter = None
 
 
 class PortableBloom(object):
-    """Wraps bloom filter module"""
+    """Wraps bloom filter module
+
+    The bloom file is read with pybloomfilter when it's installed, its
+    single checks are the fastest, otherwise with the numpy reader.
+    """
     bloom = None
 
-    def __init__(self, path):
+    def __init__(self, path, backend=None):
+        """Open a bloom file
+
+        Parameters:
+            path: the bloom file
+            backend: 'pybloomfilter' or 'numpy', defaults to the first one
+                installed
+        """
         if not os.path.exists(path):
             raise RuntimeError("Missing Bloom: %s" % path)
-        self.bloom = BloomFilter.open(path)
+        if backend is None:
+            backend = 'pybloomfilter' if BloomFilter else 'numpy'
+        if backend == 'numpy' and NumpyBloom:
+            self.bloom = NumpyBloom(path)
+        elif backend == 'pybloomfilter' and BloomFilter:
+            self.bloom = BloomFilter.open(path)
+        else:
+            raise RuntimeError("Bloom backend not installed: %s" % backend)
+        self.backend = backend
 
     def contains(self, value):
         if sys.version_info < (3, 0) and not isinstance(value, str):
             value = value.encode('ascii')
         return value in self.bloom
+
+    def contains_many(self, values):
+        """Check a sequence of values
+
+        Returns (numpy.ndarray) bool per value, a list of bool when numpy
+            isn't installed
+        """
+        if self.backend == 'numpy':
+            return self.bloom.contains_many(values)
+        bloom = self.bloom
+        if sys.version_info < (3, 0):
+            values = [value if isinstance(value, str)
+                      else value.encode('ascii') for value in values]
+        if numpy is None:
+            return [value in bloom for value in values]
+        return numpy.fromiter((value in bloom for value in values),
+                              dtype=bool, count=len(values))
@@ -0,0 +1,129 @@
+"""Retry policy and rate limiting for API requests
+
+    # 10,000 requests a day, never more than 20 at once
+    limiter = TokenBucket.from_quota(10000, 86400, capacity=20)
+    client = Seclytics(access_token, rate_limit=limiter,
+                       retry=RetryPolicy(max_retries=5))
+"""
+from email.utils import parsedate_tz, mktime_tz
+import random
+import threading
+import time
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE')
+
+
+class TokenBucket(object):
+    """Thread safe token bucket
+
+    Tokens refill at ``rate`` per second up to ``capacity``. A client
+    shared across threads takes one token per request.
+
+    Attributes:
+        rate (float): tokens added per second
+        capacity (float): max tokens that can be saved up for a burst
+    """
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._last = monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_quota(cls, requests, seconds, capacity=None):
+        """Bucket spreading a plan quota of requests per seconds"""
+        return cls(float(requests) / seconds, capacity=capacity)
+
+    def _refill(self, now):
+        if now > self._last:
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available and take them"""
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = max(self._paused_until - now,
+                           (tokens - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens to every thread, e.g. for Retry-After"""
+        with self._lock:
+            now = monotonic()
+            self._refill(now)
+            paused_until = now + seconds
+            if paused_until > self._paused_until:
+                self._paused_until = paused_until
+                # start refilling from empty once the pause is over
+                self._tokens = 0
+                self._last = paused_until
+
+
+class RetryPolicy(object):
+    """When and how long to wait before retrying a request
+
+    Attributes:
+        max_retries (int): retries after the first attempt, 0 disables
+        backoff_factor (float): seconds to wait before the first retry
+        max_backoff (float): upper bound on a single wait
+        statuses (tuple): status codes that are retried
+        methods (tuple): methods retried after the request was sent, other
+            methods (POST) are only retried on 429 and connect errors so
+            e.g. feedback isn't submitted twice
+    """
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=60,
+                 statuses=(429, 500, 502, 503, 504),
+                 methods=IDEMPOTENT_METHODS):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.methods = tuple(method.upper() for method in methods)
+
+    def is_idempotent(self, method):
+        """Whether a sent request with this method may be retried"""
+        return method.upper() in self.methods
+
+    def backoff(self, attempt):
+        """Exponential backoff with jitter for the retry attempt (from 0)
+
+        Half the delay is fixed and half is random so threads that failed
+        together don't retry together.
+        """
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait, the server's Retry-After wins over backoff"""
+        if response is not None:
+            retry_after = self.retry_after(response)
+            if retry_after is not None:
+                return min(self.max_backoff, retry_after)
+        return self.backoff(attempt)
+
+    @staticmethod
+    def retry_after(response):
+        """Parse the Retry-After header in seconds or HTTP date form"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time.time())
@@ -20,6 +20,12 @@ def get_options():
     parser.add_option("--data-dir",
                       action="store", type="string", dest="data_dir",
                       help="Directory to store DBs")
+    parser.add_option("--workers", default=4,
+                      action="store", type="int", dest="workers",
+                      help="Files downloaded concurrently")
+    parser.add_option("--segments", default=1,
+                      action="store", type="int", dest="segments",
+                      help="Parallel ranged requests per large file")
     (options, _) = parser.parse_args()
 
     if options.access_token is None:
@@ -36,8 +42,10 @@ def run():
     api_url = options.api_url
     client = Seclytics(access_token=access_token, api_url=api_url)
     names = options.name.split(',')
-    for name in names:
-        client.bulk_api_download(name, data_dir=options.data_dir)
+    # unchanged files are skipped with a conditional request
+    client.bulk_api_downloads(names, data_dir=options.data_dir,
+                              workers=options.workers,
+                              segments=options.segments)
 
 
 if __name__ == '__main__':
@@ -23,3 +23,33 @@ class FileInput(object):
     def next(self):
         """For python2.7 compat"""
         return self.__next__()
+
+    def text_blocks(self, block_size=1024 * 1024):
+        """Yield the input block_size characters at a time, each block
+        ending on a line boundary
+        """
+        remainder = ''
+        while True:
+            block = self.file.read(block_size)
+            if not block:
+                break
+            end = block.rfind('\n') + 1
+            if not end:
+                remainder += block
+                continue
+            yield remainder + block[:end]
+            remainder = block[end:]
+        if remainder:
+            yield remainder
+
+    def blocks(self, block_size=1024 * 1024):
+        """Yield lists of lines read block_size characters at a time
+
+        The lines don't have their line endings. Reading large blocks is
+        much faster than a readline per line on big inputs.
+        """
+        for text in self.text_blocks(block_size):
+            lines = text.split('\n')
+            if not lines[-1]:
+                lines.pop()
+            yield lines
@@ -1,9 +1,20 @@
 #!/usr/bin/env python
+"""Enrich a stream of IPs with the API
+
+The input is read in large blocks and deduplicated, batch_size IPs per
+request with workers requests in flight while the results are written.
+
+cat ips.txt | python -m seclytics.scripts.ip_enrich --access_token TOKEN
+    --workers 8 --cache /tmp/ips.sqlite --format csv
+"""
 from optparse import OptionParser
 import sys
-import json
 from .. import Seclytics
+from ..cache import SqliteCache
 from .file_input import FileInput
+from .writers import CsvWriter, JsonlWriter, ParquetWriter
+
+FORMATS = ['jsonl', 'csv', 'parquet']
 
 
 def get_options():
@@ -16,32 +27,86 @@ def get_options():
                       action="store", type="string", dest="api_url",
                       default='https://api.seclytics.com/',
                       help="API Hostname")
+    parser.add_option("--json",
+                      action="store", type="string", dest="json_codec",
+                      help="JSON library: orjson, ujson, simdjson or json "
+                           "(default: fastest installed)")
+    parser.add_option("--batch-size", default=100,
+                      action="store", type="int", dest="batch_size",
+                      help="IPs per request")
+    parser.add_option("--workers", default=4,
+                      action="store", type="int", dest="workers",
+                      help="Requests in flight")
+    parser.add_option("--cache",
+                      action="store", type="string", dest="cache",
+                      help="sqlite file caching the lookups between runs")
+    parser.add_option("--cache-ttl", default=3600,
+                      action="store", type="int", dest="cache_ttl",
+                      help="Seconds the cached lookups are used")
+    parser.add_option("--format", default='jsonl',
+                      action="store", type="choice", choices=FORMATS,
+                      dest="format", help="Output format: jsonl, csv or "
+                                          "parquet (requires pyarrow)")
+    parser.add_option("--output",
+                      action="store", type="string", dest="output",
+                      help="Output file (default: stdout)")
+    parser.add_option("--block-size", default=1024 * 1024,
+                      action="store", type="int", dest="block_size",
+                      help="Bytes of input read at a time")
     (options, _) = parser.parse_args()
     if options.access_token is None:
         parser.error('access_token not given')
+    if options.format == 'parquet' and not options.output:
+        parser.error('parquet needs an --output file')
     return options
 
 
+def unique_ips(blocks):
+    """The IPs of the blocks of lines, each IP only once"""
+    seen = set()
+    for lines in blocks:
+        for line in lines:
+            ip_address = line.strip()
+            if ip_address and ip_address not in seen:
+                seen.add(ip_address)
+                yield ip_address
+
+
+def open_writer(options, codec):
+    """The writer for the format, and the file to close"""
+    if options.format == 'parquet':
+        try:
+            return (ParquetWriter(options.output, codec), None)
+        except ImportError:
+            sys.exit('parquet output requires pyarrow')
+    output = sys.stdout
+    if options.output:
+        output = open(options.output, 'w')
+    if options.format == 'csv':
+        return (CsvWriter(output), output)
+    return (JsonlWriter(output, codec), output)
+
+
 def main():
     options = get_options()
     # initialize the client with your token
-    access_token = options.access_token
-    api_url = options.api_url
-    client = Seclytics(access_token, api_url=api_url)
-
-    def process_batch(ips):
-        for node in client.ips(ips):
-            print(json.dumps(node.intel))
-
-    batch = set()
-    with FileInput(sys.stdin) as file_handle:
-        for line in file_handle:
-            batch.add(line.strip())
-            if len(batch) >= 50:
-                process_batch(batch)
-                batch = set()
-    if batch:
-        process_batch(batch)
+    cache = None
+    if options.cache:
+        cache = SqliteCache(options.cache, ttl=options.cache_ttl)
+    client = Seclytics(options.access_token, api_url=options.api_url,
+                       json_codec=options.json_codec,
+                       batch_size=options.batch_size,
+                       workers=options.workers, cache=cache)
+
+    (writer, output) = open_writer(options, client.json)
+    # the client keeps workers batches in flight while we write
+    with FileInput(sys.stdin) as file_handle, writer:
+        ips = unique_ips(file_handle.blocks(options.block_size))
+        for ioc in client.ips(ips):
+            if ioc is not None:
+                writer.write(ioc)
+    if output is not None and output is not sys.stdout:
+        output.close()
 
 
 if __name__ == '__main__':
@@ -4,17 +4,44 @@ the API.
 
 echo '51.255.139.200' | python -m seclytics.scripts.ip_filter
     --suspicious --malicious --predicted
+
+Regular files are read in blocks of --chunk-size characters which are
+checked in bulk, with --workers processes that each map the bloom files.
+Matches are written in input order. Pipes (tail -f log | ip_filter) are
+read and flushed a line at a time unless --workers is above 1.
+
+python -m seclytics.scripts.ip_filter --malicious --workers 8 --stats
+    ips-1.txt ips-2.txt > matches.txt
+
+With --extract the lines can be raw logs, every IPv4 and IPv6 address in
+a line is checked and the lines with a match are printed. --annotate
+prints every line, with a tab and ip=category for each match appended.
+
+python -m seclytics.scripts.ip_filter --malicious --predicted --annotate
+    /var/log/syslog
 """
+from collections import deque
 from optparse import OptionParser
+import io
+import multiprocessing
+import os
+import stat
 import sys
-from ..bloom_category import BloomCategory
+import time
+from ..bloom_category import BloomCategory, Category
+from ..extract import extract_ips
 from .file_input import FileInput
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def get_options():
     """Parse the command line options"""
     # pass in the access_token via commandline
-    parser = OptionParser()
+    parser = OptionParser(usage="%prog [options] [FILE...]")
     parser.add_option("--data-dir", default='/tmp',
                       action="store", type="string", dest="data_dir",
                       help="Directory where DBs exist")
@@ -27,29 +54,222 @@ def get_options():
     parser.add_option("--predicted",
                       action="store_true", default=False, dest="predicted",
                       help="Check predicted")
-    (options, _) = parser.parse_args()
+    parser.add_option("--reload", type="float", dest="reload_interval",
+                      help="Reload the DBs after a download, checking for "
+                           "new files every N seconds")
+    parser.add_option("--workers", default=1,
+                      action="store", type="int", dest="workers",
+                      help="Processes checking the IPs")
+    parser.add_option("--chunk-size", default=4 * 1024 * 1024,
+                      action="store", type="int", dest="chunk_size",
+                      help="Characters of a file checked at a time")
+    parser.add_option("--extract",
+                      action="store_true", default=False, dest="extract",
+                      help="Check every IP found in raw log lines and "
+                           "print the lines with a match")
+    parser.add_option("--annotate",
+                      action="store_true", default=False, dest="annotate",
+                      help="With --extract print every line, appending the "
+                           "matching IPs and their category")
+    parser.add_option("--ipv4-only",
+                      action="store_false", default=True, dest="ipv6",
+                      help="Only extract IPv4 addresses")
+    parser.add_option("--stats",
+                      action="store_true", default=False, dest="stats",
+                      help="Print the lines/sec to stderr")
+    (options, paths) = parser.parse_args()
     if(not options.malicious and
        not options.predicted and
        not options.suspicious):
         parser.error("Please specify at least one category")
-    return options
+    if options.annotate:
+        options.extract = True
+    return (options, paths)
+
+
+def open_bloom(data_dir, reload_interval=None):
+    data_path = str(data_dir)
+    return BloomCategory(malicious_path=data_path + '/malicious-ips.bloom',
+                         predicted_path=data_path + '/predicted-ips.bloom',
+                         has_intel_path=data_path + '/ip-threat-intel.bloom',
+                         auto_reload=reload_interval)
+
+
+# the filter of each worker process, the bloom files are memory mapped so
+# the processes share the pages
+_worker = {}
+
+
+def init_worker(data_dir, reload_interval, checks, extract=None):
+    """extract is None for a line per IP or a dict of the extract_block
+    options"""
+    _worker['bloom'] = open_bloom(data_dir, reload_interval)
+    _worker['checks'] = checks
+    _worker['extract'] = extract
+
+
+def check_ips(ips):
+    """The Category value of every IP, 0 for no match"""
+    bloom = _worker['bloom']
+    checks = _worker['checks']
+    if numpy is None:
+        categories = [bloom.check_ip(ip_address, **checks)
+                      for ip_address in ips]
+        return [category.value if category else 0
+                for category in categories]
+    return bloom.check_ips(ips, **checks)
+
+
+def split_lines(text):
+    lines = text.split('\n')
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def filter_block(text):
+    """Check the IPs of a block of lines
+
+    Returns (lines, matches) the number of lines and the output lines
+    """
+    if _worker.get('extract') is not None:
+        return extract_block(text, **_worker['extract'])
+    ips = [line.strip() for line in split_lines(text)]
+    categories = check_ips(ips)
+    if numpy is None:
+        matches = [ip_address for (ip_address, category)
+                   in zip(ips, categories) if category]
+    else:
+        matches = [ips[i] for i in numpy.flatnonzero(categories)]
+    return (len(ips), matches)
+
+
+def extract_block(text, annotate=False, ipv6=True):
+    """Check every IP found in a block of raw log lines
+
+    All the IPs of the block are checked in one call. Returns (lines,
+    matches) the number of lines and the matching (or annotated) lines.
+    """
+    lines = [line.rstrip('\r') for line in split_lines(text)]
+    found = [extract_ips(line, ipv6) for line in lines]
+    categories = check_ips([ip_address for line_ips in found
+                            for ip_address in line_ips])
+    if numpy is not None:
+        categories = categories.tolist()
+    matches = []
+    position = 0
+    for (line, line_ips) in zip(lines, found):
+        hits = []
+        for ip_address in line_ips:
+            category = categories[position]
+            position += 1
+            if category:
+                hit = '%s=%s' % (ip_address, Category(category).name)
+                if hit not in hits:
+                    hits.append(hit)
+        if hits:
+            matches.append(line + '\t' + ','.join(hits) if annotate
+                           else line)
+        elif annotate:
+            matches.append(line)
+    return (len(lines), matches)
+
+
+def is_regular_file(file):
+    """A read of a regular file doesn't wait for more input"""
+    try:
+        return stat.S_ISREG(os.fstat(file.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def open_text(path=None):
+    """The file, or stdin, with undecodable bytes replaced by U+FFFD
+
+    Raw logs aren't always valid in the locale's encoding. Python 2 reads
+    bytes so nothing is decoded.
+    """
+    if sys.version_info < (3, 0):
+        return open(path) if path else sys.stdin
+    if path:
+        return open(path, errors='replace')
+    if not hasattr(sys.stdin, 'buffer'):
+        # already text, e.g. replaced in tests
+        return sys.stdin
+    return io.TextIOWrapper(sys.stdin.buffer, encoding=sys.stdin.encoding,
+                            errors='replace')
+
+
+def read_blocks(paths, chunk_size, blocks=False):
+    """The text blocks of the files, or stdin
+
+    Regular files, and every input when blocks is set, are read in blocks
+    of chunk_size. Pipes are read a line at a time, a block read would
+    wait for chunk_size characters or the end of the input.
+    """
+    files = (open_text(path) for path in paths) if paths else [open_text()]
+    for file in files:
+        with FileInput(file) as file_handle:
+            if blocks or is_regular_file(file):
+                for block in file_handle.text_blocks(chunk_size):
+                    yield block
+            else:
+                for line in file_handle:
+                    yield line
+
+
+def ordered_results(pool, func, items, ahead):
+    """pool.imap without reading all the items ahead of the results"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= ahead:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
 
 
 def main():
     """Using the options and stdin check the bloom filters for IOCs"""
-    options = get_options()
-    data_path = str(options.data_dir)
-    bloom = BloomCategory(malicious_path=data_path + '/malicious-ips.bloom',
-                          predicted_path=data_path + '/predicted-ips.bloom',
-                          has_intel_path=data_path + '/ip-threat-intel.bloom')
-    with FileInput(sys.stdin) as file_handle:
-        for line in file_handle:
-            ip_address = line.strip()
-            if bloom.check_ip(ip_address,
-                              check_malicious=options.malicious,
-                              check_predicted=options.predicted,
-                              check_suspicious=options.suspicious):
-                print(ip_address)
+    (options, paths) = get_options()
+    checks = {'check_malicious': options.malicious,
+              'check_predicted': options.predicted,
+              'check_suspicious': options.suspicious}
+    extract = None
+    if options.extract:
+        extract = {'annotate': options.annotate, 'ipv6': options.ipv6}
+    worker_args = (options.data_dir, options.reload_interval, checks,
+                   extract)
+    blocks = read_blocks(paths, options.chunk_size,
+                         blocks=options.workers > 1)
+
+    pool = None
+    if options.workers > 1:
+        pool = multiprocessing.Pool(options.workers, init_worker,
+                                    worker_args)
+        results = ordered_results(pool, filter_block, blocks,
+                                  options.workers * 2)
+    else:
+        init_worker(*worker_args)
+        results = (filter_block(block) for block in blocks)
+
+    started = time.time()
+    total_lines = 0
+    output = sys.stdout
+    try:
+        for (lines, matches) in results:
+            total_lines += lines
+            if matches:
+                output.write('\n'.join(matches))
+                output.write('\n')
+                output.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+    if options.stats:
+        seconds = max(time.time() - started, 1e-6)
+        sys.stderr.write("%d lines in %.2fs, %d lines/sec\n" %
+                         (total_lines, seconds, total_lines / seconds))
 
 
 if __name__ == '__main__':
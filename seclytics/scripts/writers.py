@@ -0,0 +1,139 @@
+"""Buffered output writers for the scripts
+
+Rows are collected and written with a single write call every
+buffer_rows rows instead of a print per row.
+"""
+import csv
+
+
+class _Lines(list):
+    """A list csv.writer can write to"""
+    write = list.append
+
+
+class BufferedWriter(object):
+    """Writes lines to output in large blocks
+
+    Attributes:
+        output: file like object
+        buffer_rows (int): rows kept before writing
+        rows (int): rows written so far
+    """
+    def __init__(self, output, buffer_rows=1000):
+        self.output = output
+        self.buffer_rows = buffer_rows
+        self.buffer = _Lines()
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_line(self, line):
+        self.buffer.append(line)
+        self.buffer.append('\n')
+        self._wrote_row()
+
+    def _wrote_row(self):
+        self.rows += 1
+        if self.rows % self.buffer_rows == 0:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.output.write(''.join(self.buffer))
+            del self.buffer[:]
+        self.output.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonlWriter(BufferedWriter):
+    """One JSON object per line with the full intel of each IOC"""
+
+    def __init__(self, output, codec, buffer_rows=1000):
+        BufferedWriter.__init__(self, output, buffer_rows)
+        self.codec = codec
+
+    def write(self, ioc):
+        self.write_line(self.codec.dumps(ioc.intel))
+
+
+# the flattened IOC columns of the csv and parquet output
+COLUMNS = ['id', 'type', 'has_threat_intel', 'predicted', 'categories',
+           'reported_by', 'identifiers', 'first_reported_at', 'whitelist']
+
+
+def ioc_row(ioc):
+    """The COLUMNS values of an IOC, lists are joined with ;"""
+    first_reported_at = ioc.first_reported_at
+    if first_reported_at is not None:
+        first_reported_at = first_reported_at.isoformat()
+    return [ioc.ioc_id, ioc.ioc_type, ioc.has_threat_intel, ioc.predicted,
+            ';'.join(ioc.categories), ';'.join(ioc.reported_by),
+            ';'.join(ioc.identifiers), first_reported_at, ioc.whitelist]
+
+
+class CsvWriter(BufferedWriter):
+    """The COLUMNS of each IOC with a header row"""
+
+    def __init__(self, output, buffer_rows=1000):
+        BufferedWriter.__init__(self, output, buffer_rows)
+        self.csv = csv.writer(self.buffer, lineterminator='\n')
+        self.csv.writerow(COLUMNS)
+
+    def write(self, ioc):
+        self.csv.writerow(ioc_row(ioc))
+        self._wrote_row()
+
+
+class ParquetWriter(object):
+    """The COLUMNS plus the JSON intel of each IOC, requires pyarrow
+
+    Every buffer_rows rows are written as a row group.
+    """
+    def __init__(self, path, codec, buffer_rows=10000):
+        import pyarrow
+        import pyarrow.parquet
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            [(name, pyarrow.bool_() if name in ('has_threat_intel',
+                                                'predicted')
+              else pyarrow.string()) for name in COLUMNS] +
+            [('intel', pyarrow.string())])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.codec = codec
+        self.buffer_rows = buffer_rows
+        self.buffer = []
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, ioc):
+        row = ioc_row(ioc)
+        row.append(self.codec.dumps(ioc.intel))
+        self.buffer.append(row)
+        self.rows += 1
+        if len(self.buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        columns = [list(column) for column in zip(*self.buffer)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(column, type=field.type)
+             for (column, field) in zip(columns, self.schema)],
+            schema=self.schema))
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
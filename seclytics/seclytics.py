@@ -1,16 +1,55 @@
 """Main seclytics endpoint."""
-from hashlib import sha1
-import sys
-import os
+from itertools import chain
+import threading
+import time
+import ipaddress
 import requests
 from .exceptions import InvalidAccessToken, OverQuota, ApiError
 from . import __version__
 from .node import Node
-
-try:
-    from urllib.parse import urlparse
-except ImportError:
-    from urlparse import urlparse
+from .batching import chunked, fan_out, string_types
+from .rate_limit import RetryPolicy
+from .transport import build_session
+from .bulk_download import BulkDownload
+from .streaming import iter_json_items
+from .pagination import PageIterator
+from .json_codec import get_codec
+from .feedback import (FEEDBACK_ERRORS, GROUP_SIZE, FeedbackResult,
+                       feedback_data, feedback_path, group_by_type)
+from .url_hashing import UrlHasher, hash_urls
+from .url_enrichment import UrlEnrichment
+from .bloom_gate import BloomGate, no_intel_ip
+from .coalesce import MicroBatcher, SingleFlight
+
+# bytes read from the socket per parse when streaming responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# (single lookup method, API endpoint) the endpoint doubles as the
+# multiple lookup method name
+IOC_ENDPOINTS = [
+    ('ip', 'ips'),
+    ('cidr', 'cidrs'),
+    ('asn', 'asns'),
+    ('host', 'hosts'),
+    ('file', 'files'),
+    ('domain', 'domains'),
+]
+
+
+def normalize_ioc_id(ioc_path, ioc_id):
+    """The id in the form the API returns it, to match rows to requests
+
+    IPs are formatted by ipaddress (int IPs in dot notation), other ids
+    are lower cased.
+    """
+    value = u'%s' % (ioc_id,)
+    if ioc_path == 'ips':
+        try:
+            ip_addr = int(value) if value.isdigit() else value
+            return ipaddress.ip_address(ip_addr).compressed
+        except ValueError:
+            return value
+    return value.lower()
 
 
 class Seclytics(object):
@@ -21,23 +60,114 @@ class Seclytics(object):
         base_url (str): API URL
         session (Session): requests session
         timeout (int): default timeout
+        batch_size (int): max IOCs sent in a single multiple lookup request
+        workers (int): number of batches requested concurrently
+        cache (BaseCache): optional cache for IOC lookups
+        retry (RetryPolicy): retries on 429, 5xx and connection errors
+        rate_limit (TokenBucket): optional limiter shared by all threads
+        stream (bool): parse index responses row by row as they arrive
+        json (JsonCodec): decodes the responses, orjson, ujson or simdjson
+            when installed unless json_codec names one
+        cidr_index (CidrIndex): answers ip_cidr, ip_asn and ip_cidrs
+            offline, the API is used when it's stale or has no match
+        bloom_gate (BloomGate): with bloom= ip and ips answer IPs missing
+            from the has_intel bloom without a request, it counts them
+        single_flight (SingleFlight): with coalesce set, concurrent
+            identical lookup requests are sent once and their rows shared
+        batcher (MicroBatcher): with batch_window set, single lookups
+            made within batch_window seconds of each other are sent as one
+            multiple lookup request
+
+    The pool_size, max_retries, keep_alive and http2 options configure the
+    session created when one isn't passed in, see build_session.
     """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
     def __init__(self, access_token,
                  api_url='https://api.seclytics.com',
                  session=None,
-                 timeout=5):
+                 timeout=5,
+                 batch_size=100,
+                 workers=4,
+                 cache=None,
+                 retry=None,
+                 rate_limit=None,
+                 pool_size=None,
+                 max_retries=0,
+                 keep_alive=True,
+                 http2=False,
+                 stream=False,
+                 json_codec=None,
+                 cidr_index=None,
+                 bloom=None,
+                 coalesce=False,
+                 batch_window=None):
         self.access_token = access_token
         self.base_url = api_url
         self.timeout = timeout
+        self.batch_size = batch_size
+        self.workers = workers
+        self.cache = cache
+        self.retry = retry or RetryPolicy()
+        self.rate_limit = rate_limit
+        self.stream = stream
+        self.json = get_codec(json_codec)
+        self.cidr_index = cidr_index
+        if cidr_index is not None and cidr_index.client is None:
+            cidr_index.client = self
+        self.bloom_gate = None
+        if bloom is not None:
+            self.bloom_gate = BloomGate(bloom)
+        self.single_flight = SingleFlight() if coalesce else None
+        self.batcher = None
+        if batch_window:
+            self.batcher = MicroBatcher(self._fetch_batch,
+                                        window=batch_window,
+                                        max_size=batch_size,
+                                        fallback=self._fetch_one,
+                                        fallback_errors=(ApiError,))
 
         # setup the session
         # allow users to pass in a session for proxy support
         self.session = session
         if not self.session:
-            self.session = requests.Session()
+            # keep a connection for every batch worker
+            if pool_size is None:
+                pool_size = max(10, workers)
+            self.session = build_session(pool_size=pool_size,
+                                         max_retries=max_retries,
+                                         keep_alive=keep_alive,
+                                         http2=http2)
         self.session.headers.update(self.default_headers)
         self.mount_ioc_lookups()
 
+    @classmethod
+    def shared(cls, access_token, api_url='https://api.seclytics.com',
+               verify=True, cert=None, proxies=None, **kwargs):
+        """Get the client shared by every thread in this process
+
+        The first call for an access_token, api_url and the session's
+        verify, cert and proxies settings creates the client with kwargs,
+        later calls return the same client so all threads reuse its
+        connection pool. Calls with other TLS or proxy settings get their
+        own client.
+        """
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        proxies = dict(proxies or {})
+        key = (access_token, api_url, verify, cert,
+               tuple(sorted(proxies.items())))
+        with cls._shared_lock:
+            client = cls._shared.get(key)
+            if client is None:
+                client = cls(access_token, api_url=api_url, **kwargs)
+                client.session.verify = verify
+                client.session.cert = cert
+                client.session.proxies.update(proxies)
+                cls._shared[key] = client
+        return client
+
     @property
     def default_headers(self):
         """Set's default headers for the API
@@ -53,6 +183,58 @@ class Seclytics(object):
             'Authorization': "Bearer {}".format(self.access_token)
         }
 
+    def _request(self, method, url, **kwargs):
+        """Send a request with rate limiting and retries
+
+        Retries connection errors, timeouts and the retry statuses with
+        jittered exponential backoff (or Retry-After). A 429 pauses the
+        rate limiter for every thread. Once the retries are used up the
+        last response is returned for the error checks.
+
+        Methods that aren't in retry.methods (POST) may have been processed
+        already, they are only retried on 429 and connect errors.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        idempotent = self.retry.is_idempotent(method)
+        attempt = 0
+        while True:
+            if self.rate_limit is not None:
+                self.rate_limit.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                sent = not isinstance(error, requests.ConnectTimeout)
+                if attempt >= self.retry.max_retries or (sent and
+                                                         not idempotent):
+                    raise
+                delay = self.retry.delay(attempt)
+            else:
+                status = response.status_code
+                if (status not in self.retry.statuses or
+                        attempt >= self.retry.max_retries or
+                        (status != 429 and not idempotent)):
+                    return response
+                delay = self.retry.delay(attempt, response)
+                if response.status_code == 429 and self.rate_limit:
+                    self.rate_limit.pause(delay)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _format_params(params):
+        """Convert attributes to a comma delimited list"""
+        for (field, value) in params.items():
+            if isinstance(value, (list, set)):
+                params[field] = ','.join(value)
+        return params
+
+    def _url(self, path):
+        """The URL for an api path, full URLs (next page links) are kept"""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return ''.join((self.base_url, path))
+
     def _get_request(self, path, params):
         """Perform GET request for path and params
 
@@ -62,16 +244,47 @@ class Seclytics(object):
             path (str): the api path
             params (str): api params
         """
-        url = ''.join((self.base_url, path))
-        # convert attributes to a comma delimited list
-        for (field, value) in params.items():
-            if isinstance(value, (list, set)):
-                params[field] = ','.join(value)
-        response = self.session.get(url, params=params, timeout=self.timeout)
+        url = self._url(path)
+        response = self._request('GET', url,
+                                 params=self._format_params(params))
         self._check_response_for_errors(response)
-        data = response.json()
+        data = self.json.loads(response.content)
         return data
 
+    def _get_rows(self, path, params, meta=None):
+        """Perform GET request for an index path and iterate its data rows
+
+        The request is sent and errors are raised before this returns. When
+        stream is set the rows are parsed as they are read off the socket
+        instead of decoding the whole body first.
+
+        Args:
+            path (str): the api path
+            params (str): api params
+            meta (dict): gets the other top level members of the response
+        """
+        if not self.stream:
+            response = self._get_request(path, params)
+            if meta is not None:
+                meta.update((key, value) for (key, value) in response.items()
+                            if key != 'data')
+            return iter(response.get('data', []))
+
+        url = self._url(path)
+        response = self._request('GET', url, stream=True,
+                                 params=self._format_params(params))
+        self._check_response_for_errors(response)
+        return self._stream_rows(response, meta)
+
+    @staticmethod
+    def _stream_rows(response, meta=None):
+        try:
+            chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            for row in iter_json_items(chunks, meta=meta):
+                yield row
+        finally:
+            response.close()
+
     @staticmethod
     def _check_response_for_errors(response):
         """Rasies an error depending on the status_code"""
@@ -87,69 +300,333 @@ class Seclytics(object):
 
     def _post_data(self, path, params, data=None):
         url = ''.join([self.base_url, path])
-        response = self.session.post(url, params=params, json=data,
-                                     timeout=self.timeout)
+        kwargs = {}
+        if data is not None:
+            kwargs['data'] = self.json.dumps(data)
+            kwargs['headers'] = {'Content-Type': 'application/json'}
+        response = self._request('POST', url, params=params, **kwargs)
         self._check_response_for_errors(response)
-        data = response.json()
+        data = self.json.loads(response.content)
         return data
 
+    @staticmethod
+    def _fields_key(fields):
+        """fields as a string, the same for any order"""
+        if isinstance(fields, (list, set, tuple)):
+            fields = ','.join(sorted(fields))
+        return fields or ''
+
+    @classmethod
+    def _cache_key(cls, ioc_path, ioc_id, fields=None):
+        """Cache key for an IOC lookup"""
+        return '|'.join((ioc_path, ioc_id, cls._fields_key(fields)))
+
+    def _coalesced(self, key, func):
+        """func() or the result of the same call in flight"""
+        if self.single_flight is None:
+            return func()
+        return self.single_flight.do(key, func)
+
     def _ioc_show(self, ioc_path, ioc_id, fields=None):
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(ioc_path, ioc_id, fields)
+            row = self.cache.get(cache_key)
+            if row is not None:
+                return Node.build_for_row(self, row)
+
         path = '/%s/%s' % (ioc_path, ioc_id)
         params = {}
         if fields:
             params['fields'] = fields
-        response = self._get_request(path, params)
+        response = self._coalesced(
+            ('show', path, self._fields_key(fields)),
+            lambda: self._get_request(path, params))
         if 'error' in response:
             return RuntimeError(response['error']['message'])
+        if cache_key:
+            self.cache.set(cache_key, response)
         return Node.build_for_row(self, response)
 
-    def _ioc_index(self, ioc_path, iocs, fields=None):
-        path = '/%s/' % ioc_path
-        params = {'ids': iocs}
-        if fields:
-            params['fields'] = fields
-        response = self._get_request(path, params)
-        if 'data' not in response:
-            return
+    def _ioc_index(self, ioc_path, iocs, fields=None, preserve_order=False):
+        """Look up any number of IOCs
 
-        for row in response['data']:
+        The IOCs are split into batch_size requests which are run on
+        workers threads. Nodes are yielded as each batch completes unless
+        preserve_order is set.
+        """
+        for row in self._ioc_index_rows(ioc_path, iocs, fields,
+                                        preserve_order):
             yield Node.build_for_row(self, row)
 
-    def bulk_api_download(self, name, data_dir='/tmp/'):
-        """Download a file from the bulk api."""
+    def _ioc_index_rows(self, ioc_path, iocs, fields=None,
+                        preserve_order=False):
+        """The rows of _ioc_index"""
+        path = '/%s/' % ioc_path
+        if isinstance(iocs, string_types):
+            iocs = [iocs]
+
+        def request_batch(batch):
+            params = {'ids': batch}
+            if fields:
+                params['fields'] = fields
+            if self.single_flight is None:
+                return self._get_rows(path, params)
+            key = ('index', path, tuple(sorted(batch)),
+                   self._fields_key(fields))
+            return iter(self.single_flight.do(
+                key, lambda: list(self._get_rows(path, params))))
+
+        def cached_batch(batch):
+            # only request the IOCs we don't have cached
+            keys = dict((self._cache_key(ioc_path, ioc, fields), ioc)
+                        for ioc in batch)
+            rows = self.cache.get_many(keys)
+            misses = [ioc for (key, ioc) in keys.items() if key not in rows]
+            cached_rows = list(rows.values())
+            if not misses:
+                return cached_rows
+            fetched_rows = self._cache_rows(ioc_path, fields, misses,
+                                            request_batch(misses))
+            return chain(cached_rows, fetched_rows)
+
+        batches = chunked(iocs, self.batch_size)
+        lookup = request_batch if self.cache is None else cached_batch
+        for rows in fan_out(lookup, batches, self.workers,
+                            preserve_order=preserve_order):
+            for row in rows:
+                yield row
+
+    def _fetch_batch(self, iocs, group):
+        """Rows of a MicroBatcher batch by the requested id
+
+        Rows are matched on normalize_ioc_id so ids the API rewrites
+        (case, int IPs) still find their row.
+        """
+        (ioc_path, fields) = group
+        rows = dict((normalize_ioc_id(ioc_path, row['id']), row) for row in
+                    self._ioc_index_rows(ioc_path, iocs, fields or None)
+                    if 'id' in row)
+        return dict((ioc_id, rows.get(normalize_ioc_id(ioc_path, ioc_id)))
+                    for ioc_id in iocs)
+
+    def _fetch_one(self, ioc_id, group):
+        """The row of one IOC, when its batch failed"""
+        (ioc_path, fields) = group
+        return next(iter(self._ioc_index_rows(ioc_path, [ioc_id],
+                                              fields or None)), None)
+
+    def _batched_show(self, ioc_path, ioc_id, fields=None):
+        """_ioc_show through the batcher, every caller gets its own IOC
+
+        IOCs that can't be matched to a row of the batch response are
+        looked up on their own.
+        """
+        row = self.batcher.get(ioc_id, (ioc_path, self._fields_key(fields)))
+        if row is None:
+            return self._ioc_show(ioc_path, ioc_id, fields)
+        return Node.build_for_row(self, row)
+
+    def _cache_rows(self, ioc_path, fields, requested, rows):
+        """Pass rows through, caching them once they have all been read
+
+        A row is cached under its id and under the requested ids it
+        answers (matched with normalize_ioc_id), so ids the API rewrites
+        are found in the cache next time.
+        """
+        requested_ids = {}
+        for ioc_id in requested:
+            requested_ids.setdefault(normalize_ioc_id(ioc_path, ioc_id),
+                                     []).append(ioc_id)
+        fetched = {}
+        for row in rows:
+            if 'id' in row:
+                ids = requested_ids.get(normalize_ioc_id(ioc_path, row['id']),
+                                        [])
+                for ioc_id in [row['id']] + ids:
+                    fetched[self._cache_key(ioc_path, ioc_id, fields)] = row
+            yield row
+        self.cache.set_many(fetched)
+
+    def bulk_api_download(self, name, data_dir='/tmp/', **kwargs):
+        """Download a file from the bulk api.
+
+        kwargs are passed to BulkDownload (chunk_size, segments, checksum)
+        """
         endpoint = '/bulk/' + name
-        return BulkDownload(self, endpoint, data_dir).download()
+        return BulkDownload(self, endpoint, data_dir, **kwargs).download()
+
+    def bulk_api_downloads(self, names, data_dir='/tmp/', workers=4,
+                           **kwargs):
+        """Download several bulk files concurrently.
+
+        Unchanged files are skipped with a conditional request.
+
+        Returns (list) the file paths in the same order as names
+        """
+        def download(batch):
+            return self.bulk_api_download(batch[0], data_dir=data_dir,
+                                          **kwargs)
+        return list(fan_out(download, chunked(names, 1), workers,
+                            preserve_order=True))
 
-    def binary_download(self, file_hash, data_dir='/tmp/'):
+    def binary_download(self, file_hash, data_dir='/tmp/', **kwargs):
         """Download a binary sample."""
         endpoint = '/files/%s/download' % file_hash
-        return BulkDownload(self, endpoint, data_dir).download()
+        return BulkDownload(self, endpoint, data_dir, **kwargs).download()
 
     def _single_ioc_wrapper(self, endpoint):
         def mounted_method(ioc, **kwargs):
+            if endpoint == 'ips' and self.bloom_gate is not None and \
+                    not self.bloom_gate.has_intel(ioc):
+                return no_intel_ip(self, ioc)
+            if self.batcher is not None:
+                return self._batched_show(endpoint, ioc, **kwargs)
             return self._ioc_show(endpoint, ioc, **kwargs)
         return mounted_method
 
     def _multiple_iocs_wrapper(self, endpoint):
         def mounted_method(iocs, **kwargs):
+            if endpoint == 'ips' and self.bloom_gate is not None:
+                return self._gated_ips(iocs, **kwargs)
             return self._ioc_index(endpoint, iocs, **kwargs)
         return mounted_method
 
+    def _gated_ips(self, ip_addrs, preserve_order=False, fields=None):
+        """ips with the IPs missing from the bloom answered locally
+
+        The IPs are gated and looked up batch_size at a time, so any
+        iterable is streamed. Within a batch the IPs without intel are
+        yielded first, unless preserve_order is set. IPs are matched to the
+        results in their formatted form, so IPs in any form format_ip takes
+        keep their place.
+        """
+        if isinstance(ip_addrs, string_types):
+            ip_addrs = [ip_addrs]
+        format_ip = self.bloom_gate.bloom.format_ip
+
+        def gated_batch(batch):
+            (lookups, no_intel) = self.bloom_gate.split(batch)
+            iocs = []
+            if lookups:
+                lookups = [format_ip(ip_addr) for ip_addr in lookups]
+                iocs = [Node.build_for_row(self, row) for row in
+                        self._ioc_index_rows('ips', lookups, fields)]
+            if not preserve_order:
+                return [no_intel_ip(self, ip_addr)
+                        for ip_addr in no_intel] + iocs
+            found = dict((format_ip(ioc.ioc_id), ioc) for ioc in iocs
+                         if ioc is not None)
+            no_intel = set(no_intel)
+            ordered = []
+            for ip_addr in batch:
+                if ip_addr in no_intel:
+                    ordered.append(no_intel_ip(self, ip_addr))
+                elif format_ip(ip_addr) in found:
+                    ordered.append(found[format_ip(ip_addr)])
+            return ordered
+
+        batches = chunked(ip_addrs, self.batch_size)
+        for iocs in fan_out(gated_batch, batches, self.workers,
+                            preserve_order=preserve_order):
+            for ioc in iocs:
+                yield ioc
+
     def mount_ioc_lookups(self):
         """Set the ioc lookup attributes."""
-        single_iocs = [
-            ('ip', 'ips'),
-            ('cidr', 'cidrs'),
-            ('asn', 'asns'),
-            ('host', 'hosts'),
-            ('file', 'files'),
-            ('domain', 'domains'),
-        ]
-        for (method_name, endpoint) in single_iocs:
+        for (method_name, endpoint) in IOC_ENDPOINTS:
             assert method_name != endpoint
             setattr(self, method_name, self._single_ioc_wrapper(endpoint))
             setattr(self, endpoint, self._multiple_iocs_wrapper(endpoint))
 
+    def _fresh_cidr_index(self):
+        index = self.cidr_index
+        if index is None or index.stale:
+            return None
+        return index
+
+    def ip_cidr(self, ip_addr):
+        """The most specific CIDR of an IP.
+
+        Answered by cidr_index when it's fresh and has the IP, otherwise
+        by the ip lookup, an Ip has the same cidr, asn and country
+        attributes.
+        """
+        index = self._fresh_cidr_index()
+        if index is not None:
+            cidr = index.lookup(ip_addr)
+            if cidr is not None:
+                return cidr
+        return self.ip(ip_addr)
+
+    def ip_asn(self, ip_addr):
+        """The ASN of an IP, offline like ip_cidr or the Ip from the API"""
+        index = self._fresh_cidr_index()
+        if index is not None:
+            asn = index.lookup_asn(ip_addr)
+            if asn is not None:
+                return asn
+        return self.ip(ip_addr)
+
+    def ip_cidrs(self, ip_addrs):
+        """Yield (ip, Cidr) for many IPs, like ip_cidr.
+
+        The IPs are looked up offline in bulk, the rest are sent to the
+        API in batches and yielded as (ip, Ip) as they arrive.
+        """
+        ip_addrs = list(ip_addrs)
+        misses = ip_addrs
+        index = self._fresh_cidr_index()
+        if index is not None:
+            misses = []
+            for (ip_addr, cidr) in index.lookup_many(ip_addrs):
+                if cidr is None:
+                    misses.append(ip_addr)
+                else:
+                    yield (ip_addr, cidr)
+        for ioc in self.ips(misses):
+            if ioc is not None:
+                yield (ioc.ioc_id, ioc)
+
+    def submit_feedback(self, items, workers=None, chunk_size=10):
+        """Submit many verdicts, see seclytics.feedback
+
+        Parameters:
+            items: iterable of dicts with type, id and classification
+                ('malicious' or 'benign'), optionally category, reason
+                and feed
+            workers: verdicts posted concurrently, defaults to workers
+            chunk_size: verdicts posted one after the other by a worker
+
+        Yields (FeedbackResult) per verdict as its chunk completes, failed
+        verdicts have ok False and the error.
+        """
+        def submit_chunk(chunk):
+            (ioc_type, chunk) = chunk
+            results = []
+            for item in chunk:
+                try:
+                    if not ioc_type:
+                        raise KeyError('type')
+                    data = feedback_data(
+                        item['classification'], category=item.get('category'),
+                        reason=item.get('reason'), feed=item.get('feed'))
+                    response = self._post_data(
+                        feedback_path(ioc_type, item['id']), data)
+                except (KeyError, ValueError) + FEEDBACK_ERRORS as error:
+                    results.append(FeedbackResult(item, False, None, error))
+                    continue
+                results.append(FeedbackResult(item, True, response, None))
+            return results
+
+        chunks = ((ioc_type, chunk)
+                  for window in chunked(items, GROUP_SIZE)
+                  for (ioc_type, group) in group_by_type(window).items()
+                  for chunk in chunked(group, chunk_size))
+        for results in fan_out(submit_chunk, chunks, workers or self.workers):
+            for result in results:
+                yield result
+
     def urls(self, urls, fields=None):
         """Get URL data."""
         path = '/urls/hash'
@@ -163,25 +640,47 @@ class Seclytics(object):
 
     def hashed_urls(self, iocs, **kwargs):
         """Get URL data by hash."""
-        hashed_urls = set()
-        for url in iocs:
-            parsed = urlparse(url.strip())
-            if not parsed.hostname:
-                continue
-            hashed_path = None
-            hashed_query = None
-            if sys.version_info > (3, 0):
-                hashed_path = sha1(parsed.path.encode('utf8')).hexdigest()
-                hashed_query = sha1(parsed.query.encode('utf8')).hexdigest()
-            else:
-                hashed_path = sha1(parsed.path).hexdigest()
-                hashed_query = sha1(parsed.query).hexdigest()
-
-            hashed_url = '/'.join((parsed.hostname, hashed_path,
-                                   hashed_query))
-            hashed_urls.add(hashed_url)
+        if isinstance(iocs, string_types):
+            iocs = [iocs]
+        hashed_urls = set(hash_urls(iocs))
+        hashed_urls.discard(None)
         return self._ioc_index('urls', hashed_urls, **kwargs)
 
+    def url_lookups(self, urls, fields=None, hash_workers=1,
+                    chunk_size=10000):
+        """Look up a stream of URLs by hash.
+
+        The URLs are hashed chunk_size at a time (on hash_workers
+        processes), each chunk's distinct hashes are looked up in batches
+        while the next chunks are hashed.
+
+        Yields (url, Url or None) for every URL in input order, None when
+        there's no data or no hostname.
+        """
+        hasher = UrlHasher(workers=hash_workers, chunk_size=chunk_size)
+        for pairs in hasher.map_chunks(urls):
+            hashed_urls = set(hashed for (_, hashed) in pairs)
+            hashed_urls.discard(None)
+            found = {}
+            if hashed_urls:
+                for ioc in self._ioc_index('urls', hashed_urls, fields):
+                    if ioc is not None:
+                        found[ioc.ioc_id] = ioc
+            for (url, hashed) in pairs:
+                yield (url, found.get(hashed))
+
+    def enrich_urls(self, urls, host_filter, fields=None, chunk_size=10000):
+        """Look up a stream of URLs, skipping hosts without intel.
+
+        Only URLs whose host passes host_filter (a HostFilter) are hashed
+        and looked up.
+
+        Returns (UrlEnrichment) iterate it for a UrlResult per URL, its
+        counters include the requests saved by the filter
+        """
+        return UrlEnrichment(self, urls, host_filter, fields=fields,
+                             chunk_size=chunk_size)
+
     def hosts_live_dns(self, hosts, fields=None):
         """Get live dns for hosts."""
         path = '/hosts/live_dns/'
@@ -191,61 +690,22 @@ class Seclytics(object):
         response = self._get_request(path, params)
         return response
 
-    def cidr_ips(self, cidr, fields=None):
-        """Get all the IPs for a CIDR."""
-        path = '/cidrs/{}/ips/'.format(cidr)
-        params = {}
-        if fields:
-            params[u'attributes'] = fields
-        response = self._get_request(path, params)
-        if 'data' not in response:
-            return
-        for row in response['data']:
-            yield Node.build_for_row(self, row)
-
+    def paginate(self, path, params=None, prefetch=False):
+        """Iterate the IOCs of every page of a collection path.
 
-class BulkDownload(object):
-    """Download files from the bulk endpoint."""
-
-    def __init__(self, api, endpoint, data_dir):
-        """Create a bulk download object.
-
-        Parameters:
-            api: the seclytics API client
-            endpoint: the item we want to download
-            data_dir: the dir we want to download to
+        Returns (PageIterator) with pages, rows and total counters
         """
-        self.api = api
-        self.endpoint = endpoint
-        self.data_dir = ''
-        if data_dir:
-            self.data_dir = data_dir
+        return PageIterator(self, path, params, prefetch=prefetch)
 
-    @property
-    def filename(self):
-        """Determine the file name."""
-        filename = self.endpoint.replace('/', '_')
-        if self.endpoint.startswith('/bulk'):
-            filename = os.path.basename(self.endpoint)
-        elif self.endpoint.endswith('/download'):
-            filename = os.path.basename(self.endpoint[:-9])
-        return os.path.join(self.data_dir, filename)
+    def cidr_ips(self, cidr, fields=None, prefetch=False):
+        """Get all the IPs for a CIDR, following every page.
 
-    @property
-    def api_reponse(self):
-        """Get the API response."""
-        api_path = self.endpoint
-        url = self.api.base_url + api_path
-        response = self.api.session.get(url, stream=True,
-                                        timeout=self.api.timeout)
-        self.api._check_response_for_errors(response)
-        return response
+        Returns (PageIterator) iterate it, or call next() on it like the
+            generator this returned before, for the IPs
+        """
+        path = '/cidrs/{}/ips/'.format(cidr)
+        params = {}
+        if fields:
+            params[u'attributes'] = fields
+        return self.paginate(path, params, prefetch=prefetch)
 
-    def download(self):
-        """Download API response to file."""
-        response = self.api_reponse
-        with open(self.filename, 'wb') as file_handle:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    file_handle.write(chunk)
-        return self.filename
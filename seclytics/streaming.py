@@ -0,0 +1,112 @@
+"""Incremental parsing of large JSON API responses
+
+The index endpoints answer with ``{"data": [row, row, ...], ...}``.
+``iter_json_items`` yields each row of the array as soon as it has been
+read off the socket, so memory stays bounded by the size of one row no
+matter how large the response is.
+"""
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class _Reader(object):
+    """Text buffer filled from an iterator of byte chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = u''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read another chunk, returns False at the end of the input"""
+        if self.eof:
+            return False
+        # drop what has been parsed so the buffer stays small
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer += self.decoder.decode(chunk)
+                return True
+        self.buffer += self.decoder.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        """The next non whitespace character, None at the end"""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected %r at %d" % (char, self.pos))
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                (value, end) = _decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+            # a value is only complete once the character after it is read,
+            # a number split across chunks would otherwise be cut short
+            if end < len(self.buffer) or self.eof:
+                self.pos = end
+                return value
+            self.fill()
+
+
+def iter_json_items(chunks, key='data', meta=None):
+    """Yield the items of the top level ``key`` array of a JSON object
+
+    Parameters:
+        chunks: iterable of bytes, e.g. response.iter_content()
+        key: the member holding the array
+        meta: optional dict that gets the other top level members, it's
+            complete once the generator is exhausted
+
+    Raises ValueError on invalid JSON.
+    """
+    reader = _Reader(chunks)
+    reader.expect(u'{')
+    while True:
+        char = reader.peek()
+        if char == u'}':
+            return
+        if char == u',':
+            reader.pos += 1
+            continue
+        name = reader.value()
+        reader.expect(u':')
+        if name != key or reader.peek() != u'[':
+            value = reader.value()
+            if meta is not None:
+                meta[name] = value
+            continue
+
+        reader.pos += 1
+        while True:
+            char = reader.peek()
+            if char == u']':
+                reader.pos += 1
+                break
+            if char == u',':
+                reader.pos += 1
+                continue
+            if char is None:
+                raise ValueError("Unterminated array %r" % key)
+            yield reader.value()
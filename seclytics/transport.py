@@ -0,0 +1,177 @@
+"""Build the requests session used by the client
+
+The default requests adapter keeps at most 10 connections per host, which
+is too few once a client is shared by a thread pool. ``build_session``
+sizes the pool and optionally swaps in an HTTP/2 transport (requires
+``pip install httpx[http2]``).
+"""
+import os
+import ssl
+import threading
+import certifi
+import requests
+from requests.adapters import HTTPAdapter, BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# connection specific headers, HTTP/2 forbids them
+HOP_BY_HOP_HEADERS = frozenset(['connection', 'keep-alive',
+                                'proxy-connection', 'transfer-encoding',
+                                'upgrade'])
+
+
+def build_session(pool_size=10, max_retries=0, keep_alive=True,
+                  http2=False):
+    """Create a session for the API
+
+    Parameters:
+        pool_size: connections kept open per host
+        max_retries: connection level retries done by the adapter
+        keep_alive: reuse connections between requests
+        http2: use the httpx HTTP/2 transport
+
+    Returns (Session)
+    """
+    session = requests.Session()
+    if http2:
+        # the adapter drops the Connection header, httpx closes the
+        # connections instead
+        adapter = Http2Adapter(pool_size=pool_size, max_retries=max_retries,
+                               keep_alive=keep_alive)
+    else:
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size,
+                              max_retries=max_retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive and not http2:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+class _HttpxRaw(object):
+    """Exposes a streamed httpx response the way requests reads raw"""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = None
+
+    def stream(self, chunk_size, decode_content=True):
+        for chunk in self._response.iter_bytes(chunk_size):
+            yield chunk
+
+    def read(self, amt=None):
+        if self._chunks is None:
+            self._chunks = self._response.iter_bytes(amt)
+        return next(self._chunks, b'')
+
+    def close(self):
+        self._response.close()
+
+    release_conn = close
+
+
+def ssl_context(verify=True, cert=None):
+    """SSL context for requests' verify and cert options
+
+    Parameters:
+        verify: True, False or a CA bundle file or directory
+        cert: client certificate file or a (cert, key) tuple
+    """
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif verify is True:
+        context = ssl.create_default_context(cafile=certifi.where())
+    elif os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    else:
+        context = ssl.create_default_context(cafile=verify)
+    if cert:
+        if isinstance(cert, tuple):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+    return context
+
+
+class Http2Adapter(BaseAdapter):
+    """requests adapter that sends requests with an httpx HTTP/2 client
+
+    httpx sets TLS options and proxies per client, so a client is kept
+    for every verify, cert and proxy combination the session uses. Without
+    keep_alive no connection is kept open after its response.
+    """
+
+    def __init__(self, pool_size=10, max_retries=0, keep_alive=True):
+        if httpx is None:
+            raise RuntimeError("http2 requires: pip install httpx[http2]")
+        super(Http2Adapter, self).__init__()
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, verify, cert, proxy):
+        key = (verify, cert, proxy)
+        with self._lock:
+            client = self.clients.get(key)
+            if client is None:
+                keep_alive = self.pool_size if self.keep_alive else 0
+                limits = httpx.Limits(max_connections=self.pool_size,
+                                      max_keepalive_connections=keep_alive)
+                transport = httpx.HTTPTransport(
+                    http2=True, limits=limits, retries=self.max_retries,
+                    verify=ssl_context(verify, cert), proxy=proxy)
+                client = self.clients[key] = httpx.Client(transport=transport)
+        return client
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        proxy = select_proxy(request.url, proxies or {})
+        client = self._client(verify, cert, proxy)
+        headers = dict((name, value) for (name, value)
+                       in request.headers.items()
+                       if name.lower() not in HOP_BY_HOP_HEADERS)
+        httpx_request = client.build_request(
+            request.method, request.url, headers=headers,
+            content=request.body, timeout=timeout)
+        try:
+            httpx_response = client.send(httpx_request, stream=stream)
+        except httpx.TimeoutException as error:
+            raise requests.Timeout(error, request=request)
+        except httpx.TransportError as error:
+            raise requests.ConnectionError(error, request=request)
+        return self.build_response(request, httpx_response, stream)
+
+    @staticmethod
+    def build_response(request, httpx_response, stream):
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.reason = httpx_response.reason_phrase
+        response.headers = CaseInsensitiveDict(httpx_response.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.raw = _HttpxRaw(httpx_response)
+        if not stream:
+            response._content = httpx_response.read()
+            httpx_response.close()
+        return response
+
+    def close(self):
+        with self._lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
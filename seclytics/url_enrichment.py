@@ -0,0 +1,160 @@
+"""Enrich URLs, skipping the API for hosts without intel
+
+The host of every URL is checked against a local host filter, a bloom
+file or a list of hosts from the bulk API. Only URLs whose host (or a
+parent domain) has intel are hashed and looked up, the others are
+marked as locally cleared.
+
+    hosts = HostFilter.from_bulk(client, 'host-threat-intel.bloom')
+    enrichment = client.enrich_urls(urls, hosts)
+    for result in enrichment:
+        if result.status == FOUND:
+            print(result.url, result.ioc.categories)
+    print(enrichment.cleared, enrichment.requests_saved)
+"""
+from collections import namedtuple
+from .batching import chunked
+from .portable_bloom import PortableBloom
+from .url_hashing import hash_urls, url_key
+
+# the status of a UrlResult
+FOUND = 'found'
+NOT_FOUND = 'not_found'
+CLEARED = 'locally_cleared'
+INVALID = 'invalid'
+
+UrlResult = namedtuple('UrlResult', 'url status ioc')
+
+
+def parent_domains(host):
+    """The host and its parent domains, example.com is the last
+
+    IPs have no parents.
+    """
+    if ':' in host or host.replace('.', '').isdigit():
+        return [host]
+    labels = host.split('.')
+    return ['.'.join(labels[i:]) for i in range(max(len(labels) - 1, 1))]
+
+
+class HostFilter(object):
+    """The hosts with intel, from a bloom file or a file of hosts
+
+    Attributes:
+        check_parents (bool): a host has intel when one of its parent
+            domains does
+    """
+    def __init__(self, path=None, hosts=None, check_parents=True):
+        self.check_parents = check_parents
+        self.bloom = None
+        self.hosts = set(host.lower() for host in hosts or ())
+        if path is not None and path.endswith('.bloom'):
+            self.bloom = PortableBloom(path)
+        elif path is not None:
+            with open(path) as file_handle:
+                self.hosts.update(line.strip().lower()
+                                  for line in file_handle if line.strip())
+
+    @classmethod
+    def from_bulk(cls, client, name, data_dir='/tmp/', **kwargs):
+        """Download (when changed) and load a bulk hosts file"""
+        path = client.bulk_api_download(name, data_dir=data_dir)
+        return cls(path, **kwargs)
+
+    def _candidates(self, host):
+        if self.check_parents:
+            return parent_domains(host)
+        return [host]
+
+    def hosts_with_intel(self, hosts):
+        """The hosts that have intel, checked in bulk"""
+        candidates = {}
+        for host in hosts:
+            for candidate in self._candidates(host):
+                candidates.setdefault(candidate, []).append(host)
+        names = list(candidates)
+        if self.bloom is not None:
+            matches = self.bloom.contains_many(names)
+        else:
+            matches = [name in self.hosts for name in names]
+        return set(host for (name, match) in zip(names, matches) if match
+                   for host in candidates[name])
+
+    def has_intel(self, host):
+        """The host or one of its parents has intel"""
+        return bool(self.hosts_with_intel([host.lower()]))
+
+
+class UrlEnrichment(object):
+    """Iterates a UrlResult for every URL, in input order
+
+    Attributes:
+        urls (int): URLs read so far
+        invalid (int): URLs without a hostname
+        cleared (int): URLs cleared by the host filter
+        looked_up (int): distinct hashed URLs sent to the API
+        found (int): URLs the API had data for
+        requests (int): lookup requests made
+        requests_saved (int): lookup requests the host filter avoided
+    """
+    def __init__(self, client, urls, host_filter, fields=None,
+                 chunk_size=10000):
+        self.client = client
+        self.source = urls
+        self.host_filter = host_filter
+        self.fields = fields
+        self.chunk_size = chunk_size
+        self.urls = 0
+        self.invalid = 0
+        self.cleared = 0
+        self.looked_up = 0
+        self.found = 0
+        self.requests = 0
+        self.requests_saved = 0
+
+    def __iter__(self):
+        for chunk in chunked(self.source, self.chunk_size):
+            for result in self._enrich_chunk(chunk):
+                yield result
+
+    def _batches(self, count):
+        batch_size = self.client.batch_size
+        return -(-count // batch_size)
+
+    def _enrich_chunk(self, urls):
+        keys = [url_key(url) for url in urls]
+        with_intel = self.host_filter.hosts_with_intel(
+            set(key[0] for key in keys if key))
+        # without the filter every distinct key would have been sent
+        distinct = set(key for key in keys if key)
+        send = [url for (url, key) in zip(urls, keys)
+                if key and key[0] in with_intel]
+        hashed = dict(zip(send, hash_urls(send)))
+        distinct_sent = set(hashed.values())
+
+        found = {}
+        if distinct_sent:
+            for ioc in self.client._ioc_index('urls', distinct_sent,
+                                              self.fields):
+                if ioc is not None:
+                    found[ioc.ioc_id] = ioc
+        requests = self._batches(len(distinct_sent))
+        self.urls += len(urls)
+        self.looked_up += len(distinct_sent)
+        self.requests += requests
+        self.requests_saved += self._batches(len(distinct)) - requests
+
+        for (url, key) in zip(urls, keys):
+            if key is None:
+                self.invalid += 1
+                yield UrlResult(url, INVALID, None)
+            elif key[0] not in with_intel:
+                self.cleared += 1
+                yield UrlResult(url, CLEARED, None)
+            else:
+                ioc = found.get(hashed[url])
+                if ioc is None:
+                    yield UrlResult(url, NOT_FOUND, None)
+                else:
+                    self.found += 1
+                    yield UrlResult(url, FOUND, ioc)
@@ -0,0 +1,141 @@
+"""Hash URLs for the url lookups in bulk
+
+A URL is looked up as ``hostname/sha1(path)/sha1(query)``. URLs that
+differ only in scheme, port, credentials or fragment share a hash, so
+the (hostname, path, query) keys are deduplicated before hashing and the
+digests of repeated paths and queries are computed once per chunk.
+
+    hasher = UrlHasher(workers=4)
+    for (url, hashed_url) in hasher.map(urls):
+        ...
+"""
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha1
+from .batching import chunked, fan_out
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+# URLs with any of these take the urlparse path, they have ;params, IPv6
+# hosts or characters urlparse removes
+_SLOW_PATH_CHARS = frozenset(';[]\t\r\n')
+
+
+def url_key(url):
+    """(hostname, path, query) of a URL, None without a hostname
+
+    The same parts urlparse gives, plain http(s) URLs are split without
+    it.
+    """
+    url = url.strip()
+    if url.startswith('https://'):
+        rest = url[8:]
+    elif url.startswith('http://'):
+        rest = url[7:]
+    else:
+        rest = None
+    if rest is None or not _SLOW_PATH_CHARS.isdisjoint(url):
+        parsed = urlparse(url)
+        if not parsed.hostname:
+            return None
+        return (parsed.hostname, parsed.path, parsed.query)
+
+    end = len(rest)
+    for delimiter in '/?#':
+        position = rest.find(delimiter, 0, end)
+        if position >= 0:
+            end = position
+    netloc = rest[:end]
+    rest = rest[end:].split('#', 1)[0]
+    (path, _, query) = rest.partition('?')
+    hostname = netloc.rpartition('@')[2].partition(':')[0]
+    if not hostname:
+        return None
+    # like urlparse the zone after a % keeps its case
+    (hostname, percent, zone) = hostname.partition('%')
+    hostname = hostname.lower() + percent + zone
+    return (hostname, path, query)
+
+
+def _digest(value):
+    if isinstance(value, text_type):
+        value = value.encode('utf8')
+    return sha1(value).hexdigest()
+
+
+def hash_url(url):
+    """The hashed form of one URL, None without a hostname"""
+    key = url_key(url)
+    if key is None:
+        return None
+    return '/'.join((key[0], _digest(key[1]), _digest(key[2])))
+
+
+def hash_urls(urls):
+    """The hashed form of every URL (None without a hostname), in order"""
+    digests = {}
+    hashed_keys = {}
+    hashed = []
+    for url in urls:
+        key = url_key(url)
+        if key is None:
+            hashed.append(None)
+            continue
+        hashed_url = hashed_keys.get(key)
+        if hashed_url is None:
+            parts = [key[0]]
+            for value in key[1:]:
+                digest = digests.get(value)
+                if digest is None:
+                    digest = digests[value] = _digest(value)
+                parts.append(digest)
+            hashed_url = hashed_keys[key] = '/'.join(parts)
+        hashed.append(hashed_url)
+    return hashed
+
+
+class UrlHasher(object):
+    """Hashes streams of URLs in chunks, on a process pool when workers
+    is more than 1
+
+    Attributes:
+        workers (int): hashing processes
+        chunk_size (int): URLs sent to a process at a time
+    """
+    def __init__(self, workers=1, chunk_size=10000):
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def map_chunks(self, urls):
+        """Yield lists of (url, hashed_url) in input order, a list per
+        chunk"""
+        chunks = chunked(urls, self.chunk_size)
+        if self.workers <= 1:
+            for chunk in chunks:
+                yield _hash_chunk(chunk)
+            return
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for pairs in fan_out(_hash_chunk, chunks, self.workers,
+                                 preserve_order=True, executor=executor):
+                yield pairs
+        finally:
+            executor.shutdown(wait=True)
+
+    def map(self, urls):
+        """Yield (url, hashed_url) for every URL in input order"""
+        for pairs in self.map_chunks(urls):
+            for pair in pairs:
+                yield pair
+
+
+def _hash_chunk(chunk):
+    return list(zip(chunk, hash_urls(chunk)))
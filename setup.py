@@ -33,12 +33,17 @@ about = {}
 with open(path.join(here, 'seclytics', '__version__.py'), 'r') as f:
     exec(f.read(), about)
 
-requires = ['requests', 'texttable', 'ipaddress']
+requires = ['requests', 'texttable', 'ipaddress',
+            'futures; python_version < "3.0"']
 
 test_require = requires + ['pytest', 'requests-mock']
 
 extras = {
-    'test': test_require
+    'test': test_require,
+    'http2': ['httpx[http2]'],
+    'fast': ['numpy', 'orjson; python_version >= "3.6"',
+             'ujson; python_version < "3.6"'],
+    'parquet': ['pyarrow'],
 }
 
 setup(
@@ -0,0 +1,6 @@
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 7):
+    # async def is a syntax error on python 2, asyncio.run is 3.7+
+    collect_ignore.append('test_async_seclytics.py')
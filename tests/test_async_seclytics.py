@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from seclytics import AsyncSeclytics
+from seclytics.bloom_category import BloomCategory
+from seclytics.exceptions import OverQuota
+from seclytics.rate_limit import RetryPolicy
+
+
+@pytest.fixture
+def test_requests(requests_mock):
+    url = 'https://api.seclytics.com/ips/1.1.1.1'
+    requests_mock.get(url, json={'type': 'ip', 'id': '1.1.1.1'})
+
+    url = 'https://api.seclytics.com/ips/'
+    requests_mock.get(url, json={'data': [{'type': 'ip', 'id': '1.1.1.1'},
+                                          {'type': 'ip', 'id': '2.2.2.2'}]})
+
+    url = 'https://api.seclytics.com/ips/3.3.3.3'
+    requests_mock.get(url, status_code=429)
+
+
+@pytest.fixture
+def bloom_filters(tmp_path):
+    pybloomfilter = pytest.importorskip('pybloomfilter')
+    paths = []
+    for name in ('malicious', 'has_intel', 'predicted'):
+        path = str(tmp_path / name)
+        bloom = pybloomfilter.BloomFilter(1000, 0.1, path)
+        bloom.add('1.1.1.1')
+        bloom.close()
+        paths.append(path)
+    return paths
+
+
+class TestAsyncSeclytics:
+    def test_ip(self, test_requests):
+        """Single lookups return the same IOC objects."""
+        async def lookup():
+            async with AsyncSeclytics('', concurrency=2) as client:
+                return await asyncio.gather(client.ip('1.1.1.1'),
+                                            client.ip('1.1.1.1'))
+        reports = asyncio.run(lookup())
+        assert [r.ioc_id for r in reports] == ['1.1.1.1', '1.1.1.1']
+
+    def test_ips(self, test_requests):
+        """Multiple lookups return a list of nodes."""
+        async def lookup():
+            async with AsyncSeclytics('') as client:
+                return await client.ips(['1.1.1.1', '2.2.2.2'])
+        reports = asyncio.run(lookup())
+        assert [r.ioc_id for r in reports] == ['1.1.1.1', '2.2.2.2']
+
+    def test_errors(self, test_requests):
+        """Errors are raised the same as the sync client."""
+        async def lookup():
+            retry = RetryPolicy(max_retries=0)
+            async with AsyncSeclytics('', retry=retry) as client:
+                return await client.ip('3.3.3.3')
+        with pytest.raises(OverQuota):
+            asyncio.run(lookup())
+
+    def test_concurrency(self):
+        with pytest.raises(ValueError):
+            AsyncSeclytics('', concurrency=0)
+
+    def test_bloom_gated(self, bloom_filters, requests_mock):
+        mock = requests_mock.get('https://api.seclytics.com/ips/', json={})
+
+        async def lookup():
+            async with AsyncSeclytics(
+                    '', bloom=BloomCategory(*bloom_filters)) as client:
+                return (await client.ip('8.8.8.8'),
+                        await client.ips(['9.9.9.9']))
+        (ioc, iocs) = asyncio.run(lookup())
+        assert ioc.ioc_id == '8.8.8.8'
+        assert [ioc.ioc_id for ioc in iocs] == ['9.9.9.9']
+        assert not mock.called
@@ -0,0 +1,52 @@
+import time
+import pytest
+from seclytics import Seclytics
+from seclytics.batching import chunked, fan_out
+
+
+@pytest.fixture
+def test_requests(requests_mock):
+    def index(request, context):
+        ids = request.qs['ids'][0].split(',')
+        return {'data': [{'type': 'ip', 'id': ioc} for ioc in ids]}
+    url = 'https://api.seclytics.com/ips/'
+    return requests_mock.get(url, json=index)
+
+
+class TestBatching:
+    def test_chunked(self):
+        chunks = list(chunked((i for i in range(7)), 3))
+        assert chunks == [[0, 1, 2], [3, 4, 5], [6]]
+        with pytest.raises(ValueError):
+            list(chunked([], 0))
+
+    def test_fan_out_order(self):
+        def slow(chunk):
+            # make the first chunks finish last
+            time.sleep(0.01 * (5 - chunk[0]))
+            return chunk[0]
+        chunks = [[i] for i in range(5)]
+        ordered = list(fan_out(slow, chunks, workers=5, preserve_order=True))
+        assert ordered == [0, 1, 2, 3, 4]
+        unordered = list(fan_out(slow, chunks, workers=5))
+        assert sorted(unordered) == [0, 1, 2, 3, 4]
+
+    def test_fan_out_errors(self):
+        def fail(chunk):
+            raise RuntimeError(chunk)
+        with pytest.raises(RuntimeError):
+            list(fan_out(fail, [[1], [2], [3]], workers=2))
+
+    def test_ips_batches(self, test_requests):
+        """Large lookups are split into batch_size requests."""
+        client = Seclytics('', batch_size=10, workers=3)
+        ips = ('10.0.0.%d' % i for i in range(95))
+        nodes = list(client.ips(ips, preserve_order=True))
+        assert [n.ioc_id for n in nodes] == ['10.0.0.%d' % i
+                                             for i in range(95)]
+        assert test_requests.call_count == 10
+
+    def test_ips_string(self, test_requests):
+        client = Seclytics('')
+        nodes = list(client.ips('1.1.1.1'))
+        assert [n.ioc_id for n in nodes] == ['1.1.1.1']
@@ -1,8 +1,11 @@
+import os
 import sys
-from tempfile import NamedTemporaryFile
+import time
+from tempfile import NamedTemporaryFile, mkdtemp
 import ipaddress
 import pytest
-from seclytics.bloom_category import BloomCategory
+from seclytics import Seclytics
+from seclytics.bloom_category import BloomCategory, Category
 from pybloomfilter import BloomFilter
 
 
@@ -69,3 +72,196 @@ class TestBloomCategory(object):
             else:
                 ip_digit = str(int(ipaddress.IPv4Address(ip_addr)))
             assert category.check_ip(ip_digit)
+
+    def test_check_ips(self, bloom_filters):
+        """Bulk checks match check_ip for every input form"""
+        numpy = pytest.importorskip('numpy')
+        category = BloomCategory(*bloom_filters)
+        ips = ['8.8.8.8', '1.1.1.1', '2.2.2.2', '3.3.3.3', '4.4.4.4']
+        expected = [category.check_ip(ip_addr) for ip_addr in ips]
+        expected = [c.value if c else 0 for c in expected]
+        ints = [int(ipaddress.IPv4Address(u'%s' % ip)) for ip in ips]
+
+        assert list(category.check_ips(ips)) == expected
+        assert list(category.check_ips([str(i) for i in ints])) == expected
+        array = numpy.array(ints, dtype=numpy.uint32)
+        assert list(category.check_ips(array)) == expected
+        assert list(category.check_ips(array.astype('>u4').tobytes())) == \
+            expected
+        assert len(category.check_ips([])) == 0
+
+    def test_check_ips_flags(self, bloom_filters):
+        pytest.importorskip('numpy')
+        category = BloomCategory(*bloom_filters)
+        ips = ['1.1.1.1', '2.2.2.2', '4.4.4.4', '8.8.8.8']
+        for flags in [(True, False, False), (False, True, False),
+                      (False, False, True), (True, True, False)]:
+            kwargs = dict(zip(('check_suspicious', 'check_predicted',
+                               'check_malicious'), flags))
+            expected = [category.check_ip(ip_addr, **kwargs) for ip_addr in ips]
+            expected = [c.value if c else 0 for c in expected]
+            assert list(category.check_ips(ips, **kwargs)) == expected
+
+    @pytest.mark.parametrize('address', [
+        '0.0.0.0', '8.8.8.8', '255.255.255.255', '::', '::1', '2001:db8::1',
+        '2001:db8:0:0:1:0:0:1', 'fe80::1ff:fe23:4567:890a', '1::',
+        '2001:0DB8:0000:0000:0000:FF00:0042:8329', '::ffff:1.2.3.4'])
+    def test_format_ip(self, address):
+        ip = ipaddress.ip_address(u'%s' % address)
+        formatted = BloomCategory.format_ip
+        assert formatted(address) == str(ip)
+        if ip.version == 4:
+            assert formatted(str(int(ip))) == str(ip)
+        elif int(ip) >> 32 == 0 or ip.ipv4_mapped:
+            # ints are IPv4 up to 32 bits, mapped IPv4 string forms differ
+            # between python versions
+            return
+        assert formatted(int(ip)) == str(ip)
+        assert formatted(ip.packed) == str(ip)
+
+    def test_format_ip_invalid(self):
+        for value in ('1::2::3', 'x::y', 'not an ip', 'fe80::1%eth0',
+                      '0x1:2:3:4:5:6:7:8', '1_0::1', '+1::', ' 1::2',
+                      '1::2\n', '12345::1'):
+            assert BloomCategory.format_ip(value) == value
+        with pytest.raises(TypeError):
+            BloomCategory.format_ip(None)
+
+
+def write_bloom(path, values):
+    """Write a bloom then rename it into place like a download does"""
+    tmp_path = path + '.tmp'
+    bloom = BloomFilter(1000, 0.01, tmp_path)
+    bloom.update(values)
+    bloom.sync()
+    os.rename(tmp_path, path)
+
+
+@pytest.fixture
+def bloom_dir():
+    data_dir = mkdtemp()
+    paths = [os.path.join(data_dir, name)
+             for name in ('malicious.bloom', 'intel.bloom', 'predicted.bloom')]
+    for path in paths:
+        write_bloom(path, ['1.1.1.1'])
+    return paths
+
+
+class TestBloomReload(object):
+    def test_reload(self, bloom_dir):
+        category = BloomCategory(*bloom_dir)
+        assert category.check_ip('1.1.1.1') == Category.predicted
+        assert not category.reload()
+
+        old_filters = category.has_intel
+        for path in bloom_dir:
+            write_bloom(path, ['5.5.5.5'])
+        assert category.reload(force=True)
+        assert category.check_ip('5.5.5.5') == Category.predicted
+        assert not category.check_ip('1.1.1.1')
+        # the replaced filters still answer for checks in flight
+        assert old_filters.contains('1.1.1.1')
+
+    def test_reload_keeps_filters_on_error(self, bloom_dir):
+        category = BloomCategory(*bloom_dir)
+        os.remove(bloom_dir[1])
+        assert not category.reload()
+        assert category.check_ip('1.1.1.1') == Category.predicted
+
+    def test_auto_reload(self, bloom_dir):
+        category = BloomCategory(*bloom_dir, auto_reload=0.01)
+        try:
+            for path in bloom_dir:
+                write_bloom(path, ['6.6.6.6'])
+            for _ in range(200):
+                if category.check_ip('6.6.6.6'):
+                    break
+                time.sleep(0.01)
+            assert category.check_ip('6.6.6.6') == Category.predicted
+        finally:
+            category.stop()
+
+
+class TestBloomGate(object):
+    def test_ip(self, bloom_filters, requests_mock):
+        mock = requests_mock.get('https://api.seclytics.com/ips/1.1.1.1',
+                                 json={'type': 'ip', 'id': '1.1.1.1',
+                                       'score': {'value': 90}})
+        client = Seclytics('', bloom=BloomCategory(*bloom_filters))
+        clean = client.ip('8.8.8.8')
+        assert clean.ioc_id == '8.8.8.8'
+        assert clean.score is None
+        assert clean.categories == []
+        assert client.ip('1.1.1.1').score == 90
+        assert mock.call_count == 1
+        gate = client.bloom_gate
+        assert (gate.checked, gate.short_circuited, gate.rate) == (2, 1, 0.5)
+
+    @pytest.mark.parametrize('preserve_order', [False, True])
+    def test_ips(self, bloom_filters, requests_mock, preserve_order):
+        pytest.importorskip('numpy')
+        mock = requests_mock.get(
+            'https://api.seclytics.com/ips/',
+            json={'data': [{'type': 'ip', 'id': '1.1.1.1'},
+                           {'type': 'ip', 'id': '4.4.4.4'}]})
+        client = Seclytics('', bloom=BloomCategory(*bloom_filters))
+        ips = ['8.8.8.8', '1.1.1.1', '9.9.9.9', '4.4.4.4']
+        iocs = list(client.ips(iter(ips), preserve_order=preserve_order))
+        assert mock.last_request.qs['ids'] == ['1.1.1.1,4.4.4.4']
+        if preserve_order:
+            assert [ioc.ioc_id for ioc in iocs] == ips
+        else:
+            assert sorted(ioc.ioc_id for ioc in iocs) == sorted(ips)
+        assert client.bloom_gate.short_circuited == 2
+        assert client.bloom_gate.rate == 0.5
+
+    def test_all_clean(self, bloom_filters, requests_mock):
+        pytest.importorskip('numpy')
+        mock = requests_mock.get('https://api.seclytics.com/ips/', json={})
+        client = Seclytics('', bloom=BloomCategory(*bloom_filters))
+        assert [ioc.ioc_id for ioc in client.ips('8.8.8.8')] == ['8.8.8.8']
+        assert not mock.called
+
+    def test_ips_without_numpy(self, bloom_filters, requests_mock,
+                               monkeypatch):
+        monkeypatch.setattr('seclytics.bloom_gate.numpy', None)
+        monkeypatch.setattr('seclytics.bloom_category.numpy', None)
+        mock = requests_mock.get(
+            'https://api.seclytics.com/ips/',
+            json={'data': [{'type': 'ip', 'id': '1.1.1.1'}]})
+        client = Seclytics('', bloom=BloomCategory(*bloom_filters))
+        iocs = list(client.ips(['8.8.8.8', '1.1.1.1'], preserve_order=True))
+        assert [ioc.ioc_id for ioc in iocs] == ['8.8.8.8', '1.1.1.1']
+        assert mock.last_request.qs['ids'] == ['1.1.1.1']
+
+    def test_ips_any_form(self, bloom_filters, requests_mock):
+        mock = requests_mock.get(
+            'https://api.seclytics.com/ips/',
+            json={'data': [{'type': 'ip', 'id': '1.1.1.1'},
+                           {'type': 'ip', 'id': '4.4.4.4'}]})
+        client = Seclytics('', bloom=BloomCategory(*bloom_filters))
+        ips = ['8.8.8.8', str(0x01010101), 0x04040404]
+        iocs = list(client.ips(ips, preserve_order=True))
+        assert [ioc.ioc_id for ioc in iocs] == ['8.8.8.8', '1.1.1.1',
+                                               '4.4.4.4']
+        assert mock.last_request.qs['ids'] == ['1.1.1.1,4.4.4.4']
+
+    def test_ips_streamed(self, bloom_filters, requests_mock):
+        requests_mock.get(
+            'https://api.seclytics.com/ips/',
+            json={'data': [{'type': 'ip', 'id': '1.1.1.1'}]})
+        read = []
+
+        def ips():
+            for ip_addr in ['1.1.1.1', '8.8.8.8'] * 50:
+                read.append(ip_addr)
+                yield ip_addr
+        client = Seclytics('', batch_size=2, workers=1,
+                           bloom=BloomCategory(*bloom_filters))
+        iocs = client.ips(ips(), preserve_order=True)
+        assert [next(iocs).ioc_id, next(iocs).ioc_id] == ['1.1.1.1',
+                                                          '8.8.8.8']
+        # fan_out reads one batch ahead, the rest is still unread
+        assert len(read) == 4
+        assert client.bloom_gate.checked == 2
+        assert len(list(iocs)) == 98
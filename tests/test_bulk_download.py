@@ -1,8 +1,13 @@
+import hashlib
+import os
+from tempfile import mkdtemp
 import pytest
 import json
+import requests
 import requests_mock
 from seclytics import Seclytics, BulkDownload
-from seclytics.exceptions import InvalidAccessToken, ApiError
+from seclytics.exceptions import InvalidAccessToken, ApiError, DownloadError
+from seclytics.rate_limit import RetryPolicy
 
 
 
@@ -59,3 +64,200 @@ class TestBulkDownload:
             file_path = api_client.bulk_api_download('noperms.json', '/tmp/')
         with pytest.raises(ApiError):
             file_path = api_client.bulk_api_download('private/missing.json', '/tmp/')
+
+
+CONTENT = bytes(bytearray(range(256))) * 40
+BULK_URL = 'https://api.seclytics.com/bulk/big.bin'
+
+
+@pytest.fixture
+def ranged_requests(requests_mock):
+    """Serve CONTENT with HTTP range support"""
+    def serve(request, context):
+        byte_range = request.headers.get('Range')
+        context.headers['Accept-Ranges'] = 'bytes'
+        if not byte_range:
+            context.headers['Content-Length'] = str(len(CONTENT))
+            return CONTENT
+        (start, end) = byte_range.split('=')[1].split('-')
+        start = int(start)
+        end = int(end) if end else len(CONTENT) - 1
+        context.status_code = 206
+        context.headers['Content-Range'] = 'bytes %d-%d/%d' % (
+            start, end, len(CONTENT))
+        return CONTENT[start:end + 1]
+
+    requests_mock.get(BULK_URL, content=serve)
+    requests_mock.head(BULK_URL, headers={
+        'Accept-Ranges': 'bytes', 'Content-Length': str(len(CONTENT))})
+    return requests_mock
+
+
+class TestResumableDownload:
+    def test_atomic(self, ranged_requests):
+        data_dir = mkdtemp()
+        file_path = Seclytics('').bulk_api_download('big.bin', data_dir)
+        assert open(file_path, 'rb').read() == CONTENT
+        assert os.listdir(data_dir) == ['big.bin']
+
+    def test_resume(self, ranged_requests):
+        data_dir = mkdtemp()
+        with open(os.path.join(data_dir, 'big.bin.part'), 'wb') as part:
+            part.write(CONTENT[:1000])
+        file_path = Seclytics('').bulk_api_download('big.bin', data_dir)
+        assert open(file_path, 'rb').read() == CONTENT
+        assert ranged_requests.last_request.headers['Range'] == 'bytes=1000-'
+
+    def test_segments(self, ranged_requests):
+        data_dir = mkdtemp()
+        file_path = Seclytics('').bulk_api_download(
+            'big.bin', data_dir, segments=4, min_segment_size=1,
+            chunk_size=100)
+        assert open(file_path, 'rb').read() == CONTENT
+        ranges = [r.headers.get('Range') for r in ranged_requests.request_history
+                  if r.method == 'GET']
+        assert len(ranges) == 4 and all(ranges)
+
+    def test_checksum(self, ranged_requests):
+        data_dir = mkdtemp()
+        client = Seclytics('')
+        checksum = 'sha256:' + hashlib.sha256(CONTENT).hexdigest()
+        client.bulk_api_download('big.bin', data_dir, checksum=checksum)
+        os.remove(os.path.join(data_dir, 'big.bin'))
+        with pytest.raises(DownloadError):
+            client.bulk_api_download('big.bin', data_dir,
+                                     checksum='sha256:' + '0' * 64)
+        assert os.listdir(data_dir) == []
+
+    def test_truncated(self, requests_mock):
+        """A short response is never published"""
+        requests_mock.get(BULK_URL, content=CONTENT[:100],
+                          headers={'Content-Length': str(len(CONTENT))})
+        data_dir = mkdtemp()
+        client = Seclytics('', retry=RetryPolicy(max_retries=0))
+        with pytest.raises(DownloadError, match='Incomplete download'):
+            client.bulk_api_download('big.bin', data_dir)
+        assert not os.path.exists(os.path.join(data_dir, 'big.bin'))
+        # kept for the next download to resume
+        part_filename = os.path.join(data_dir, 'big.bin.part')
+        assert open(part_filename, 'rb').read() == CONTENT[:100]
+
+    def test_changed_between_attempts(self, requests_mock):
+        """A resume of a file that changed starts again from 0"""
+        new_content = CONTENT[::-1]
+        versions = [('"v1"', CONTENT), ('"v2"', new_content)]
+
+        def serve(request, context):
+            (etag, content) = versions[0]
+            context.headers['ETag'] = etag
+            context.headers['Content-Length'] = str(len(content))
+            byte_range = request.headers.get('Range')
+            if not byte_range:
+                # drop the connection half way, the file then changes
+                versions.pop(0)
+                return content[:len(content) // 2]
+            if request.headers.get('If-Range') not in (None, etag):
+                return content
+            start = int(byte_range.split('=')[1].rstrip('-'))
+            context.status_code = 206
+            context.headers['Content-Range'] = 'bytes %d-%d/%d' % (
+                start, len(content) - 1, len(content))
+            return content[start:]
+
+        requests_mock.get(BULK_URL, content=serve)
+        data_dir = mkdtemp()
+        client = Seclytics('', retry=RetryPolicy(max_retries=1, backoff_factor=0))
+        file_path = client.bulk_api_download('big.bin', data_dir)
+        assert open(file_path, 'rb').read() == new_content
+        resume = requests_mock.last_request
+        assert resume.headers['Range'] == 'bytes=%d-' % (len(CONTENT) // 2)
+        assert resume.headers['If-Range'] == '"v1"'
+        assert json.load(open(file_path + '.meta'))['etag'] == '"v2"'
+        assert sorted(os.listdir(data_dir)) == ['big.bin', 'big.bin.meta']
+
+    def test_resume_across_runs(self, ranged_requests):
+        """The partial file's validators are sent from its .part.meta"""
+        data_dir = mkdtemp()
+        with open(os.path.join(data_dir, 'big.bin.part'), 'wb') as part:
+            part.write(CONTENT[:1000])
+        with open(os.path.join(data_dir, 'big.bin.part.meta'), 'w') as meta:
+            json.dump({'etag': '"v1"', 'last_modified': None}, meta)
+        file_path = Seclytics('').bulk_api_download('big.bin', data_dir)
+        assert open(file_path, 'rb').read() == CONTENT
+        assert ranged_requests.last_request.headers['If-Range'] == '"v1"'
+        assert os.listdir(data_dir) == ['big.bin']
+
+
+class TestConditionalDownload:
+    def test_not_modified(self, requests_mock):
+        def serve(request, context):
+            if request.headers.get('If-None-Match') == '"v1"':
+                context.status_code = 304
+                return b''
+            context.headers['ETag'] = '"v1"'
+            context.headers['Last-Modified'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+            return CONTENT
+        requests_mock.get(BULK_URL, content=serve)
+        data_dir = mkdtemp()
+        client = Seclytics('')
+        file_path = client.bulk_api_download('big.bin', data_dir)
+        meta = json.load(open(file_path + '.meta'))
+        assert meta['etag'] == '"v1"'
+        assert meta['size'] == len(CONTENT)
+
+        mtime = os.path.getmtime(file_path)
+        assert client.bulk_api_download('big.bin', data_dir) == file_path
+        history = requests_mock.request_history
+        assert history[-1].headers['If-None-Match'] == '"v1"'
+        assert history[-1].headers['If-Modified-Since']
+        assert os.path.getmtime(file_path) == mtime
+
+        # a file changed locally is downloaded again
+        with open(file_path, 'ab') as file_handle:
+            file_handle.write(b'extra')
+        client.bulk_api_download('big.bin', data_dir)
+        assert 'If-None-Match' not in requests_mock.last_request.headers
+        assert open(file_path, 'rb').read() == CONTENT
+
+    def test_unvalidated_resume(self, requests_mock):
+        """A resume without If-Range doesn't pin the file with a .meta"""
+        def serve(request, context):
+            context.headers['ETag'] = '"v2"'
+            context.status_code = 206
+            context.headers['Content-Range'] = 'bytes 1000-%d/%d' % (
+                len(CONTENT) - 1, len(CONTENT))
+            return CONTENT[1000:]
+        requests_mock.get(BULK_URL, content=serve)
+        data_dir = mkdtemp()
+        with open(os.path.join(data_dir, 'big.bin.part'), 'wb') as part:
+            part.write(CONTENT[:1000])
+        file_path = Seclytics('').bulk_api_download('big.bin', data_dir)
+        assert 'If-Range' not in requests_mock.last_request.headers
+        assert open(file_path, 'rb').read() == CONTENT
+        assert not os.path.exists(file_path + '.meta')
+
+    def test_conditional_resume(self, requests_mock):
+        """Resumes are conditional, a 304 drops the stale partial file"""
+        requests_mock.get(BULK_URL, status_code=304)
+        data_dir = mkdtemp()
+        file_path = os.path.join(data_dir, 'big.bin')
+        with open(file_path, 'wb') as file_handle:
+            file_handle.write(CONTENT)
+        with open(file_path + '.meta', 'w') as file_handle:
+            json.dump({'etag': '"v1"', 'size': len(CONTENT)}, file_handle)
+        with open(file_path + '.part', 'wb') as part:
+            part.write(CONTENT[:1000])
+        assert Seclytics('').bulk_api_download('big.bin', data_dir) == \
+            file_path
+        request = requests_mock.last_request
+        assert request.headers['If-None-Match'] == '"v1"'
+        assert request.headers['Range'] == 'bytes=1000-'
+        assert sorted(os.listdir(data_dir)) == ['big.bin', 'big.bin.meta']
+
+    def test_multiple_names(self, test_requests):
+        client = Seclytics('')
+        data_dir = mkdtemp()
+        paths = client.bulk_api_downloads(
+            ['test.json', 'private/private_test.json'], data_dir)
+        assert paths == [os.path.join(data_dir, 'test.json'),
+                         os.path.join(data_dir, 'private_test.json')]
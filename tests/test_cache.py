@@ -0,0 +1,77 @@
+import time
+import pytest
+from seclytics import Seclytics
+from seclytics.cache import MemoryCache, SqliteCache
+
+
+@pytest.fixture
+def test_requests(requests_mock):
+    def index(request, context):
+        ids = request.qs['ids'][0].split(',')
+        return {'data': [{'type': 'ip', 'id': ioc} for ioc in ids]}
+    requests_mock.get('https://api.seclytics.com/ips/', json=index)
+    requests_mock.get('https://api.seclytics.com/ips/1.1.1.1',
+                      json={'type': 'ip', 'id': '1.1.1.1'})
+    return requests_mock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCache(max_size=3, ttl=60)
+    return SqliteCache(str(tmp_path / 'cache.sqlite'), max_size=3, ttl=60)
+
+
+class TestCache:
+    def test_lru(self, cache):
+        cache.set_many({'a': {'id': 'a'}, 'b': {'id': 'b'}, 'c': {'id': 'c'}})
+        # touch a so b is the least recently used
+        time.sleep(0.01)
+        assert cache.get('a') == {'id': 'a'}
+        time.sleep(0.01)
+        cache.set('d', {'id': 'd'})
+        assert len(cache) == 3
+        assert cache.get('b') is None
+        assert sorted(cache.get_many(['a', 'b', 'c', 'd'])) == ['a', 'c', 'd']
+
+    def test_ttl(self, cache):
+        cache.ttl = -1
+        cache.set('a', {'id': 'a'})
+        assert cache.get('a') is None
+
+    def test_rows_copied(self, cache):
+        row = {'id': 'a', 'tags': ['x']}
+        cache.set('a', row)
+        row['tags'].append('y')
+        cached = cache.get('a')
+        assert cached == {'id': 'a', 'tags': ['x']}
+        cached['tags'].append('z')
+        assert cache.get_many(['a'])['a'] == {'id': 'a', 'tags': ['x']}
+
+    def test_ip_cached(self, test_requests, cache):
+        client = Seclytics('', cache=cache)
+        assert client.ip('1.1.1.1').ioc_id == '1.1.1.1'
+        assert client.ip('1.1.1.1').ioc_id == '1.1.1.1'
+        assert test_requests.call_count == 1
+
+    def test_ips_only_requests_misses(self, test_requests):
+        client = Seclytics('', cache=MemoryCache())
+        list(client.ips(['1.1.1.1', '2.2.2.2']))
+        nodes = list(client.ips(['1.1.1.1', '2.2.2.2', '3.3.3.3']))
+        assert sorted(n.ioc_id for n in nodes) == ['1.1.1.1', '2.2.2.2',
+                                                   '3.3.3.3']
+        assert test_requests.call_count == 2
+        assert test_requests.last_request.qs['ids'] == ['3.3.3.3']
+
+    def test_normalized_ids_cached(self, requests_mock, cache):
+        def index(request, context):
+            ids = request.qs['ids'][0].split(',')
+            return {'data': [{'type': 'host', 'id': ioc.lower()}
+                             for ioc in ids]}
+        mock = requests_mock.get('https://api.seclytics.com/hosts/',
+                                 json=index)
+        client = Seclytics('', cache=cache)
+        for _ in range(2):
+            hosts = list(client.hosts(['Example.COM']))
+            assert [host.ioc_id for host in hosts] == ['example.com']
+        assert mock.call_count == 1
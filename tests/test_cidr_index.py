@@ -0,0 +1,141 @@
+import json
+import os
+import random
+import time
+import ipaddress
+import numpy
+import pytest
+from seclytics import Seclytics
+from seclytics.cidr_index import CidrIndex, flatten
+from seclytics.ioc import Cidr, Ip
+
+CIDRS = [
+    {'type': 'cidr', 'id': '10.0.0.0/8', 'asn': {'number': 1}},
+    {'type': 'cidr', 'id': '10.1.0.0/16', 'asn': {'number': 2},
+     'country': {'code': 'US', 'name': 'United States'}},
+    {'cidr': {'block': '10.1.2.0/24'}, 'asn': {'number': 3}},
+    {'type': 'cidr', 'id': '8.8.8.0/24', 'asn': {'number': 15169}},
+    {'type': 'cidr', 'id': '2001:db8::/32'},
+    {'type': 'cidr', 'id': 'not a cidr'},
+]
+
+
+@pytest.fixture
+def index_path(tmpdir):
+    path = str(tmpdir.join('cidrs.index'))
+    assert CidrIndex.build(CIDRS, path) == 4
+    return path
+
+
+class TestCidrIndex:
+    def test_lookup(self, index_path):
+        index = CidrIndex(index_path)
+        assert index.lookup('10.1.2.3').cidr_block == '10.1.2.0/24'
+        assert index.lookup('10.1.2.3').ioc_id == '10.1.2.0/24'
+        assert index.lookup('10.1.3.1').cidr_block == '10.1.0.0/16'
+        assert index.lookup('8.8.8.8').cidr_block == '8.8.8.0/24'
+        assert index.lookup('10.1.3.1').country_code == 'US'
+        assert index.lookup('10.2.0.0').ioc_id == '10.0.0.0/8'
+        assert index.lookup('10.255.255.255').ioc_id == '10.0.0.0/8'
+        assert index.lookup('8.8.8.8').asn_number == 15169
+        assert isinstance(index.lookup('8.8.8.8'), Cidr)
+        for missing in ('9.9.9.9', '11.0.0.0', '2001:db8::1', 'x', None):
+            assert index.lookup(missing) is None
+        asn = index.lookup_asn('10.1.9.9')
+        assert (asn.ioc_type, asn.ioc_id, asn.country_code) == \
+            ('asn', '2', 'US')
+
+    def test_lookup_many_copies_rows(self, index_path):
+        index = CidrIndex(index_path)
+        ((_, first), (_, second)) = index.lookup_many(['10.1.2.3',
+                                                        '10.1.2.4'])
+        assert first.intel == second.intel
+        assert first.intel is not second.intel
+        assert first.intel['asn'] is not second.intel['asn']
+
+    def test_rebuild_swaps_generation(self, index_path):
+        index = CidrIndex(index_path)
+        generations = [index.generation]
+        for _ in range(3):
+            CidrIndex.build(CIDRS[:1], index_path)
+            generations.append(CidrIndex(index_path).generation)
+        assert len(set(generations)) == 4
+        # the open index still reads its own build
+        assert index.lookup('8.8.8.8').ioc_id == '8.8.8.0/24'
+        assert CidrIndex(index_path).lookup('8.8.8.8') is None
+        # the current and previous generations are kept
+        kept = sorted(os.path.join(index_path, name)
+                      for name in os.listdir(index_path)
+                      if name.startswith('index-'))
+        assert kept == sorted(generations[-2:])
+
+    def test_lookup_rows(self, index_path):
+        index = CidrIndex(index_path)
+        ips = numpy.array([int(ipaddress.IPv4Address(u'10.1.2.3')), 0,
+                           int(ipaddress.IPv4Address(u'8.8.8.255'))],
+                          dtype=numpy.uint32)
+        rows = index.lookup_rows(ips)
+        assert [index.row(row)['id'] if row >= 0 else None
+                for row in rows] == ['10.1.2.0/24', None, '8.8.8.0/24']
+
+    def test_flatten_matches_longest_prefix(self):
+        random.seed(1)
+        networks = set()
+        for _ in range(200):
+            prefix = random.randrange(8, 30)
+            address = random.getrandbits(32) & (0xff0fffff)
+            networks.add(ipaddress.IPv4Network((address, prefix),
+                                               strict=False))
+        networks = sorted(networks)
+        blocks = [(int(n.network_address), int(n.broadcast_address), row)
+                  for (row, n) in enumerate(networks)]
+        intervals = flatten(blocks)
+        starts = [i[0] for i in intervals]
+        assert starts == sorted(starts)
+        for _ in range(2000):
+            address = random.getrandbits(32) & 0xff0fffff
+            ip = ipaddress.IPv4Address(address)
+            matches = [n for n in networks if ip in n]
+            expected = (networks.index(max(matches, key=lambda n:
+                                           n.prefixlen))
+                        if matches else None)
+            found = [i[2] for i in intervals if i[0] <= address <= i[1]]
+            assert found == ([expected] if matches else [])
+
+    def test_load_or_build(self, tmpdir):
+        bulk_path = str(tmpdir.join('cidrs.jsonl'))
+        with open(bulk_path, 'w') as file_handle:
+            file_handle.write('\n'.join(json.dumps(row) for row in CIDRS))
+        path = str(tmpdir.join('index'))
+        index = CidrIndex.load_or_build(bulk_path, path, max_age=60)
+        assert len(index) and not index.stale
+        built_at = index.built_at
+        assert CidrIndex.load_or_build(bulk_path, path).built_at == built_at
+        os.utime(bulk_path, (time.time() + 10, time.time() + 10))
+        assert CidrIndex.load_or_build(bulk_path, path).built_at > built_at
+
+
+class TestClientCidrIndex:
+    def test_fallback(self, index_path, requests_mock):
+        requests_mock.get('https://api.seclytics.com/ips/9.9.9.9',
+                          json={'type': 'ip', 'id': '9.9.9.9',
+                                'cidr': {'block': '9.9.9.0/24'}})
+        requests_mock.get('https://api.seclytics.com/ips/',
+                          json={'data': [{'type': 'ip', 'id': '9.9.9.9'}]})
+        index = CidrIndex(index_path, max_age=60)
+        client = Seclytics('', cidr_index=index)
+        assert index.client is client
+        assert client.ip_cidr('8.8.8.8').ioc_id == '8.8.8.0/24'
+        assert not requests_mock.called
+        assert client.ip_asn('8.8.8.8').asn_number == 15169
+        ioc = client.ip_cidr('9.9.9.9')
+        assert isinstance(ioc, Ip) and ioc.cidr_block == '9.9.9.0/24'
+        results = dict(client.ip_cidrs(['8.8.8.8', '9.9.9.9', '10.1.2.3']))
+        assert results['10.1.2.3'].ioc_id == '10.1.2.0/24'
+        assert isinstance(results['9.9.9.9'], Ip)
+        assert requests_mock.last_request.qs['ids'] == ['9.9.9.9']
+
+        requests_mock.get('https://api.seclytics.com/ips/8.8.8.8',
+                          json={'type': 'ip', 'id': '8.8.8.8'})
+        index.built_at -= 120
+        assert isinstance(client.ip_cidr('8.8.8.8'), Ip)
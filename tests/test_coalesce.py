@@ -0,0 +1,226 @@
+import threading
+import time
+from seclytics import Seclytics
+from seclytics.seclytics import normalize_ioc_id
+from seclytics.exceptions import ApiError
+from seclytics.coalesce import MicroBatcher, SingleFlight
+
+
+def run_threads(func, count):
+    """func(index) on count threads, the results in index order"""
+    results = [None] * count
+    errors = []
+
+    def target(index):
+        try:
+            results[index] = func(index)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=target, args=(index,))
+               for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (results, errors)
+
+
+class Stop(BaseException):
+    pass
+
+
+def slow_json(row, delay=0.1):
+    def respond(request, context):
+        time.sleep(delay)
+        return row
+    return respond
+
+
+class TestSingleFlight(object):
+    def test_shared_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.1)
+            return ['row']
+
+        (results, errors) = run_threads(lambda i: flight.do('key', func), 8)
+        assert results == [['row']] * 8
+        assert not errors
+        # every thread can change its result
+        assert len(set(id(result) for result in results)) == 8
+        assert len(calls) == 1
+        assert (flight.calls, flight.shared) == (1, 7)
+        # nothing in flight, the next call runs again
+        assert flight.do('key', func) == ['row']
+        assert len(calls) == 2
+
+    def test_shared_error(self):
+        flight = SingleFlight()
+
+        def func():
+            time.sleep(0.1)
+            raise ValueError('down')
+
+        (results, errors) = run_threads(lambda i: flight.do('key', func), 4)
+        assert len(errors) == 4
+        assert all(isinstance(error, ValueError) for error in errors)
+
+
+class TestMicroBatcher(object):
+    def test_batch(self):
+        fetched = []
+
+        def fetch(keys, group):
+            fetched.append(sorted(keys))
+            return dict((key, [key.upper()]) for key in keys if key != 'x')
+
+        batcher = MicroBatcher(fetch, window=0.1)
+        keys = ['a', 'b', 'a', 'x']
+        (results, errors) = run_threads(lambda i: batcher.get(keys[i]), 4)
+        assert results == [['A'], ['B'], ['A'], None]
+        assert results[0] is not results[2]
+        assert fetched == [['a', 'b', 'x']]
+        assert (batcher.keys, batcher.fetches) == (4, 1)
+
+    def test_max_size(self):
+        fetched = []
+
+        def fetch(keys, group):
+            fetched.append(len(keys))
+            return dict((key, key) for key in keys)
+
+        batcher = MicroBatcher(fetch, window=5, max_size=2)
+        start = time.time()
+        (results, errors) = run_threads(lambda i: batcher.get(i), 4)
+        assert results == [0, 1, 2, 3]
+        assert fetched == [2, 2]
+        # full batches don't wait for the window
+        assert time.time() - start < 5
+
+    def test_interrupted(self):
+        """The other threads don't hang when the leader is interrupted"""
+        def fetch(keys, group):
+            raise Stop()
+
+        batcher = MicroBatcher(fetch, window=0.1)
+        errors = []
+
+        def follower():
+            time.sleep(0.02)
+            try:
+                batcher.get('b')
+            except RuntimeError as error:
+                errors.append(error)
+
+        thread = threading.Thread(target=follower)
+        thread.start()
+        try:
+            batcher.get('a')
+        except Stop:
+            pass
+        thread.join(5)
+        assert not thread.is_alive()
+        assert len(errors) == 1
+
+
+class TestClientCoalescing(object):
+    def test_ioc_show(self, requests_mock):
+        mock = requests_mock.get(
+            'https://api.seclytics.com/ips/1.1.1.1',
+            json=slow_json({'type': 'ip', 'id': '1.1.1.1'}))
+        client = Seclytics('', coalesce=True)
+        (results, errors) = run_threads(lambda i: client.ip('1.1.1.1'), 5)
+        assert not errors
+        assert mock.call_count == 1
+        assert [ioc.ioc_id for ioc in results] == ['1.1.1.1'] * 5
+        assert len(set(id(ioc) for ioc in results)) == 5
+
+    def test_ioc_index(self, requests_mock):
+        mock = requests_mock.get(
+            'https://api.seclytics.com/ips/',
+            json=slow_json({'data': [{'type': 'ip', 'id': '1.1.1.1'},
+                                     {'type': 'ip', 'id': '2.2.2.2'}]}))
+        client = Seclytics('', coalesce=True)
+        ips = [['1.1.1.1', '2.2.2.2'], ['2.2.2.2', '1.1.1.1']]
+        (results, errors) = run_threads(
+            lambda i: [ioc.ioc_id for ioc in client.ips(ips[i % 2])], 4)
+        assert not errors
+        assert mock.call_count == 1
+        assert all(sorted(ids) == ['1.1.1.1', '2.2.2.2'] for ids in results)
+
+    def test_batch_window(self, requests_mock):
+        def respond(request, context):
+            ids = request.qs['ids'][0].split(',')
+            return {'data': [{'type': 'ip', 'id': ip_addr}
+                             for ip_addr in ids if ip_addr != '9.9.9.9']}
+        index = requests_mock.get('https://api.seclytics.com/ips/',
+                                  json=respond)
+        show = requests_mock.get('https://api.seclytics.com/ips/9.9.9.9',
+                                 json={'type': 'ip', 'id': '9.9.9.9',
+                                       'score': {'value': 1}})
+        client = Seclytics('', batch_window=0.1)
+        ips = ['1.1.1.1', '2.2.2.2', '1.1.1.1', '9.9.9.9']
+        (results, errors) = run_threads(lambda i: client.ip(ips[i]), 4)
+        assert not errors
+        assert [ioc.ioc_id for ioc in results] == ips
+        assert results[0] is not results[2]
+        assert index.call_count == 1
+        assert sorted(index.last_request.qs['ids'][0].split(',')) == \
+            ['1.1.1.1', '2.2.2.2', '9.9.9.9']
+        # missing from the batch, looked up on its own
+        assert show.call_count == 1
+        assert results[3].score == 1
+
+    def test_batch_window_normalized_ids(self, requests_mock):
+        def respond(request, context):
+            return {'data': [
+                {'type': 'host', 'id': 'example.com',
+                 'context': {'categories': {'feed': ['phishing']}}},
+                {'type': 'host', 'id': 'other.com'}]}
+        index = requests_mock.get('https://api.seclytics.com/hosts/',
+                                  json=respond)
+        client = Seclytics('', batch_window=0.1)
+        hosts = ['Example.COM', 'other.com']
+        assert normalize_ioc_id('ips', '16843009') == '1.1.1.1'
+        assert normalize_ioc_id('ips', 'FE80::1') == 'fe80::1'
+        (results, errors) = run_threads(lambda i: client.host(hosts[i]), 2)
+        assert not errors
+        assert results[0].categories == ['phishing']
+        assert results[0].has_threat_intel
+        assert not results[1].has_threat_intel
+        assert index.call_count == 1
+        assert not requests_mock.request_history[1:]
+
+    def test_batch_window_error(self, requests_mock):
+        mock = requests_mock.get('https://api.seclytics.com/ips/',
+                                 status_code=400,
+                                 json={'error': {'message': 'bad'}})
+        client = Seclytics('', batch_window=0.05)
+        (results, errors) = run_threads(lambda i: client.ip('1.1.1.1'), 3)
+        assert len(errors) == 3
+        assert all(isinstance(error, ApiError) for error in errors)
+        assert mock.call_count == 1
+
+    def test_batch_window_bad_key(self, requests_mock):
+        """One invalid IOC doesn't fail the other IOCs of its batch"""
+        def respond(request, context):
+            ids = request.qs['ids'][0].split(',')
+            if 'bogus' in ids:
+                context.status_code = 400
+                return {'error': {'message': 'invalid ip'}}
+            return {'data': [{'type': 'ip', 'id': ip_addr}
+                             for ip_addr in ids]}
+        index = requests_mock.get('https://api.seclytics.com/ips/',
+                                  json=respond)
+        client = Seclytics('', batch_window=0.1)
+        ips = ['bogus', '1.1.1.1']
+        (results, errors) = run_threads(lambda i: client.ip(ips[i]), 2)
+        assert results[1].ioc_id == '1.1.1.1'
+        assert len(errors) == 1 and isinstance(errors[0], ApiError)
+        # the batch, then each IOC on its own
+        assert index.call_count == 3
+
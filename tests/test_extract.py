@@ -0,0 +1,25 @@
+import pytest
+from seclytics.extract import extract_ips
+
+
+class TestExtract:
+    @pytest.mark.parametrize('text,ips', [
+        ('Jan  1 12:34:56 host sshd[42]: Failed from 10.0.0.1 port 22',
+         ['10.0.0.1']),
+        ('"src":"192.168.1.10","dst":"8.8.8.8"', ['192.168.1.10', '8.8.8.8']),
+        ('1.2.3.4,5.6.7.8\t10.0.0.1:8080 end 9.9.9.9.', ['1.2.3.4', '5.6.7.8',
+                                                       '10.0.0.1', '9.9.9.9']),
+        ('version 1.2.3.4.5 and 1.2.3 and 256.1.1.1', []),
+        ('v1.2.3.4 build_1.2.3.4 1.2.3.4abc 1.2.3.4_x', []),
+        ('2001:db8::1 [fe80::1ff:fe23:4567:890a]:443 ::1',
+         ['2001:db8::1', 'fe80::1ff:fe23:4567:890a', '::1']),
+        ('2001:0DB8:0000:0000:0000:FF00:0042:8329',
+         ['2001:0DB8:0000:0000:0000:FF00:0042:8329']),
+        ('mac aa:bb:cc:dd:ee:ff at 12:34:56 std::vector', []),
+        ('::ffff:1.2.3.4', ['1.2.3.4']),
+    ])
+    def test_extract_ips(self, text, ips):
+        assert extract_ips(text) == ips
+
+    def test_ipv4_only(self):
+        assert extract_ips('1.1.1.1 2001:db8::1', ipv6=False) == ['1.1.1.1']
@@ -0,0 +1,118 @@
+import re
+import threading
+import pytest
+from seclytics import Seclytics
+from seclytics.feedback import FeedbackQueue
+from seclytics.ioc import Ip
+from seclytics.rate_limit import RetryPolicy
+
+API_URL = re.compile(r'https://api\.seclytics\.com/(ips|hosts)/.*')
+
+
+@pytest.fixture
+def feedback_requests(requests_mock):
+    def respond(request, context):
+        if request.path.endswith('/6.6.6.6'):
+            context.status_code = 500
+            return {'error': 'failed'}
+        return {'id': request.path.rsplit('/', 1)[1]}
+    return requests_mock.post(API_URL, json=respond)
+
+
+def verdicts():
+    items = [{'type': 'ip', 'id': '10.0.0.%d' % i,
+              'classification': 'benign', 'reason': 'fp'}
+             for i in range(25)]
+    items.append({'type': 'host', 'id': 'example.com',
+                  'classification': 'malicious', 'category': 'phishing'})
+    items.append({'type': 'ip', 'id': '6.6.6.6',
+                  'classification': 'malicious'})
+    items.append({'type': 'ip', 'id': '7.7.7.7', 'classification': 'bad'})
+    items.append({'id': '8.8.8.8', 'classification': 'benign'})
+    return items
+
+
+class TestFeedback:
+    def test_submit_feedback(self, feedback_requests):
+        client = Seclytics('', retry=RetryPolicy(max_retries=0))
+        results = list(client.submit_feedback(verdicts(), chunk_size=4))
+        assert len(results) == 29
+        failed = dict((r.item['id'], r.error) for r in results if not r.ok)
+        assert sorted(failed) == ['6.6.6.6', '7.7.7.7', '8.8.8.8']
+        assert isinstance(failed['7.7.7.7'], ValueError)
+        # only valid verdicts are posted
+        assert feedback_requests.call_count == 27
+        host = [r for r in feedback_requests.request_history
+                if r.path == '/hosts/example.com'][0]
+        assert host.qs == {'classification': ['malicious'],
+                           'category': ['phishing']}
+
+    def test_ids_quoted(self, feedback_requests):
+        client = Seclytics('')
+        [result] = client.submit_feedback([
+            {'type': 'host', 'id': 'a/b?c#d', 'classification': 'benign'}])
+        assert result.ok
+        assert feedback_requests.last_request.path == '/hosts/a%2fb%3fc%23d'
+
+    def test_submit_feedback_streams(self, feedback_requests, monkeypatch):
+        monkeypatch.setattr('seclytics.feedback.GROUP_SIZE', 4)
+        monkeypatch.setattr('seclytics.seclytics.GROUP_SIZE', 4)
+        read = []
+
+        def items():
+            for item in verdicts():
+                read.append(item)
+                yield item
+        client = Seclytics('', workers=1)
+        results = client.submit_feedback(items(), chunk_size=2)
+        next(results)
+        # only the first group of verdicts was read
+        assert len(read) == 4
+        assert len(list(results)) == 28
+
+    def test_ioc_feedback(self, feedback_requests):
+        client = Seclytics('')
+        ip = Ip(client, {'type': 'ip', 'id': '1.1.1.1'})
+        ip.mark_as_good(reason='fp')
+        assert feedback_requests.last_request.qs == {
+            'classification': ['benign'], 'reason': ['fp']}
+        [result] = client.submit_feedback([ip.feedback('malicious',
+                                                       feed='soc')])
+        assert result.ok and result.response == {'id': '1.1.1.1'}
+
+    def test_feedback_queue(self, feedback_requests):
+        client = Seclytics('', retry=RetryPolicy(max_retries=0))
+        results = []
+        lock = threading.Lock()
+
+        def on_result(result):
+            with lock:
+                results.append(result)
+        with FeedbackQueue(client, batch_size=10, interval=0.01,
+                           on_result=on_result) as feedback:
+            for item in verdicts():
+                feedback.put(item)
+        assert len(results) == 29
+        assert (feedback.sent, feedback.failed) == (26, 3)
+        with pytest.raises(ValueError):
+            feedback.put(verdicts()[0])
+
+    def test_feedback_queue_put_during_close(self, feedback_requests):
+        """A verdict put between an empty take and close is still sent"""
+        client = Seclytics('', retry=RetryPolicy(max_retries=0))
+        feedback = FeedbackQueue(client, interval=0.01)
+        take = feedback._take
+        raced = []
+
+        def racing_take():
+            batch = take()
+            if not batch and not raced:
+                raced.append(1)
+                feedback.put(verdicts()[0])
+                with feedback._lock:
+                    feedback._closed.set()
+            return batch
+        feedback._take = racing_take
+        feedback._thread.join(5)
+        assert raced and not feedback._thread.is_alive()
+        assert feedback.sent == 1
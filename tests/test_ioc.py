@@ -1,5 +1,7 @@
+from datetime import datetime
 import pytest
-from seclytics.ioc import Ioc
+from seclytics.ioc import Ioc, Ip, Host
+from seclytics.node import Node
 from seclytics import Seclytics
 
 
@@ -35,3 +37,53 @@ class TestAsnInfo():
         client = Seclytics(access_token='')
         ioc = Ioc(client, data)
         assert ioc.categories == ['category1']
+
+    def test_slots(self):
+        client = Seclytics(access_token='')
+        ioc = Node.build_for_row(client, {'type': 'ip', 'id': '1.1.1.1'})
+        assert isinstance(ioc, Ip)
+        assert not hasattr(ioc, '__dict__')
+        assert ioc.ioc_id == '1.1.1.1'
+        assert ioc.api_client is client
+
+    def test_dates_cached(self):
+        data = {'prediction': {'predicted_at': '2014-04-01T01:00:00'},
+                'history': {'first_seen_at': '2014-03-01T01:00:00'}}
+        ioc = Ioc(Seclytics(access_token=''), data)
+        assert ioc.predicted_at == datetime(2014, 4, 1, 1)
+        assert ioc.first_reported_at == datetime(2014, 3, 1, 1)
+        assert ioc.predicted_at is ioc.predicted_at
+        assert Ioc(None, {}).predicted_at is None
+        assert Ioc(None, {'history': {}}).first_reported_at is None
+
+    def test_connections(self):
+        data = {'type': 'ip', 'id': '1.1.1.1',
+                'connections': [{'type': 'host', 'id': 'example.com'},
+                                {'type': 'unknown', 'id': 'x'}]}
+        ioc = Node.build_for_row(None, data)
+        connections = list(ioc.connections)
+        assert isinstance(connections[0], Host)
+        assert connections[1] is None
+
+    def test_context_index(self):
+        data = {'context': {
+            'categories': {'feed1': ['malware', 'c2'], 'feed2': ['malware']},
+            'identifiers': {'feed1': ['zeus']},
+            'ips': ['1.1.1.1'],
+        }}
+        ioc = Ioc(None, data)
+        assert sorted(ioc.reported_by) == ['feed1', 'feed2']
+        assert ioc.has_threat_intel
+        assert sorted(ioc.categories) == ['c2', 'malware']
+        # callers get copies, changing one doesn't change the IOC
+        ioc.categories.append('spam')
+        ioc.reported_by.append('feed3')
+        ioc.categories_by_source.clear()
+        assert sorted(ioc.categories) == ['c2', 'malware']
+        assert sorted(ioc.reported_by) == ['feed1', 'feed2']
+        assert sorted(ioc.categories_by_source) == ['feed1', 'feed2']
+        assert ioc.identifiers == ['zeus']
+        assert ioc.reasons == []
+        assert ioc.categories_by_source['feed2'] == ['malware']
+        assert ioc.namespaced_by_source('ips') == {}
+        assert not Ioc(None, {}).has_threat_intel
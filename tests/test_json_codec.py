@@ -0,0 +1,49 @@
+import pytest
+from seclytics import Seclytics
+from seclytics.json_codec import JsonCodec, available_codecs, get_codec
+
+IP_URL = 'https://api.seclytics.com/ips/1.2.3.4'
+
+
+class RecordingCodec(JsonCodec):
+    name = 'recording'
+
+    def __init__(self):
+        self.calls = []
+
+    def loads(self, data):
+        self.calls.append('loads')
+        return JsonCodec.loads(self, data)
+
+    def dumps(self, obj):
+        self.calls.append('dumps')
+        return JsonCodec.dumps(self, obj)
+
+
+class TestJsonCodec:
+    def test_get_codec(self):
+        assert get_codec('json').name == 'json'
+        assert get_codec().name == available_codecs()[0]
+        assert 'json' in available_codecs()
+        with pytest.raises(ValueError):
+            get_codec('yaml')
+
+    @pytest.mark.parametrize('name', available_codecs())
+    def test_round_trip(self, name):
+        codec = get_codec(name)
+        intel = {u'id': u'1.2.3.4', u'url': u'http://a/b', u'n': [1, 2.5],
+                 u'name': u'caf\xe9', u'whitelist': None}
+        assert codec.loads(codec.dumps(intel)) == intel
+        assert codec.loads(codec.dumps(intel).encode('utf-8')) == intel
+
+    def test_client_uses_codec(self, requests_mock):
+        requests_mock.get(IP_URL, json={'type': 'ip', 'id': '1.2.3.4'})
+        requests_mock.post(IP_URL, json={'status': 'ok'})
+        codec = RecordingCodec()
+        client = Seclytics('', json_codec=codec)
+        assert client.ip('1.2.3.4').ioc_id == '1.2.3.4'
+        client._post_data('/ips/1.2.3.4', {}, data={'classification': 'x'})
+        assert codec.calls == ['loads', 'dumps', 'loads']
+        request = requests_mock.last_request
+        assert request.json() == {'classification': 'x'}
+        assert request.headers['Content-Type'] == 'application/json'
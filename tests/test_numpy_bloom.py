@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import random
+import string
+from tempfile import NamedTemporaryFile
+import pytest
+from seclytics.portable_bloom import PortableBloom
+
+numpy = pytest.importorskip('numpy')
+pybloomfilter = pytest.importorskip('pybloomfilter')
+
+
+def random_keys(count, max_length):
+    letters = string.ascii_lowercase + u'é'
+    return [u''.join(random.choice(letters)
+                     for _ in range(random.randrange(max_length)))
+            for _ in range(count)]
+
+
+@pytest.fixture(scope="module")
+def bloom_path():
+    path = NamedTemporaryFile(delete=False).name
+    bloom = pybloomfilter.BloomFilter(5000, 0.01, path)
+    bloom.update(random_keys(2000, 50))
+    bloom.update(['%d.%d.%d.%d' % tuple(random.randrange(256)
+                                        for _ in range(4))
+                  for _ in range(2000)])
+    bloom.sync()
+    return path
+
+
+class TestNumpyBloom:
+    def test_matches_pybloomfilter(self, bloom_path):
+        """Hashing and bit layout agree with pybloomfilter exactly"""
+        native = PortableBloom(bloom_path, backend='numpy')
+        reference = PortableBloom(bloom_path, backend='pybloomfilter')
+        keys = random_keys(5000, 50) + [b'x' * 16, b'y' * 32, u'']
+        keys += ['%d.%d.%d.%d' % tuple(random.randrange(256)
+                                       for _ in range(4))
+                 for _ in range(5000)]
+        expected = reference.contains_many(keys)
+        assert expected.any()
+        assert (native.contains_many(keys) == expected).all()
+        assert native.contains(keys[0]) == expected[0]
+        # the scalar hash path agrees with the vectorized one
+        assert [native.contains(key) for key in keys] == expected.tolist()
+
+    def test_members(self, bloom_path):
+        native = PortableBloom(bloom_path, backend='numpy')
+        reference = pybloomfilter.BloomFilter.open(bloom_path)
+        bloom = pybloomfilter.BloomFilter(100, 0.01, bloom_path + '.small')
+        bloom.update(['1.1.1.1', 'example.com'])
+        bloom.sync()
+        small = PortableBloom(bloom_path + '.small', backend='numpy')
+        assert small.contains('1.1.1.1')
+        assert small.contains('example.com')
+        assert reference.num_hashes == len(native.bloom.hash_seeds)
+
+    def test_invalid_file(self):
+        path = NamedTemporaryFile(delete=False).name
+        with open(path, 'wb') as file_handle:
+            file_handle.write(b'not a bloom filter')
+        with pytest.raises(ValueError):
+            PortableBloom(path, backend='numpy')
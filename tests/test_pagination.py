@@ -0,0 +1,87 @@
+import pytest
+from seclytics import Seclytics
+from seclytics.exceptions import ApiError
+
+CIDR_URL = 'https://api.seclytics.com/cidrs/10.0.0.0/24/ips/'
+
+
+def page(start, count=100):
+    return [{'type': 'ip', 'id': '10.0.0.%d' % i}
+            for i in range(start, min(start + count, 256))]
+
+
+@pytest.fixture
+def cursor_requests(requests_mock):
+    def serve(request, context):
+        start = int(request.qs.get('cursor', ['0'])[0])
+        body = {'data': page(start), 'total': 256}
+        if start + 100 < 256:
+            body['cursor'] = str(start + 100)
+        return body
+    return requests_mock.get(CIDR_URL, json=serve)
+
+
+@pytest.fixture
+def link_requests(requests_mock):
+    requests_mock.get(CIDR_URL, json={
+        'data': page(0), 'next': CIDR_URL + '?page=2'})
+    requests_mock.get(CIDR_URL + '?page=2', json={
+        'data': page(100), 'links': {'next': '/cidrs/10.0.0.0/24/ips/?page=3'}})
+    requests_mock.get(CIDR_URL + '?page=3', json={'data': page(200)})
+    return requests_mock
+
+
+class TestPagination:
+    @pytest.mark.parametrize('prefetch', [True, False])
+    @pytest.mark.parametrize('stream', [True, False])
+    def test_cursor(self, cursor_requests, prefetch, stream):
+        client = Seclytics('', stream=stream)
+        ips = client.cidr_ips('10.0.0.0/24', prefetch=prefetch)
+        ids = [ip.ioc_id for ip in ips]
+        assert ids == ['10.0.0.%d' % i for i in range(256)]
+        assert (ips.pages, ips.rows, ips.total, ips.done) == (3, 256, 256,
+                                                              True)
+        cursors = [r.qs.get('cursor') for r in cursor_requests.request_history]
+        assert cursors == [None, ['100'], ['200']]
+
+    def test_next_links(self, link_requests):
+        ips = Seclytics('').cidr_ips('10.0.0.0/24')
+        assert len(list(ips)) == 256
+        assert ips.pages == 3 and ips.total is None
+
+    def test_repeated_cursor_stops(self, requests_mock):
+        requests_mock.get(CIDR_URL, json={'data': page(0), 'cursor': 'x'})
+        ips = Seclytics('').cidr_ips('10.0.0.0/24')
+        assert len(list(ips)) == 200
+        assert ips.pages == 2
+
+    def test_cursor_cycle_stops(self, requests_mock):
+        def serve(request, context):
+            cursor = request.qs.get('cursor', ['a'])[0]
+            return {'data': page(0, 1),
+                    'cursor': {'a': 'b', 'b': 'a'}[cursor]}
+        requests_mock.get(CIDR_URL, json=serve)
+        ips = Seclytics('').cidr_ips('10.0.0.0/24')
+        assert len(list(ips)) == 3
+        assert ips.pages == 3
+
+    def test_next_link_cycle_stops(self, requests_mock):
+        requests_mock.get(CIDR_URL, json={
+            'data': page(0, 1), 'next': CIDR_URL + '?page=2'})
+        requests_mock.get(CIDR_URL + '?page=2', json={
+            'data': page(1, 1), 'next': CIDR_URL})
+        assert len(list(Seclytics('').cidr_ips('10.0.0.0/24'))) == 2
+
+    def test_next_link_other_host(self, requests_mock):
+        requests_mock.get(CIDR_URL, json={
+            'data': page(0), 'next': 'https://example.com/steal?page=2'})
+        mock = requests_mock.get('https://example.com/steal', json={})
+        with pytest.raises(ApiError):
+            list(Seclytics('').cidr_ips('10.0.0.0/24'))
+        assert not mock.called
+
+    def test_next(self, cursor_requests):
+        ips = Seclytics('').cidr_ips('10.0.0.0/24')
+        assert next(ips).ioc_id == '10.0.0.0'
+        assert next(ips).ioc_id == '10.0.0.1'
+        assert len(list(ips)) == 254
@@ -0,0 +1,96 @@
+import time
+import pytest
+import requests
+from seclytics import Seclytics
+from seclytics.exceptions import OverQuota, ApiError
+from seclytics.rate_limit import TokenBucket, RetryPolicy
+
+IP_URL = 'https://api.seclytics.com/ips/1.1.1.1'
+IP_ROW = {'type': 'ip', 'id': '1.1.1.1'}
+
+
+class TestRetry:
+    def test_retry_then_success(self, requests_mock):
+        requests_mock.get(IP_URL, [
+            {'status_code': 503},
+            {'status_code': 429, 'headers': {'Retry-After': '0'}},
+            {'exc': requests.ConnectTimeout},
+            {'json': IP_ROW},
+        ])
+        client = Seclytics('', retry=RetryPolicy(backoff_factor=0))
+        assert client.ip('1.1.1.1').ioc_id == '1.1.1.1'
+        assert requests_mock.call_count == 4
+
+    def test_retries_exhausted(self, requests_mock):
+        requests_mock.get(IP_URL, status_code=429)
+        retry = RetryPolicy(max_retries=2, backoff_factor=0)
+        client = Seclytics('', retry=retry)
+        with pytest.raises(OverQuota):
+            client.ip('1.1.1.1')
+        assert requests_mock.call_count == 3
+
+    def test_client_errors_not_retried(self, requests_mock):
+        requests_mock.get(IP_URL, status_code=404, text='missing')
+        client = Seclytics('')
+        with pytest.raises(ApiError):
+            client.ip('1.1.1.1')
+        assert requests_mock.call_count == 1
+
+    def test_post_not_retried_once_sent(self, requests_mock):
+        url = 'https://api.seclytics.com/feedback'
+        mock = requests_mock.post(url, [{'status_code': 503},
+                                        {'exc': requests.ReadTimeout},
+                                        {'json': {}}])
+        client = Seclytics('', retry=RetryPolicy(backoff_factor=0))
+        assert client._request('POST', url).status_code == 503
+        with pytest.raises(requests.ReadTimeout):
+            client._request('POST', url)
+        assert mock.call_count == 2
+
+    def test_post_retried_on_429_and_opt_in(self, requests_mock):
+        url = 'https://api.seclytics.com/feedback'
+        mock = requests_mock.post(url, [{'status_code': 429},
+                                        {'exc': requests.ConnectTimeout},
+                                        {'status_code': 503},
+                                        {'json': {}}])
+        client = Seclytics('', retry=RetryPolicy(backoff_factor=0))
+        assert client._request('POST', url).status_code == 503
+        client.retry = RetryPolicy(backoff_factor=0, methods=('GET', 'post'))
+        assert client._request('POST', url).status_code == 200
+        assert mock.call_count == 4
+
+    def test_backoff(self):
+        retry = RetryPolicy(backoff_factor=1, max_backoff=5)
+        for attempt in range(6):
+            delay = retry.backoff(attempt)
+            cap = min(5, 2 ** attempt)
+            assert cap / 2.0 <= delay <= cap
+
+    def test_retry_after_date(self, requests_mock):
+        requests_mock.get(IP_URL, status_code=429, headers={
+            'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        response = requests.get(IP_URL)
+        assert RetryPolicy.retry_after(response) == 0
+
+
+class TestTokenBucket:
+    def test_rate(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.time()
+        for _ in range(11):
+            bucket.acquire()
+        # one token up front then 10 at 100/s
+        assert time.time() - start >= 0.09
+
+    def test_pause(self):
+        bucket = TokenBucket(rate=1000, capacity=10)
+        bucket.pause(0.05)
+        start = time.time()
+        bucket.acquire()
+        assert time.time() - start >= 0.05
+
+    def test_from_quota(self):
+        bucket = TokenBucket.from_quota(86400, 86400)
+        assert bucket.rate == 1
+        with pytest.raises(ValueError):
+            TokenBucket(0)
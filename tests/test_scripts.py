@@ -0,0 +1,164 @@
+import io
+import os
+import pytest
+import json
+import sys
+import threading
+import time
+from seclytics.json_codec import get_codec
+from seclytics.ioc import Ip
+from seclytics.scripts import ip_enrich
+from seclytics.scripts.file_input import FileInput
+from seclytics.scripts.writers import CsvWriter, JsonlWriter
+
+IPS_URL = 'https://api.seclytics.com/ips/'
+
+
+def ip_rows(request, context):
+    ids = request.qs['ids'][0].split(',')
+    return {'data': [{'type': 'ip', 'id': ip_address,
+                      'context': {'categories': {'feed': ['spam']}}}
+                     for ip_address in ids]}
+
+
+class TestScripts:
+    def test_blocks(self):
+        text = u'1.1.1.1\n2.2.2.2\r\n\n3.3.3.3'
+        blocks = list(FileInput(io.StringIO(text)).blocks(block_size=5))
+        lines = [line for block in blocks for line in block]
+        assert lines == [u'1.1.1.1', u'2.2.2.2\r', u'', u'3.3.3.3']
+
+    def test_writers(self):
+        ioc = Ip(None, {'type': 'ip', 'id': '1.2.3.4',
+                        'context': {'categories': {'a': ['x', 'y']}}})
+        output = io.StringIO()
+        with JsonlWriter(output, get_codec('json'), buffer_rows=2) as writer:
+            writer.write(ioc)
+            assert output.getvalue() == ''
+            writer.write(ioc)
+            assert output.getvalue().count('\n') == 2
+        assert json.loads(output.getvalue().split('\n')[0])['id'] == '1.2.3.4'
+
+        output = io.StringIO()
+        with CsvWriter(output) as writer:
+            writer.write(ioc)
+        lines = output.getvalue().splitlines()
+        assert lines[0].startswith('id,type,has_threat_intel')
+        assert lines[1].startswith('1.2.3.4,ip,True,False,x;y,a,')
+
+    def test_ip_enrich(self, requests_mock, monkeypatch, capsys):
+        requests_mock.get(IPS_URL, json=ip_rows)
+        ips = ['10.0.0.%d' % (i % 7) for i in range(30)]
+        monkeypatch.setattr(sys, 'stdin', io.StringIO(u'\n'.join(ips)))
+        monkeypatch.setattr(sys, 'argv', [
+            'ip_enrich', '--access_token', 'x', '--batch-size', '3',
+            '--api_url', 'https://api.seclytics.com',
+            '--workers', '2', '--format', 'csv', '--block-size', '16'])
+        ip_enrich.main()
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 8
+        assert sorted(line.split(',')[0] for line in lines[1:]) == \
+            ['10.0.0.%d' % i for i in range(7)]
+        assert len(requests_mock.request_history) == 3
+
+    def test_parquet_writer(self, tmpdir):
+        parquet = pytest.importorskip('pyarrow.parquet')
+        from seclytics.scripts.writers import ParquetWriter
+        path = str(tmpdir.join('ips.parquet'))
+        with ParquetWriter(path, get_codec('json'), buffer_rows=2) as writer:
+            for i in range(5):
+                writer.write(Ip(None, {'type': 'ip', 'id': '1.1.1.%d' % i}))
+        table = parquet.read_table(path)
+        assert table.num_rows == 5
+        assert table.column('id').to_pylist()[-1] == '1.1.1.4'
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_ip_filter(self, tmpdir, monkeypatch, capsys, workers):
+        from pybloomfilter import BloomFilter
+        from seclytics.scripts import ip_filter
+        blooms = {'malicious-ips.bloom': ['1.1.1.1', '2.2.2.2'],
+                  'predicted-ips.bloom': ['4.4.4.4'],
+                  'ip-threat-intel.bloom': ['1.1.1.1', '2.2.2.2', '4.4.4.4']}
+        for (name, ips) in blooms.items():
+            BloomFilter(1000, 0.001, str(tmpdir.join(name))).update(ips)
+        lines = ['%d.%d.%d.%d' % ((i % 5,) * 4) for i in range(1000)]
+        log = tmpdir.join('ips.txt')
+        log.write('\n'.join(lines) + '\n')
+        monkeypatch.setattr(sys, 'argv', [
+            'ip_filter', '--malicious', '--data-dir', str(tmpdir),
+            '--workers', str(workers), '--chunk-size', '100', '--stats',
+            str(log)])
+        ip_filter.main()
+        captured = capsys.readouterr()
+        expected = [ip for ip in lines if ip in ('1.1.1.1', '2.2.2.2')]
+        assert captured.out.splitlines() == expected
+        assert captured.err.startswith('1000 lines in')
+
+    def test_ip_filter_undecodable_log(self, tmpdir, monkeypatch, capsys):
+        from pybloomfilter import BloomFilter
+        from seclytics.scripts import ip_filter
+        for name in ('malicious-ips.bloom', 'predicted-ips.bloom',
+                     'ip-threat-intel.bloom'):
+            BloomFilter(1000, 0.001, str(tmpdir.join(name))).update(
+                ['1.1.1.1'])
+        log = tmpdir.join('binary.log')
+        log.write_binary(b'\xff\xfe DROP SRC=1.1.1.1\nok 2.2.2.2\n')
+        monkeypatch.setattr(sys, 'argv', [
+            'ip_filter', '--malicious', '--extract', '--data-dir',
+            str(tmpdir), str(log)])
+        ip_filter.main()
+        [line] = capsys.readouterr().out.splitlines()
+        assert line.endswith(' DROP SRC=1.1.1.1')
+
+    def test_ip_filter_pipe_line_by_line(self, monkeypatch):
+        from seclytics.scripts import ip_filter
+        (read_fd, write_fd) = os.pipe()
+        writer = os.fdopen(write_fd, 'w')
+        monkeypatch.setattr(sys, 'stdin', os.fdopen(read_fd))
+        writer.write('1.1.1.1\n')
+        writer.flush()
+
+        def finish():
+            time.sleep(1)
+            writer.write('2.2.2.2\n')
+            writer.close()
+        thread = threading.Thread(target=finish)
+        thread.start()
+        started = time.time()
+        blocks = ip_filter.read_blocks([], 4 * 1024 * 1024)
+        # the first line doesn't wait for a full block or the end
+        assert next(blocks) == '1.1.1.1\n'
+        assert time.time() - started < 0.5
+        assert list(blocks) == ['2.2.2.2\n']
+        thread.join()
+
+    @pytest.mark.parametrize('annotate', [False, True])
+    def test_ip_filter_extract(self, tmpdir, monkeypatch, capsys, annotate):
+        from pybloomfilter import BloomFilter
+        from seclytics.scripts import ip_filter
+        blooms = {'malicious-ips.bloom': ['1.1.1.1', '2001:db8::1'],
+                  'predicted-ips.bloom': ['4.4.4.4'],
+                  'ip-threat-intel.bloom': ['1.1.1.1', '4.4.4.4',
+                                            '2001:db8::1']}
+        for (name, ips) in blooms.items():
+            BloomFilter(1000, 0.001, str(tmpdir.join(name))).update(ips)
+        lines = ['Jan  1 00:00:01 fw kernel: DROP SRC=10.0.0.1 DST=8.8.8.8',
+                 'Jan  1 00:00:02 fw kernel: DROP SRC=1.1.1.1 DST=4.4.4.4',
+                 '"ts":1,"src":"2001:db8::1","dst":"10.0.0.2"',
+                 '1600000000.1\t10.0.0.3\t53\t1.1.1.1\t53']
+        monkeypatch.setattr(sys, 'stdin', io.StringIO(u'\n'.join(lines)))
+        argv = ['ip_filter', '--malicious', '--predicted', '--extract',
+                '--data-dir', str(tmpdir)]
+        if annotate:
+            argv.append('--annotate')
+        monkeypatch.setattr(sys, 'argv', argv)
+        ip_filter.main()
+        output = capsys.readouterr().out.splitlines()
+        if not annotate:
+            assert output == lines[1:]
+            return
+        assert output == [
+            lines[0],
+            lines[1] + '\t1.1.1.1=malicious,4.4.4.4=predicted',
+            lines[2] + '\t2001:db8::1=malicious',
+            lines[3] + '\t1.1.1.1=malicious']
@@ -0,0 +1,67 @@
+import json
+import pytest
+from seclytics import Seclytics
+from seclytics.cache import MemoryCache
+from seclytics.streaming import iter_json_items
+
+
+def split(text, size):
+    data = text.encode('utf8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonItems:
+    def test_rows_across_chunks(self):
+        body = {'total': 12345, 'data': [{'id': u'hé', 'n': i}
+                                         for i in range(50)],
+                'next': None}
+        text = json.dumps(body, indent=1)
+        for size in (1, 3, 7, 64, len(text)):
+            meta = {}
+            rows = list(iter_json_items(split(text, size), meta=meta))
+            assert rows == body['data']
+            assert meta == {'total': 12345, 'next': None}
+
+    def test_rows_are_lazy(self):
+        def chunks():
+            yield b'{"data": [{"id": 1},'
+            yield b' {"id": 2}'
+            raise RuntimeError("read past the first row")
+        items = iter_json_items(chunks())
+        assert next(items) == {'id': 1}
+
+    def test_empty_and_missing(self):
+        assert list(iter_json_items([b'{"data": []}'])) == []
+        assert list(iter_json_items([b'{"error": {"message": "x"}}'])) == []
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            list(iter_json_items([b'{"data": [{"id": 1}']))
+        with pytest.raises(ValueError):
+            list(iter_json_items([b'[]']))
+
+
+@pytest.fixture
+def test_requests(requests_mock):
+    def index(request, context):
+        ids = request.qs['ids'][0].split(',')
+        return {'data': [{'type': 'ip', 'id': ioc} for ioc in ids]}
+    requests_mock.get('https://api.seclytics.com/ips/', json=index)
+    rows = [{'type': 'ip', 'id': '10.0.0.%d' % i} for i in range(256)]
+    requests_mock.get('https://api.seclytics.com/cidrs/10.0.0.0/24/ips/',
+                      json={'data': rows})
+    return requests_mock
+
+
+class TestStreamingClient:
+    def test_cidr_ips(self, test_requests):
+        client = Seclytics('', stream=True)
+        ips = [ioc.ioc_id for ioc in client.cidr_ips('10.0.0.0/24')]
+        assert len(ips) == 256 and ips[-1] == '10.0.0.255'
+
+    def test_ips_cached(self, test_requests):
+        client = Seclytics('', stream=True, cache=MemoryCache())
+        ips = ['1.1.1.1', '2.2.2.2']
+        assert len(list(client.ips(ips))) == 2
+        assert len(list(client.ips(ips))) == 2
+        assert test_requests.call_count == 1
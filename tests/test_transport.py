@@ -0,0 +1,120 @@
+import json
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from seclytics import Seclytics
+from seclytics.transport import ssl_context
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class IpHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        self.server.connection_headers.add(self.headers.get('Connection'))
+        ip_addr = self.path.strip('/').split('/')[-1]
+        body = json.dumps({'type': 'ip', 'id': ip_addr}).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_server():
+    server = ThreadingServer(('127.0.0.1', 0), IpHandler)
+    server.client_ports = set()
+    server.connection_headers = set()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def lookup_concurrently(client, count=200, threads=8):
+    ips = ['10.0.0.%d' % (i % 250) for i in range(count)]
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(lambda ip: client.ip(ip).ioc_id, ips))
+
+
+class TestTransport:
+    def test_shared_client_reuses_connections(self, api_server):
+        api_url = 'http://127.0.0.1:%d' % api_server.server_port
+        client = Seclytics.shared('token', api_url=api_url, pool_size=8)
+        assert Seclytics.shared('token', api_url=api_url) is client
+        ids = lookup_concurrently(client)
+        assert len(ids) == 200
+        # every thread kept its connection open
+        assert len(api_server.client_ports) <= 8
+
+    def test_shared_by_tls_and_proxy_settings(self):
+        api_url = 'https://shared.invalid'
+        client = Seclytics.shared('token', api_url=api_url)
+        proxies = {'https': 'http://proxy.invalid:3128'}
+        proxied = Seclytics.shared('token', api_url=api_url, proxies=proxies)
+        unverified = Seclytics.shared('token', api_url=api_url, verify=False)
+        assert len(set([client, proxied, unverified])) == 3
+        assert Seclytics.shared('token', api_url=api_url,
+                                proxies=dict(proxies)) is proxied
+        assert proxied.session.proxies == proxies
+        assert unverified.session.verify is False
+
+    def test_no_keep_alive(self, api_server):
+        api_url = 'http://127.0.0.1:%d' % api_server.server_port
+        client = Seclytics('token', api_url=api_url, keep_alive=False)
+        lookup_concurrently(client, count=20, threads=2)
+        assert len(api_server.client_ports) == 20
+
+    def test_http2_adapter(self, api_server):
+        """Transport smoke test, over plain http httpx speaks HTTP/1.1"""
+        pytest.importorskip('httpx')
+        api_url = 'http://127.0.0.1:%d' % api_server.server_port
+        client = Seclytics('token', api_url=api_url, http2=True,
+                           pool_size=4)
+        assert lookup_concurrently(client, count=20, threads=4)[0] == \
+            '10.0.0.0'
+        assert len(api_server.client_ports) <= 4
+
+    def test_http2_no_keep_alive(self, api_server):
+        pytest.importorskip('httpx')
+        api_url = 'http://127.0.0.1:%d' % api_server.server_port
+        client = Seclytics('token', api_url=api_url, http2=True,
+                           keep_alive=False)
+        assert 'close' not in client.session.headers.values()
+        # the adapter drops connection headers set on the session too
+        client.session.headers['Connection'] = 'close'
+        lookup_concurrently(client, count=10, threads=2)
+        assert len(api_server.client_ports) == 10
+        assert 'close' not in api_server.connection_headers
+
+    def test_http2_proxy_and_tls_options(self, api_server):
+        pytest.importorskip('httpx')
+        proxy = 'http://127.0.0.1:%d' % api_server.server_port
+        # only reachable through the proxy
+        client = Seclytics('token', api_url='http://api.invalid', http2=True)
+        client.session.proxies = {'http': proxy}
+        assert client.ip('10.0.0.1').ioc_id == '10.0.0.1'
+        adapter = client.session.get_adapter('http://api.invalid')
+        assert [key[2] for key in adapter.clients] == [proxy]
+
+        context = ssl_context(verify=False)
+        assert context.verify_mode == ssl.CERT_NONE
+        assert ssl_context().verify_mode == ssl.CERT_REQUIRED
@@ -0,0 +1,86 @@
+from tempfile import NamedTemporaryFile
+import pytest
+from seclytics import Seclytics
+from seclytics.url_enrichment import (CLEARED, FOUND, INVALID, NOT_FOUND,
+                                      HostFilter, parent_domains)
+from seclytics.url_hashing import hash_url
+
+URLS = [
+    'http://www.bad.com/a?x=1',
+    'http://good.com/',
+    'https://bad.com/a?x=1',
+    'not a url',
+    'http://sub.evil.org/b',
+    'http://1.2.3.4/c',
+    'http://www.bad.com/a?x=1',
+]
+
+
+def respond(request, context):
+    ids = request.qs['ids'][0].split(',')
+    return {'data': [{'type': 'url', 'id': ioc_id}
+                     for ioc_id in ids if 'evil' not in ioc_id]}
+
+
+class TestUrlEnrichment:
+    def test_parent_domains(self):
+        assert parent_domains('a.b.example.com') == \
+            ['a.b.example.com', 'b.example.com', 'example.com']
+        assert parent_domains('localhost') == ['localhost']
+        assert parent_domains('1.2.3.4') == ['1.2.3.4']
+
+    def test_host_filter(self, tmpdir):
+        path = tmpdir.join('hosts.txt')
+        path.write('Bad.com\n\nevil.org\n')
+        hosts = HostFilter(str(path))
+        assert hosts.has_intel('www.bad.com')
+        assert hosts.has_intel('evil.org')
+        assert not hosts.has_intel('good.com')
+        assert not HostFilter(str(path), check_parents=False).has_intel(
+            'www.bad.com')
+
+    @pytest.mark.parametrize('with_numpy', [True, False])
+    def test_bloom_host_filter(self, monkeypatch, with_numpy):
+        pybloomfilter = pytest.importorskip('pybloomfilter')
+        if not with_numpy:
+            monkeypatch.setattr('seclytics.portable_bloom.numpy', None)
+        path = NamedTemporaryFile(suffix='.bloom', delete=False).name
+        bloom = pybloomfilter.BloomFilter(1000, 0.001, path)
+        bloom.update(['bad.com', 'evil.org'])
+        bloom.sync()
+        hosts = HostFilter(path)
+        assert hosts.hosts_with_intel(['www.bad.com', 'good.com']) == \
+            set(['www.bad.com'])
+
+    def test_enrich_urls(self, requests_mock):
+        mock = requests_mock.get('https://api.seclytics.com/urls/',
+                                 json=respond)
+        client = Seclytics('', batch_size=1)
+        enrichment = client.enrich_urls(
+            iter(URLS), HostFilter(hosts=['bad.com', 'evil.org']))
+        results = list(enrichment)
+        assert [result.url for result in results] == URLS
+        assert [result.status for result in results] == [
+            FOUND, CLEARED, FOUND, INVALID, NOT_FOUND, CLEARED, FOUND]
+        assert results[0].ioc.ioc_id == hash_url(URLS[0])
+        # www.bad.com, bad.com and sub.evil.org, one URL a request
+        sent = set(request.qs['ids'][0] for request in mock.request_history)
+        assert len(mock.request_history) == 3
+        assert enrichment.urls == 7
+        assert enrichment.invalid == 1
+        assert enrichment.cleared == 2
+        assert enrichment.looked_up == 3
+        assert enrichment.found == 3
+        assert enrichment.requests == 3
+        # good.com and 1.2.3.4 didn't need a request
+        assert enrichment.requests_saved == 2
+        assert hash_url(URLS[4]).lower() in sent
+
+    def test_enrich_urls_all_cleared(self, requests_mock):
+        mock = requests_mock.get('https://api.seclytics.com/urls/',
+                                 json=respond)
+        enrichment = Seclytics('').enrich_urls(URLS, HostFilter(hosts=[]))
+        assert set(result.status for result in enrichment) == \
+            set([CLEARED, INVALID])
+        assert not mock.called
+        assert enrichment.requests_saved == 1
@@ -0,0 +1,77 @@
+from hashlib import sha1
+import pytest
+from seclytics import Seclytics
+from seclytics.url_hashing import UrlHasher, hash_url, hash_urls
+
+URLS = [
+    'http://Example.com/a/b?x=1',
+    'https://user:pw@example.com:8443/a/b?x=1#frag',
+    'http://example.com/a/b?x=2',
+    'http://example.com/p;params?q',
+    ' http://other.com/ ',
+    'not a url',
+    'HTTP://Example.com/UP?Q',
+    'http://[::1]:80/v6',
+    'http://a.com?q#f?g',
+    'http://a.com#f/x?y',
+    'http://@:80/',
+    u'http://example.com/caf\xe9',
+]
+
+
+def legacy_hash(url):
+    """hashed_urls before the bulk hashing path"""
+    try:
+        from urllib.parse import urlparse
+    except ImportError:
+        from urlparse import urlparse
+    parsed = urlparse(url.strip())
+    if not parsed.hostname:
+        return None
+    return '/'.join((parsed.hostname,
+                     sha1(parsed.path.encode('utf8')).hexdigest(),
+                     sha1(parsed.query.encode('utf8')).hexdigest()))
+
+
+class TestUrlHashing:
+    def test_hash_urls(self):
+        expected = [legacy_hash(url) for url in URLS]
+        assert hash_urls(URLS) == expected
+        assert [hash_url(url) for url in URLS] == expected
+        # scheme, port, credentials and fragment don't change the hash
+        assert expected[0] == expected[1]
+        assert expected[5] is None
+        zone_url = 'http://Host%Zone/a'
+        assert hash_urls([zone_url]) == [legacy_hash(zone_url)]
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_hasher(self, workers):
+        urls = ['http://host%d.com/%d?q=%d' % (i % 7, i % 3, i)
+                for i in range(100)]
+        hasher = UrlHasher(workers=workers, chunk_size=8)
+        assert list(hasher.map(iter(urls))) == \
+            [(url, legacy_hash(url)) for url in urls]
+
+    def test_url_lookups(self, requests_mock):
+        def respond(request, context):
+            ids = request.qs['ids'][0].split(',')
+            return {'data': [{'type': 'url', 'id': ioc_id}
+                             for ioc_id in ids if 'other' not in ioc_id]}
+        mock = requests_mock.get('https://api.seclytics.com/urls/',
+                                 json=respond)
+        client = Seclytics('')
+        results = list(client.url_lookups(iter(URLS), chunk_size=3))
+        assert [url for (url, _) in results] == URLS
+        found = [ioc.ioc_id if ioc else None for (_, ioc) in results]
+        assert found == [legacy_hash(url) if url.strip() != 'not a url' and
+                         'other' not in url else None for url in URLS]
+        # the first chunk has a single distinct hash for two URLs
+        assert len(mock.request_history[0].qs['ids'][0].split(',')) == 2
+
+    def test_hashed_urls(self, requests_mock):
+        mock = requests_mock.get('https://api.seclytics.com/urls/',
+                                 json={'data': []})
+        list(Seclytics('').hashed_urls(URLS))
+        sent = mock.last_request.qs['ids'][0].split(',')
+        assert sorted(sent) == sorted(set(h for h in map(legacy_hash, URLS)
+                                          if h))